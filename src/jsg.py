@@ -26,19 +26,26 @@
 # OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
 # OF THE POSSIBILITY OF SUCH DAMAGE.
 import re
+import sys
 import json
+from io import StringIO
+from json.encoder import encode_basestring_ascii
 from collections import OrderedDict
-from typing import TextIO, Union, Optional, Any, Dict
+from functools import lru_cache
+from types import MappingProxyType
+from typing import TextIO, Union, Optional, Any, Dict, NamedTuple, List, Callable, Tuple
 from inspect import signature, Parameter
 
 from jsonasobj import JsonObj
-from logger import Logger
+from logger import Logger, UNIMPLEMENTED, TYPE_MISMATCH, MISSING_FIELD, FIELD_TYPE, EXTRA_ELEMENT, WRONG_TYPE
 
-from typing_patch import conforms
+from typing_patch import conformance_checker
+
+__version__ = '0.0.1'   # type: str     Keep in step with setup.py
 
 # JSG type entry
 # TODO: Figure out how to load these from the compiled JSG instance
-TYPE = []           # type: str
+TYPE = "type"           # type: str
 IGNORE = []             # type: List[str]   List of properties to globally ignore
 
 # TODO: Extend List to include a minimum and maximum value
@@ -54,7 +61,7 @@ class JSGValidateable:
         :param log: Logger to record reason for non validation.
         :return: True if valid, false otherwise
         """
-        log.log("Unimplemented validate function")
+        log.error(UNIMPLEMENTED)
         return False
 
     @property
@@ -62,21 +69,95 @@ class JSGValidateable:
         return type(self).__name__
 
 
-class JSGObject(JsonObj, JSGValidateable):
+JSGField = NamedTuple('JSGField', [('name', str), ('kind', Any), ('annotation', Any), ('default', Any)])
+
+
+class JSGObjectMeta(type):
+    """
+    Compile the __init__ signature of each JSGObject class into a field table when the class is created.
+
+    _fields maps every parameter name (including the '**_' catchall) to its JSGField.  _members is the subset of
+    ordinary (POSITIONAL_OR_KEYWORD) parameters, in declaration order.  _checkers holds a (name, annotation, checker)
+    tuple for each of the _members, where checker is the compiled conformance test for the annotation.  It is filled in
+    on first use, as the annotations may contain forward references that aren't resolved until the declaring module
+    has been completely loaded.
+    """
+    def __init__(cls, name, bases, dct):
+        super().__init__(name, bases, dct)
+        parms = list(signature(cls.__init__).parameters.values())[1:]          # skip self
+        cls._fields = OrderedDict((parm.name, JSGField(parm.name, parm.kind, parm.annotation, parm.default))
+                                  for parm in parms)
+        cls._members = tuple(f for f in cls._fields.values() if f.kind == Parameter.POSITIONAL_OR_KEYWORD)
+        cls._checkers = None
+
+    def _member_checkers(cls):
+        if cls._checkers is None:
+            cls._checkers = tuple((f.name, f.annotation, conformance_checker(f.annotation)) for f in cls._members)
+        return cls._checkers
+
+
+class JSGObject(JsonObj, JSGValidateable, metaclass=JSGObjectMeta):
     """
     JSGObject is a JsonObj with constraints.
 
     Note that methods and variables in JSGObject should always begin with "_", as we currently restrict the set of
     JSON names to those that begin with [a-zA-Z]
+
+    Objects loaded with compact=True (see: loads) have _compact set and use the compact representation, in which
+    members whose value is None are not stored at all.  Absent members still read as None, and validation and
+    serialization are unchanged, but they no longer appear in the dictionary interface ('closed' in shape, _as_dict,
+    ...).  Compact and standard objects can be mixed freely.
+
+    Setting _incremental enables incremental validation.  Each object remembers a successful (strict) validation,
+    which is reused until a member of the object, or of one of the objects below it, is assigned.  Assignment marks
+    the object as changed and records it at each of its ancestors (the links to which are set during validation and
+    dropped when the member that holds an object is reassigned), so revalidating the root only re-examines the changed
+    subtrees.  Changes that don't go through attribute assignment
+    (e.g. s.shapes[label] = shape or s.shapes[label].extra.append(iri)) must be followed by a call to _invalidate on
+    the object that owns the changed container.  A parent that isn't a JSGObject is an observer (see:
+    shexj_index.SchemaIndex), which is told of every change to the object with _changed(object).
     """
+    __slots__ = ('_parent', '_valid', '_dirty', '_compact')     # Object state that is kept out of __dict__
+    _fast_load = True           # type: bool    False means always load through __init__ (see JSGLoader)
+    _incremental = False        # type: bool
 
     def __init__(self):
         """
         Generic constructor
         """
         JsonObj.__init__(self)
+        object.__setattr__(self, '_compact', False)
+        if self._incremental:
+            self._init_state()
         self[TYPE] = self._class_name            # type: str
 
+    def _init_state(self) -> None:
+        """ Initialize the incremental validation state.  (Unset state reads as None, but by way of __getattr__) """
+        object.__setattr__(self, '_parent', None)
+        object.__setattr__(self, '_valid', None)
+        object.__setattr__(self, '_dirty', None)
+
+    def __getattr__(self, key: str) -> Any:
+        """
+        Absent members read as None.  This is only called when the normal attribute lookup fails.
+        :param key: attribute name
+        :return: None if key is a declared member
+        """
+        field = self._fields.get(key)
+        if (field is not None and field.kind == Parameter.POSITIONAL_OR_KEYWORD) or key in JSGObject.__slots__:
+            return None
+        raise AttributeError("'{}' object has no attribute '{}'".format(self._class_name, key))
+
+    def __getstate__(self) -> Union[Dict[str, Any], Tuple[Dict[str, Any], bool]]:
+        """ Pickle (and copy) the members and compact flag only.  Incremental validation state is not carried over """
+        return (self.__dict__, True) if self._compact else self.__dict__
+
+    def __setstate__(self, state: Union[Dict[str, Any], Tuple[Dict[str, Any], bool]]) -> None:
+        if isinstance(state, tuple):
+            state, compact = state
+            object.__setattr__(self, '_compact', compact)
+        self.__dict__.update(state)
+
     def __setattr__(self, key: str, value: Any):
         """
         Screen attributes for name and type.  Anything starting with underscore ('_') goes, anything in the IGNORE list
@@ -85,11 +166,19 @@ class JSGObject(JsonObj, JSGValidateable):
         :param value:
         :return:
         """
-        if key in signature(self.__init__).parameters:
-            parm = signature(self.__init__).parameters[key]
-            if parm.kind == Parameter.POSITIONAL_OR_KEYWORD:
-                self[key] = value
-            elif parm.kind == Parameter.VAR_KEYWORD:
+        field = self._fields.get(key)
+        if field is not None:
+            if field.kind == Parameter.POSITIONAL_OR_KEYWORD:
+                old = self.__dict__.get(key)
+                if value is None and self._compact:
+                    self.__dict__.pop(key, None)
+                else:
+                    self.__dict__[key] = value
+                if self._incremental:
+                    if old is not None and old is not value:
+                        self._release(old)
+                    self._invalidate()
+            elif field.kind == Parameter.VAR_KEYWORD:
                 for k, v in value:
                     setattr(self, k, v)
             elif key.startswith("_") or key in IGNORE:
@@ -111,24 +200,44 @@ class JSGObject(JsonObj, JSGValidateable):
         return OrderedDict({k: v for k, v in d.items() if not k.startswith("_") and v is not None})
 
     @staticmethod
-    def _test(entry, log: Logger) -> bool:
+    def _test(entry, log: Logger, parent: Optional["JSGObject"] = None) -> bool:
         """
         Test whether entry conforms to its type
         :param entry: entry to test
         :param log: place to record issues
+        :param parent: object that contains entry.  If present, it is recorded as the parent of each JSGObject in entry
+        (incremental mode)
         :return: True if it meets requirements
         """
+        # The location is only tracked when the log keeps records, and then nothing returns early
+        path = log._path
         if isinstance(entry, dict):
             for k, v in entry.items():
+                if path is not None:
+                    path.append((k, ))
                 if isinstance(k, JSGValidateable) and not k._is_valid(log) and not log.logging:
                     return False
-                if isinstance(v, JSGValidateable) and not v._is_valid(log) and not log.logging:
-                    return False
+                if isinstance(v, JSGValidateable):
+                    if parent is not None and isinstance(v, JSGObject) and v._parent is not parent:
+                        parent._adopt(v)
+                    if not v._is_valid(log) and not log.logging:
+                        return False
+                if path is not None:
+                    path.pop()
         elif isinstance(entry, list):
-            for v in entry:
-                if isinstance(v, JSGValidateable) and not v._is_valid(log) and not log.logging:
-                    return False
+            for i, v in enumerate(entry):
+                if isinstance(v, JSGValidateable):
+                    if parent is not None and isinstance(v, JSGObject) and v._parent is not parent:
+                        parent._adopt(v)
+                    if path is not None:
+                        path.append(i)
+                        v._is_valid(log)
+                        path.pop()
+                    elif not v._is_valid(log) and not log.logging:
+                        return False
         elif isinstance(entry, JSGValidateable):
+            if parent is not None and isinstance(entry, JSGObject) and entry._parent is not parent:
+                parent._adopt(entry)
             if not entry._is_valid(log) and not log.logging:
                 return False
         return True
@@ -141,51 +250,278 @@ class JSGObject(JsonObj, JSGValidateable):
         return JSGObject._strip_nones(obj.__dict__) if isinstance(obj, JsonObj)\
             else str(obj) if isinstance(obj, JSGString) else json.JSONEncoder().default(obj)
 
+    def _copy(self) -> "JSGObject":
+        """
+        Return a shallow copy of this object.  Lists and maps are copied, the objects in them are not
+        """
+        rval = type(self).__new__(type(self))
+        if self._incremental:
+            rval._init_state()
+        if self._compact:
+            object.__setattr__(rval, '_compact', True)
+        rval.__dict__.update((k, v.copy() if isinstance(v, (list, dict)) else v) for k, v in self.__dict__.items())
+        return rval
+
+    def _invalidate(self) -> None:
+        """
+        Discard the cached validation result of this object, and record the change at its ancestors (incremental mode)
+        """
+        object.__setattr__(self, '_valid', None)
+        object.__setattr__(self, '_dirty', None)
+        changed = [self]
+        while changed:
+            child = changed.pop()
+            parents = child._parent
+            for parent in tuple(parents.values()) if isinstance(parents, dict) else (parents, ) if parents is not None \
+                    else ():
+                if not isinstance(parent, JSGObject):
+                    parent._changed(child)
+                # A parent with no cached result has already been told (or has nothing to reuse)
+                elif parent._valid:
+                    dirty = parent._dirty
+                    if dirty is None:
+                        dirty = {}
+                        object.__setattr__(parent, '_dirty', dirty)
+                    if id(child) not in dirty:
+                        dirty[id(child)] = child
+                        changed.append(parent)
+
+    def _adopt(self, child: "JSGObject") -> None:
+        """
+        Record self as a parent of child.  An object that is reachable from more than one place has a map of parents,
+        keyed by id
+        """
+        parents = child._parent
+        if parents is None:
+            object.__setattr__(child, '_parent', self)
+        elif parents is not self:
+            if not isinstance(parents, dict):
+                object.__setattr__(child, '_parent', {id(parents): parents, id(self): self})
+            else:
+                parents[id(self)] = self
+
+    def _release(self, value: Any) -> None:
+        """
+        Remove self from the parents of the objects in value -- a member value (object, list or map) that self no
+        longer holds -- unless self still holds them through another member
+        """
+        children = value.values() if isinstance(value, dict) else value if isinstance(value, list) else (value, )
+        held = None
+        for child in children:
+            if isinstance(child, JSGObject) and child._parent is not None:
+                if held is None:
+                    held = set()
+                    for v in self.__dict__.values():
+                        for c in v.values() if isinstance(v, dict) else v if isinstance(v, list) else (v, ):
+                            if isinstance(c, JSGObject):
+                                held.add(id(c))
+                if id(child) not in held:
+                    parents = child._parent
+                    if parents is self:
+                        object.__setattr__(child, '_parent', None)
+                    elif isinstance(parents, dict):
+                        parents.pop(id(self), None)
+                        if len(parents) == 1:
+                            object.__setattr__(child, '_parent', next(iter(parents.values())))
+
+    def _still_valid(self) -> bool:
+        """
+        Incremental mode: determine whether the last successful validation still holds.  Nothing here has changed
+        since then except (possibly) the dirty subtrees.  If they are all still valid, so is this.  The dirty
+        subtrees are visited with an explicit stack, so a change deep in the tree doesn't exhaust the interpreter stack.
+        """
+        if not self._valid:
+            object.__setattr__(self, '_valid', None)
+            object.__setattr__(self, '_dirty', None)
+            return False
+        rval = True
+        stack = [(self, iter(list(self._dirty.values())) if self._dirty else iter(()))]
+        while stack:
+            node, children = stack[-1]
+            child = next(children, None) if rval else None
+            if child is not None:
+                if not child._incremental or type(child)._is_valid is not JSGObject._is_valid:
+                    rval = child._is_valid()
+                elif child._valid:
+                    if child._dirty:
+                        stack.append((child, iter(list(child._dirty.values()))))
+                else:
+                    # Nothing to reuse -- what child._is_valid() would do
+                    object.__setattr__(child, '_valid', None)
+                    object.__setattr__(child, '_dirty', None)
+                    rval = child._validate(None, True)
+                    if rval:
+                        object.__setattr__(child, '_valid', True)
+                continue
+            stack.pop()
+            if rval:
+                object.__setattr__(node, '_dirty', None)
+            else:
+                object.__setattr__(node, '_valid', None)
+                object.__setattr__(node, '_dirty', None)
+                if stack:
+                    # A dirty child failed the quick test -- revalidate it in full, as its _is_valid would
+                    rval = node._validate(None, True)
+                    if rval:
+                        object.__setattr__(node, '_valid', True)
+        return rval
+
     def _is_valid(self, log: Optional[Logger] = None, strict: bool = True) -> bool:
+        if not self._incremental:
+            return self._validate(log, strict)
+        if self._still_valid():
+            return True
+        # Revalidate everything so errors are reported in order
+        if not self._validate(log, strict):
+            return False
+        if strict:
+            object.__setattr__(self, '_valid', True)
+        return True
+
+    def _validate(self, log: Optional[Logger], strict: bool,
+                  test: Optional[Callable[[Any, Logger], bool]] = None) -> bool:
+        """
+        Validate this object and everything below it.  The tree is walked with an explicit work list rather than by
+        recursion, so its depth is not limited by the interpreter stack.  Errors are reported in the same (depth first,
+        member declaration) order as a recursive walk, and nested objects are validated as they would be by their own
+        _is_valid (strict, and with their parents recorded in incremental mode).
+        :param log: Logger to record reason for non validation.
+        :param strict: True means report extra (undeclared) elements
+        :param test: function to validate the contents of each member of this object that conforms to its declared type
+        -- same signature as _test.  This allows the test of an individual member to be replaced (e.g.
+        jsg_parallel.validate_parallel).  Default: validate it as part of the walk
+        :return: True if valid
+        """
         if log is None:
             log = Logger()
         nerrors = log.nerrors
+        logging = log.logging
+        path = log._path
+        todo = [(_BODY, self, test, strict)]        # type: List[tuple]
+        push = todo.append
+        pop = todo.pop
+        while todo:
+            item = pop()
+            kind = item[0]
+            if kind == _ITEM:
+                # A validateable value -- a nested object (which is walked) or a string (which tests itself)
+                _, obj, segment, parent = item
+                if path is not None and segment is not None:
+                    path.append(segment)
+                    push(_POP_ITEM)
+                if not isinstance(obj, JSGObject) or type(obj)._is_valid is not JSGObject._is_valid:
+                    if not obj._is_valid(log) and not logging:
+                        return False
+                    continue
+                if parent is not None and obj._parent is not parent:
+                    parent._adopt(obj)
+                if obj._incremental:
+                    if obj._still_valid():
+                        continue
+                    push((_VALID, obj, log.nerrors))
+                test = None
+                strict = True
+            elif kind == _CONTAINER:
+                _, entry, segment, parent = item
+                if path is not None:
+                    path.append(segment)
+                    push(_POP_ITEM)
+                if isinstance(entry, dict):
+                    for k, v in reversed(list(entry.items())):
+                        if isinstance(v, JSGValidateable):
+                            push((_ITEM, v, (k, ), parent))
+                        if isinstance(k, JSGValidateable):
+                            push((_ITEM, k, (k, ), None))
+                else:
+                    for i in range(len(entry) - 1, -1, -1):
+                        v = entry[i]
+                        if isinstance(v, JSGValidateable):
+                            push((_ITEM, v, i, parent))
+                continue
+            elif kind == _ERROR:
+                if log.error(*item[1:]):
+                    return False
+                continue
+            elif kind == _POP:
+                path.pop()
+                continue
+            elif kind == _VALID:
+                # Incremental mode: a nested object validated without error
+                if log.nerrors == item[2]:
+                    object.__setattr__(item[1], '_valid', True)
+                continue
+            elif kind == _CALL:
+                # A member tested by the supplied function
+                _, entry, segment, test = item
+                if path is not None:
+                    path.append(segment)
+                    valid = test(entry, log)
+                    path.pop()
+                else:
+                    valid = test(entry, log)
+                if not valid:
+                    return False
+                continue
+            else:
+                _, obj, test, strict = item
 
-        if getattr(self, TYPE) != self._class_name:
-            if log.log("Type mismatch - Expected: {} Actual: {}".format(self._class_name, getattr(self, TYPE))):
-                return False
-
-        sig = signature(self.__init__)
-        for name, parm in sig.parameters.items():
-            if name != "self" and parm.kind == Parameter.POSITIONAL_OR_KEYWORD:
-                typ = parm.annotation
-                entry = getattr(self, name)         # Note: None and absent are equivalent
-                if not conforms(entry, typ):
+            # The members of obj.  Their work items are pushed in reverse, so they are taken in declaration order,
+            # followed by the extra elements.
+            if getattr(obj, TYPE) != obj._class_name:
+                if log.error(TYPE_MISMATCH, expected=obj._class_name, actual=getattr(obj, TYPE)):
+                    return False
+            if strict:
+                # Test each attribute against the schema
+                extras = []
+                fields = obj._fields
+                for k, v in obj.__dict__.items():
+                    if k not in fields and v is not None and k != TYPE and not k.startswith("_") and k not in IGNORE:
+                        extras.append((_ERROR, EXTRA_ELEMENT, None, k, None, v))
+                if extras:
+                    extras.reverse()
+                    todo += extras
+            parent = obj if obj._incremental else None
+            for name, typ, checker in reversed(type(obj)._member_checkers()):
+                entry = getattr(obj, name)             # Note: None and absent are equivalent
+                if not checker(entry):
                     if entry is None:
-                        if log.log("{}: Missing required field: {}".format(type(self).__name__, name)):
-                            return False
+                        push((_ERROR, MISSING_FIELD, type(obj).__name__, name, None, None))
                     else:
-                        if log.log("{}: Type mismatch for {}. Expecting: {} Got: {}"
-                                   .format(type(self).__name__, name, typ, type(entry))):
-                            return False
-                elif entry is not None and not self._test(entry, log):  # Make sure that entry conforms to its own type
-                    return False
+                        push((_ERROR, FIELD_TYPE, type(obj).__name__, name, typ, entry))
+                elif entry is None:
+                    pass
+                elif test is not None:
+                    push((_CALL, entry, name, test))
+                elif isinstance(entry, JSGValidateable):
+                    # A valid string can't change the order of the errors, so it is tested here
+                    if type(entry)._is_valid is not JSGString._is_valid or \
+                            not (entry.pattern is None or entry.pattern.matches(entry.val)):
+                        push((_ITEM, entry, name, parent))
+                elif isinstance(entry, (dict, list)):
+                    push((_CONTAINER, entry, name, parent))
+        return log.nerrors == nerrors
 
-        if strict:
-            # Test each attribute against the schema
-            for k, v in self._strip_nones(self.__dict__).items():
-                if k not in sig.parameters and k != TYPE and k not in IGNORE:
-                    if log.log("Extra element: {}: {}".format(k, v)):
-                        return False
 
-        return log.nerrors == nerrors
+# JSGObject._validate work items
+_ITEM, _BODY, _CONTAINER, _ERROR, _POP, _VALID, _CALL = range(7)
+_POP_ITEM = (_POP, )
 
 
 class JSGPattern:
     """
     A lexerRuleBlock
     """
+    cache_size = 8192       # type: int     Number of match results remembered per pattern
+
     def __init__(self, pattern: str):
         """
-        Compile and record a match pattern
+        Compile and record a match pattern.  Match results are memoized per string, with least recently used
+        eviction once cache_size strings have been seen, so repeated values (predicates, datatypes, ...) are only
+        scanned once.
         :param pattern:
         """
         self.pattern = re.compile(pattern)
+        self.matches = lru_cache(maxsize=self.cache_size)(self.matches)
 
     def matches(self, txt: str) -> bool:
         """
@@ -194,7 +530,7 @@ class JSGPattern:
         :return: True if match
         """
         match = self.pattern.match(txt)
-        return match and match.endpos == len(txt)
+        return bool(match and match.endpos == len(txt))
 
 
 class JSGStringMeta(type):
@@ -203,6 +539,59 @@ class JSGStringMeta(type):
         return not self.pattern or self.pattern.matches(str(instance).lower()
                                                         if isinstance(instance, bool) else str(instance))
 
+    @staticmethod
+    def fused_instancecheck(members: List["JSGStringMeta"]) -> Callable[[Any], bool]:
+        """
+        typing_patch hook -- return a single test for membership in any of members
+        :param members: JSGString classes in a Union
+        :return: Test function
+        """
+        return JSGStringUnion(members)
+
+
+class JSGStringUnion:
+    """
+    A union of JSGString classes.  The member patterns are fused into a single alternation, so a string can be tested
+    against (or classified into) the union with one scan.  Results are memoized per string.
+    """
+    def __init__(self, members: List[JSGStringMeta]):
+        """
+        Construct a fused test
+        :param members: JSGString classes in the union, in precedence order
+        """
+        self.members = list(members)
+        # A member without a pattern matches anything, so nothing after it can ever be selected
+        first_unpatterned = next((i for i, m in enumerate(self.members) if not m.pattern), len(self.members))
+        self._default = self.members[first_unpatterned] if first_unpatterned < len(self.members) else None
+        patterned = self.members[:first_unpatterned]
+        self.pattern = re.compile('|'.join('(?P<_{}>{})'.format(i, m.pattern.pattern.pattern)
+                                           for i, m in enumerate(patterned))) if patterned else None
+        self._groups = {'_{}'.format(i): m for i, m in enumerate(patterned)}
+        self.classify_text = lru_cache(maxsize=JSGPattern.cache_size)(self.classify_text)
+
+    def classify_text(self, txt: str) -> Optional[JSGStringMeta]:
+        """
+        Return the first member whose pattern matches txt
+        :param txt: text to classify
+        :return: matching member class or None if no match
+        """
+        if self.pattern:
+            match = self.pattern.match(txt)
+            if match:
+                return self._groups[match.lastgroup]
+        return self._default
+
+    def classify(self, element: Any) -> Optional[JSGStringMeta]:
+        """
+        Return the member class that element belongs to
+        :param element: element to classify
+        :return: first matching member class or None if element isn't a member of the union
+        """
+        return self.classify_text(str(element).lower() if isinstance(element, bool) else str(element))
+
+    def __call__(self, element: Any) -> bool:
+        return self.classify(element) is not None
+
 
 class JSGString(JSGValidateable, metaclass=JSGStringMeta):
     """
@@ -215,7 +604,7 @@ class JSGString(JSGValidateable, metaclass=JSGStringMeta):
         Construct a simple string variable
         :param val: any type that can be cooreced into a string
         """
-        self.val = self._adjust_for_json(val)
+        self.val = sys.intern(self._adjust_for_json(val))
 
     @staticmethod
     def _adjust_for_json(val: Any) -> str:
@@ -230,7 +619,7 @@ class JSGString(JSGValidateable, metaclass=JSGStringMeta):
         if self.pattern:
             if self.pattern.matches(self.val):
                 return True
-            log.log("Wrong type: {}: {}".format(self._class_name, self.val))
+            log.error(WRONG_TYPE, self._class_name, actual=self.val)
             return False
         return True
 
@@ -244,37 +633,460 @@ class JSGString(JSGValidateable, metaclass=JSGStringMeta):
         return hash(self.val)
 
 
-def loads_loader(module, pairs) -> object:
+class JSGLoader:
+    """
+    json loader object hook for the declarations in a module.
+
+    A dispatch table from type name to constructor is built once for each module.  The constructor for a JSGObject
+    class fills the object's __dict__ directly from the parsed pairs, in field order, rather than going through
+    cls(**pairs) and the __setattr__ screening.  The result is identical, as the __init__ of a JSGObject class
+    simply assigns each of its parameters -- a class whose __init__ does anything more must set _fast_load to False.
+    Types that aren't in the table (including everything that isn't a JSGObject) are constructed by calling them.
+    """
+    _loaders = {}           # type: Dict[Any, "JSGLoader"]
+
+    def __init__(self, module, compact: bool = False):
+        """
+        Build the dispatch table for module.  Note that the table isn't updated if module is subsequently changed
+        :param module: Module that contains the various types
+        :param compact: if true, construct compact objects (see: JSGObject)
+        """
+        self.module = module
+        self.compact = compact
+        self.dispatch = MappingProxyType({name: self._constructor(cls, compact) for name, cls in vars(module).items()
+                                          if isinstance(cls, JSGObjectMeta) and cls._fast_load})
+
+    @classmethod
+    def for_module(cls, module, compact: bool = False) -> "JSGLoader":
+        """
+        Return the (shared) loader for module
+        :param module: Module that contains the various types
+        :param compact: if true, the loader constructs compact objects
+        """
+        loader = cls._loaders.get((module, compact))
+        if loader is None:
+            loader = cls._loaders[(module, compact)] = cls(module, compact)
+        return loader
+
+    @staticmethod
+    def _constructor(cls: JSGObjectMeta, compact: bool = False) -> Callable[[Dict[str, Any]], JSGObject]:
+        """
+        Compile a constructor for cls
+        :param cls: JSGObject class
+        :param compact: if true, the constructed objects are compact
+        :return: function that constructs an instance of cls from a dictionary of parsed pairs
+        """
+        class_name = cls.__name__
+        fields = tuple((f.name, None if f.default is Parameter.empty else f.default) for f in cls._members)
+        required = frozenset(f.name for f in cls._members if f.default is Parameter.empty)
+        names = None if any(f.kind == Parameter.VAR_KEYWORD for f in cls._fields.values()) else \
+            frozenset(f.name for f in cls._members)
+        new = cls.__new__
+        set_state = object.__setattr__
+
+        def construct(pairs: Dict[str, Any]) -> JSGObject:
+            if not required <= pairs.keys() or (names is not None and not names >= pairs.keys()):
+                return cls(**pairs)             # Raise the appropriate TypeError
+            obj = new(cls)
+            if cls._incremental:
+                obj._init_state()
+            d = obj.__dict__
+            d[TYPE] = class_name
+            get = pairs.get
+            if compact:
+                set_state(obj, '_compact', True)
+                for name, default in fields:
+                    value = get(name, default)
+                    if value is not None:
+                        d[name] = value
+            else:
+                for name, default in fields:
+                    d[name] = get(name, default)
+            return obj
+        return construct
+
+    def __call__(self, pairs: Dict[str, Any]) -> Any:
+        """
+        json loader objecthook
+        :param pairs: parsed JSON object
+        :return: JSGObject if pairs has a type, else pairs
+        """
+        if TYPE in pairs:
+            construct = self.dispatch.get(pairs[TYPE])
+            if construct is not None:
+                return construct(pairs)
+            cls = getattr(self.module, pairs[TYPE], None)
+            if cls:
+                obj = cls(**pairs)
+                if self.compact and isinstance(obj, JSGObject):
+                    object.__setattr__(obj, '_compact', True)
+                    for k in [k for k, v in obj.__dict__.items() if v is None]:
+                        del obj.__dict__[k]
+                return obj
+            raise Exception("Unknown type: {}".format(pairs[TYPE]))
+        return pairs
+
+
+class JSGInterner:
+    """
+    json loader object hook that interns (sys.intern) the string values of a document, so each distinct IRI, literal,
+    etc. is held once, however often it appears.  Only the strings are shared -- every object is still loaded as a
+    private instance that can be changed like any other.
+    """
+    def __init__(self, module, compact: bool = False):
+        """
+        Construct an interner
+        :param module: Module that contains the various types
+        :param compact: if true, load compact objects
+        """
+        self.load = JSGLoader.for_module(module, compact)
+
+    def __call__(self, pairs: Dict[str, Any]) -> Any:
+        """
+        json loader objecthook
+        :param pairs: parsed JSON object
+        :return: JSGObject if pairs has a type, else pairs
+        """
+        self.intern(pairs)
+        return self.load(pairs)
+
+    def intern(self, value: Union[Dict[str, Any], List[Any]]) -> None:
+        """
+        Intern the strings in value, in place.  Nested objects have already been interned by the object hook, so only
+        nested lists are descended into
+        :param value: parsed JSON object or list
+        """
+        for k, v in value.items() if isinstance(value, dict) else enumerate(value):
+            if type(v) is str:
+                value[k] = sys.intern(v)
+            elif type(v) is list:
+                self.intern(v)
+
+
+def loads_loader(module, pairs, compact: bool = False) -> object:
     """
     json loader objecthook
     :param module: Module that contains the various types
     :param pairs:
+    :param compact: if true, construct a compact object
     :return:
     """
-    if TYPE in pairs:
-        cls = getattr(module, pairs[TYPE], None)
-        if cls:
-            return cls(**pairs)
-        raise Exception("Unknown type: {}".format(pairs[TYPE]))
-    return pairs
+    return JSGLoader.for_module(module, compact)(pairs)
+
+
+def materialize(module, value: Any, compact: bool = False) -> Any:
+    """
+    Convert a parsed JSON image into JSG objects -- the bottom-up equivalent of running json.loads with loads_loader
+    as the object hook
+    :param module: Module that contains the various types
+    :param value: parsed JSON value
+    :param compact: if true, construct compact objects
+    :return: converted value
+    """
+    load = JSGLoader.for_module(module, compact)
+
+    def convert(value: Any) -> Any:
+        if isinstance(value, dict):
+            return load({k: convert(v) for k, v in value.items()})
+        elif isinstance(value, list):
+            return [convert(v) for v in value]
+        return value
+    return convert(value)
+
+
+class JSGLazyDict(dict):
+    """
+    A map whose values are held as parsed JSON images and converted into JSG objects the first time they are accessed.
+    Every accessor (including items() and values(), which validation and serialization use) returns converted values,
+    so a JSGLazyDict behaves exactly like the eagerly loaded dict.  Note, however, that the dict() and {**d}
+    constructors read the underlying storage directly -- use d.copy() instead.
+    """
+    def __init__(self, module, pairs: Dict[str, Any], compact: bool = False):
+        super().__init__(pairs)
+        self._module = module
+        self._compact = compact
+        self._pending = set(pairs.keys())
+
+    def _materialized(self, key, value):
+        if key in self._pending:
+            value = materialize(self._module, value, self._compact)
+            dict.__setitem__(self, key, value)
+            self._pending.discard(key)
+        return value
+
+    def _materialize_all(self) -> None:
+        for k in list(self._pending):
+            self._materialized(k, dict.__getitem__(self, k))
+
+    def __getitem__(self, key):
+        return self._materialized(key, dict.__getitem__(self, key))
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def items(self):
+        self._materialize_all()
+        return dict.items(self)
+
+    def values(self):
+        self._materialize_all()
+        return dict.values(self)
 
+    def __setitem__(self, key, value):
+        self._pending.discard(key)
+        dict.__setitem__(self, key, value)
 
-def loads(s: str, module, **kwargs) -> JSGObject:
+    def __delitem__(self, key):
+        self._pending.discard(key)
+        dict.__delitem__(self, key)
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        if key in self._pending:
+            self._pending.discard(key)
+            value = materialize(self._module, value, self._compact)
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        self[key] = default
+        return default
+
+    def update(self, *args, **kwargs):
+        for k, v in dict(*args, **kwargs).items():
+            self[k] = v
+
+    def clear(self):
+        self._pending.clear()
+        dict.clear(self)
+
+    def copy(self) -> Dict[Any, Any]:
+        return dict(self.items())
+
+    def __eq__(self, other):
+        for d in (self, other):
+            if isinstance(d, JSGLazyDict):
+                d._materialize_all()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        self._materialize_all()
+        return dict.__repr__(self)
+
+    def __reduce__(self):
+        return dict, (self.copy(), )
+
+
+def loads(s: str, module, lazy: bool = False, intern: bool = False, compact: bool = False, **kwargs) -> JSGObject:
     """ Convert a JSON string into a JSGObject
     :param s: string representation of JSON document
     :param module: module that contains declarations for types
+    :param lazy: if true, the maps in the outermost object (e.g. Schema.shapes) are JSGLazyDicts, whose entries are
+    only converted into JSG objects when they are first accessed.
+    :param intern: if true, repeated string values are loaded as a single shared instance (see JSGInterner)
+    :param compact: if true, the loaded objects use the compact representation (see: JSGObject)
     :param kwargs: arguments see: json.load for details
     :return: JSGObject representing the json string
     """
-    return json.loads(s, object_hook=lambda pairs: loads_loader(module, pairs), **kwargs)
+    if intern:
+        if lazy:
+            raise ValueError("lazy and intern cannot be combined")
+        return json.loads(s, object_hook=JSGInterner(module, compact), **kwargs)
+    if lazy:
+        doc = json.loads(s, **kwargs)
+        if isinstance(doc, dict):
+            return loads_loader(module, {k: JSGLazyDict(module, v, compact) if isinstance(v, dict) and TYPE not in v
+                                         else materialize(module, v, compact) for k, v in doc.items()}, compact)
+        return materialize(module, doc, compact)
+    return json.loads(s, object_hook=JSGLoader.for_module(module, compact), **kwargs)
+
+
+class JSGWriter:
+    """
+    Serializer for JSG object trees.  The typed tree is walked directly and text is written to the output in
+    pieces.  The output is identical to json.dumps with JSGObject._default (i.e. _as_json or _as_json_dumps), but no
+    intermediate dictionaries are built and output is flushed to fp as each object is completed.
+    """
+    def __init__(self, fp: TextIO, indent: Optional[Union[int, str]] = None, buffer_size: int = 1 << 12):
+        """
+        Construct a writer
+        :param fp: output stream
+        :param indent: pretty print indent -- a string or number of spaces.  If None, the output is compact
+        :param buffer_size: number of text fragments to accumulate between writes
+        """
+        self.fp = fp
+        self.indent = ' ' * indent if isinstance(indent, int) else indent
+        self.buffer_size = buffer_size
+        self._keys = {}         # type: Dict[str, str]  Encoded member names (with the key separator)
+
+    @staticmethod
+    def _default(obj: Any) -> Any:
+        if isinstance(obj, JsonObj):
+            return {k: v for k, v in obj.__dict__.items() if v is not None and not k.startswith("_")}
+        elif isinstance(obj, JSGString):
+            return str(obj)
+        raise TypeError("Object of type '{}' is not JSON serializable".format(type(obj).__name__))
+
+    def write(self, obj: Any) -> None:
+        """
+        Serialize obj
+        :param obj: JSGObject (or any JSON serializable value) to write
+        """
+        parts = []              # type: List[str]
+        append = parts.append
+        encode_str = encode_basestring_ascii
+        keys = self._keys
+        fp = self.fp
+        buffer_size = self.buffer_size
+        indent = self.indent
+        item_separator = ', ' if indent is None else ','
+        newlines = []           # type: List[str]    newlines[n] is the line break and indent for level n
+
+        def newline(level: int) -> str:
+            while len(newlines) <= level:
+                newlines.append('' if indent is None else '\n' + indent * len(newlines))
+            return newlines[level]
+
+        def encode_key(k: Any) -> str:
+            rval = keys.get(k) if isinstance(k, str) else None
+            if rval is None:
+                rval = encode_str(self._key(k)) + ': '
+                if isinstance(k, str) and len(keys) < buffer_size:
+                    keys[k] = rval
+            return rval
+
+        def encode_pairs(pairs, level: int) -> None:
+            separator = None
+            for k, v in pairs:
+                if separator is None:
+                    separator = item_separator + newline(level + 1)
+                    append('{' + newline(level + 1))
+                else:
+                    append(separator)
+                append(encode_key(k))
+                if type(v) is str:
+                    append(encode_str(v))
+                else:
+                    encode(v, level + 1)
+            append('{}' if separator is None else newline(level) + '}')
+
+        def encode(obj: Any, level: int) -> None:
+            if isinstance(obj, str):
+                append(encode_str(obj))
+            elif obj is None:
+                append('null')
+            elif obj is True:
+                append('true')
+            elif obj is False:
+                append('false')
+            elif isinstance(obj, (int, float)):
+                append(self._number(obj))
+            elif isinstance(obj, JsonObj):
+                encode_pairs([(k, v) for k, v in obj.__dict__.items() if v is not None and not k.startswith("_")],
+                             level)
+                if len(parts) > buffer_size:
+                    fp.write(''.join(parts))
+                    parts.clear()
+            elif isinstance(obj, dict):
+                encode_pairs(obj.items(), level)
+            elif isinstance(obj, (list, tuple)):
+                if not obj:
+                    append('[]')
+                else:
+                    separator = item_separator + newline(level + 1)
+                    append('[' + newline(level + 1))
+                    first = True
+                    for v in obj:
+                        if not first:
+                            append(separator)
+                        first = False
+                        if type(v) is str:
+                            append(encode_str(v))
+                        else:
+                            encode(v, level + 1)
+                    append(newline(level) + ']')
+            elif isinstance(obj, JSGString):
+                append(encode_str(str(obj)))
+            else:
+                raise TypeError("Object of type '{}' is not JSON serializable".format(type(obj).__name__))
+
+        encode(obj, 0)
+        fp.write(''.join(parts))
+
+    @staticmethod
+    def _key(key: Any) -> str:
+        if isinstance(key, str):
+            return key
+        elif key is True:
+            return 'true'
+        elif key is False:
+            return 'false'
+        elif key is None:
+            return 'null'
+        elif isinstance(key, (int, float)):
+            return JSGWriter._number(key)
+        raise TypeError("keys must be a string")
+
+    @staticmethod
+    def _number(n: Union[int, float]) -> str:
+        if isinstance(n, int):
+            return int.__repr__(n)
+        elif n != n:
+            return 'NaN'
+        elif n == float('inf'):
+            return 'Infinity'
+        elif n == -float('inf'):
+            return '-Infinity'
+        return float.__repr__(n)
+
+
+def dump(obj: Any, fp: TextIO, indent: Optional[Union[int, str]] = None) -> None:
+    """ Serialize a JSGObject to a stream
+    :param obj: object to serialize
+    :param fp: output stream
+    :param indent: pretty print indent.  If None, the output is compact
+    """
+    JSGWriter(fp, indent).write(obj)
+
 
+def dumps(obj: Any, indent: Optional[Union[int, str]] = None) -> str:
+    """ Serialize a JSGObject to a string
+    :param obj: object to serialize
+    :param indent: pretty print indent.  If None, the output is compact
+    :return: JSON image of obj
+    """
+    out = StringIO()
+    JSGWriter(out, indent).write(obj)
+    return out.getvalue()
 
-def load(fp: Union[TextIO, str], **kwargs) -> JSGObject:
+
+def load(fp: Union[TextIO, str], cache=None, **kwargs) -> JSGObject:
     """ Convert a file name or file-like object containing stringified JSON into a JSGObject
     :param fp: file-like object to deserialize
+    :param cache: jsg_cache.ResultCache.  If present, an input that has been loaded before is not parsed again
     :param kwargs: arguments. see: json.load for details
     :return: JSGObject representing fp
     """
+    if cache is not None:
+        if isinstance(fp, str):
+            with open(fp, 'rb') as f:
+                data = f.read()
+        else:
+            data = fp.read()
+        return cache.load(data if isinstance(data, bytes) else data.encode('utf-8'), **kwargs)
     if isinstance(fp, str):
         with open(fp) as f:
             return loads(f.read(), **kwargs)
@@ -0,0 +1,286 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Persistent cache of load and validation results, keyed by the content of the input.
+
+    cache = ResultCache("~/.cache/shexj")
+    schema = jsg.load("schema.json", module=ShExJ, cache=cache)         # Parsed only if the file has changed
+    entry = cache.validate(data, ShExJ)                                 # entry.valid, entry.messages, entry.obj
+    print(cache.summary())
+
+The key of an entry is the sha256 of the input, the module name, the library version (jsg.__version__), a digest of
+the code that loads, validates and stores it (jsg.py, logger.py, typing_patch.py, jsg_snapshot.py and the module's own
+source file) and the load options, so a byte for byte identical input is neither parsed nor validated again, but a
+change to the code that produced an entry retires it without anyone having to bump a version.  Each entry is a file in
+the cache directory holding the validity, the error log and (optionally) a snapshot of the loaded objects (see:
+jsg_snapshot).  Hits refresh the modification time of the entry, and when the directory grows past its size limit the
+least recently used entries are removed.  Several processes can share a cache directory -- entries are written
+atomically.
+
+Entry format (all integers are unsigned, little endian):
+    header:   magic (b'JSGC'), version (16 bits), flags (16 bits: 1 - valid, 2 - snapshot follows),
+              message length (32 bits), message crc32 (32 bits)
+    messages: UTF-8
+    snapshot: (optional) jsg_snapshot
+"""
+import hashlib
+import os
+import tempfile
+import zlib
+from io import StringIO
+from struct import Struct
+from typing import Any, Dict, NamedTuple, Optional, List, Tuple
+
+import jsg
+import jsg_snapshot
+import logger
+import typing_patch
+from jsg import JSGObject
+from jsg_snapshot import SnapshotError
+from logger import Logger
+
+MAGIC = b'JSGC'
+VERSION = 1
+SUFFIX = '.jsgc'
+
+_HEADER = Struct('<4sHHII')
+_VALID = 1
+_SNAPSHOT = 2
+
+CacheEntry = NamedTuple('CacheEntry', [('valid', bool), ('messages', str), ('obj', Any)])
+
+_code_digests = {}          # type: Dict[Tuple[str, Optional[str]], str]   (module name, file) -> code digest
+
+
+def code_digest(module) -> str:
+    """
+    Return a digest of the source of the modules that determine a cached result -- jsg, logger, typing_patch (type
+    checking), jsg_snapshot (the stored objects) and module itself.  A module whose source can't be read (e.g. one
+    loaded from a zip file) contributes its name only.
+    :param module: module that contains the type declarations
+    :return: hex digest
+    """
+    ident = (module.__name__, getattr(module, '__file__', None))
+    rval = _code_digests.get(ident)
+    if rval is None:
+        h = hashlib.sha256()
+        for m in (jsg, logger, typing_patch, jsg_snapshot, module):
+            h.update('{}\0'.format(m.__name__).encode('utf-8'))
+            fn = getattr(m, '__file__', None)
+            if fn:
+                try:
+                    with open(fn, 'rb') as f:
+                        h.update(f.read())
+                except OSError:
+                    pass
+        rval = _code_digests[ident] = h.hexdigest()
+    return rval
+
+
+class ResultCache:
+    """
+    A directory of cached load and validation results
+    """
+    def __init__(self, directory: str, max_size: int = 1 << 28):
+        """
+        Construct a cache
+        :param directory: cache directory.  Created if necessary
+        :param max_size: maximum total size of the entries in bytes
+        """
+        self.directory = os.path.expanduser(directory)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._size = None           # type: Optional[int]    Total entry size -- computed on the first write
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(data: bytes, module, **options: Any) -> str:
+        """
+        Return the cache key for an input
+        :param data: input
+        :param module: module that contains the type declarations
+        :param options: load or validation options that affect the result
+        :return: hex digest
+        """
+        h = hashlib.sha256()
+        h.update('{}\0{}\0{}\0{}\0'.format(jsg.__version__, module.__name__, code_digest(module),
+                                             sorted(options.items())).encode('utf-8'))
+        h.update(data)
+        return h.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def get(self, key: str, module, compact: bool = False) -> Optional[CacheEntry]:
+        """
+        Return the entry for key, counting the hit or miss
+        :param key: cache key
+        :param module: module that contains the declarations for the types in the snapshot
+        :param compact: if true, the snapshot is loaded in the compact representation (see: jsg.JSGObject)
+        :return: entry or None
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            entry = self._decode(data, module, compact)
+        except (OSError, SnapshotError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    @staticmethod
+    def _decode(data: bytes, module, compact: bool = False) -> CacheEntry:
+        if len(data) < _HEADER.size:
+            raise SnapshotError("Cache entry is truncated")
+        magic, version, flags, length, crc = _HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise SnapshotError("Not a cache entry")
+        messages = data[_HEADER.size:_HEADER.size + length]
+        if len(messages) != length or zlib.crc32(messages) != crc:
+            raise SnapshotError("Cache entry checksum mismatch")
+        obj = jsg_snapshot.loads(data[_HEADER.size + length:], module, compact=compact) if flags & _SNAPSHOT else None
+        return CacheEntry(bool(flags & _VALID), messages.decode('utf-8'), obj)
+
+    def put(self, key: str, entry: CacheEntry) -> None:
+        """
+        Record an entry
+        :param key: cache key
+        :param entry: validity, messages and (optionally) the loaded object
+        """
+        messages = entry.messages.encode('utf-8')
+        snapshot = jsg_snapshot.dumps(entry.obj, validate=False) if entry.obj is not None else b''
+        flags = (_VALID if entry.valid else 0) | (_SNAPSHOT if entry.obj is not None else 0)
+        data = _HEADER.pack(MAGIC, VERSION, flags, len(messages), zlib.crc32(messages)) + messages + snapshot
+        path = self._path(key)
+        try:
+            replaced = os.stat(path).st_size           # An entry for key that is being overwritten
+        except OSError:
+            replaced = 0
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries())
+        else:
+            self._size += len(data) - replaced
+        if self._size > self.max_size:
+            self.evict()
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """ Return the (mtime, size, path) of every entry """
+        rval = []
+        for fn in os.listdir(self.directory):
+            if fn.endswith(SUFFIX):
+                path = os.path.join(self.directory, fn)
+                try:
+                    st = os.stat(path)
+                except OSError:         # Removed by another process
+                    continue
+                rval.append((st.st_mtime, st.st_size, path))
+        return rval
+
+    def evict(self, max_size: Optional[int] = None) -> int:
+        """
+        Remove the least recently used entries until the cache fits in max_size
+        :param max_size: size limit (default: self.max_size)
+        :return: number of entries removed
+        """
+        limit = self.max_size if max_size is None else max_size
+        entries = sorted(self._entries())
+        size = sum(size for _, size, _ in entries)
+        nremoved = 0
+        for _, entry_size, path in entries:
+            if size <= limit:
+                break
+            try:
+                os.remove(path)
+                nremoved += 1
+            except OSError:
+                pass
+            size -= entry_size
+        self._size = size
+        return nremoved
+
+    def clear(self) -> None:
+        """ Remove every entry """
+        self.evict(0)
+
+    def load(self, data: bytes, module, **kwargs: Any) -> JSGObject:
+        """
+        Load a JSON document, using the cached objects if data has been loaded before
+        :param data: UTF-8 encoded JSON document
+        :param module: module that contains the type declarations
+        :param kwargs: arguments see: jsg.loads for details
+        :return: JSGObject
+        """
+        key = self.key(data, module, **kwargs)
+        entry = self.get(key, module, kwargs.get('compact', False))
+        if entry is not None and entry.obj is not None:
+            return entry.obj
+        obj = jsg.loads(data.decode('utf-8'), module, **kwargs)
+        if isinstance(obj, JSGObject):
+            out = StringIO()
+            self.put(key, CacheEntry(obj._is_valid(Logger(out)), out.getvalue(), obj))
+        return obj
+
+    def validate(self, data: bytes, module, **kwargs: Any) -> CacheEntry:
+        """
+        Load and validate a JSON document, using the cached result if data has been validated before
+        :param data: UTF-8 encoded JSON document
+        :param module: module that contains the type declarations
+        :param kwargs: arguments see: jsg.loads for details
+        :return: validity, error log and the loaded object
+        """
+        key = self.key(data, module, **kwargs)
+        entry = self.get(key, module, kwargs.get('compact', False))
+        if entry is None or entry.obj is None:
+            obj = jsg.loads(data.decode('utf-8'), module, **kwargs)
+            out = StringIO()
+            entry = CacheEntry(obj._is_valid(Logger(out)), out.getvalue(), obj)
+            self.put(key, entry)
+        return entry
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def summary(self) -> str:
+        return "Cache: {} hits, {} misses ({:.1%} hit rate)".format(self.hits, self.misses, self.hit_rate)
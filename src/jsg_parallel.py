@@ -0,0 +1,109 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Validation of the entries of a large map (for ShExJ, Schema.shapes) across a process pool.
+
+    validate_parallel(schema, Logger(sys.stdout), workers=4)
+
+The map is split into contiguous chunks that are validated independently.  Each worker records its errors and the
+results are merged back in chunk order, so the messages, the error count and the result are exactly those of
+schema._is_valid(log).  If the log isn't recording (fast fail), processing stops at the first chunk with an error.
+
+Where the platform supports it, workers are forked and inherit the entries, so only chunk boundaries and results cross
+the process boundary.  Otherwise the entries of each chunk are pickled.
+"""
+import multiprocessing
+import os
+from typing import Optional, Any, List, Tuple
+
+from jsg import JSGObject
+from logger import Logger, ErrorRecord, Segment
+
+CHUNKS_PER_WORKER = 4           # type: int     Chunks queued per worker (smooths out uneven entries)
+
+_entries = None                 # type: Optional[List[Tuple[Any, Any]]]   Entries inherited by forked workers
+
+
+def _validate_chunk(task: Tuple[int, int, Optional[List[Tuple[Any, Any]]], bool, List[Segment]]) \
+        -> Tuple[int, List[ErrorRecord]]:
+    """
+    Validate a chunk of entries
+    :param task: start and end index, entries (or None if inherited), whether to record the errors and the location of
+    the entries
+    :return: number of errors and error records
+    """
+    start, end, entries, logging, path = task
+    log = Logger(keep_records=logging)
+    if logging:
+        log._path += path
+    JSGObject._test(dict(entries if entries is not None else _entries[start:end]), log)
+    return log.nerrors, log.records
+
+
+def validate_parallel(obj: JSGObject, log: Optional[Logger] = None, strict: bool = True,
+                      workers: Optional[int] = None, member: str = "shapes") -> bool:
+    """
+    Validate obj, testing the entries of member in a process pool.  The result (and anything recorded in log) is
+    identical to obj._is_valid(log, strict)
+    :param obj: object to validate
+    :param log: Logger to record reason for non validation.
+    :param strict: True means report extra (undeclared) elements
+    :param workers: number of worker processes.  Default: os.cpu_count()
+    :param member: name of the (dictionary) member to split
+    :return: True if valid
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    entries = obj.__dict__.get(member)
+    if workers < 2 or not isinstance(entries, dict) or len(entries) < 2:
+        return obj._is_valid(log, strict)
+
+    def test(entry: Any, log: Logger) -> bool:
+        if entry is not entries:
+            return JSGObject._test(entry, log)
+        items = list(entries.items())
+        nchunks = min(len(items), workers * CHUNKS_PER_WORKER)
+        bounds = [len(items) * i // nchunks for i in range(nchunks + 1)]
+        fork = 'fork' in multiprocessing.get_all_start_methods()
+        path = list(log._path or ())
+        tasks = [(start, end, None if fork else items[start:end], log.logging, path)
+                 for start, end in zip(bounds, bounds[1:])]
+        global _entries
+        _entries = items
+        pool = (multiprocessing.get_context('fork') if fork else multiprocessing).Pool(workers)
+        try:
+            for nerrors, records in pool.imap(_validate_chunk, tasks):
+                log.merge(nerrors, records)
+                if nerrors and not log.logging:
+                    return False
+            return True
+        finally:
+            pool.terminate()
+            _entries = None
+
+    return obj._validate(log, strict, test)
@@ -0,0 +1,331 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Binary snapshots of (validated) JSG object trees.
+
+    with open("schema.snap", "wb") as f:
+        jsg_snapshot.dump(schema, f)
+    with open("schema.snap", "rb") as f:
+        schema = jsg_snapshot.load(f, ShExJ)
+
+A snapshot loads straight into typed objects -- nothing is parsed, matched or validated -- and the result serializes
+(_as_json) exactly as the original did.  An object that appears more than once in the original appears (as the same
+instance) more than once in the loaded snapshot.
+
+Format (all integers are unsigned, 32 bit, little endian):
+    header:   magic (b'JSGS'), version (16 bits), flags (16 bits), payload length, payload crc32
+    payload:  string count, string table length (bytes), token count,
+              string lengths (in characters), string table (UTF-8),
+              tokens
+The tokens start with the object layout table -- a count, then, for each layout, the class name, the member count and
+the member names (as string references).  They are followed by the root value.  A value token is a 4 bit tag and a
+28 bit value.  Strings, floats (repr) and large integers are string table references.  A list or dictionary token
+carries its length and is followed by its entries (dictionary keys are string references).  An object token carries
+its layout and is followed by the values of its members.  A repeated object is a back reference to the position of
+its first occurrence.  The first string is the name of the module.
+
+A snapshot can be written against a base string table (flag bit 0) -- the strings that every snapshot of the module
+would otherwise repeat (see: module_strings).  The base table itself is not stored: its size precedes the payload sizes
+and its strings are numbered before those of the string table.
+"""
+import struct
+import sys
+import zlib
+from array import array
+from typing import Any, BinaryIO, Dict, List, Tuple, Optional
+
+from jsonasobj import JsonObj
+
+from jsg import JSGObject, JSGObjectMeta, JSGString, JSGWriter, TYPE
+
+MAGIC = b'JSGS'
+VERSION = 1
+
+_HEADER = struct.Struct('<4sHHII')
+_SIZES = struct.Struct('<III')
+_BASE = struct.Struct('<I')
+FLAG_BASE = 1
+_TOKEN = 'I' if array('I').itemsize == 4 else 'L'
+
+# Token tags.  SHARED (a read-only object) is no longer written, and is read as OBJECT
+NONE, TRUE, FALSE, STR, INT, FLOAT, BIGINT, LIST, DICT, OBJECT, SHARED, REF = range(12)
+_MAX_VALUE = (1 << 28) - 1
+_MAX_INT = 1 << 26                          # Zigzag encoded ints below this are stored in the token
+
+
+class SnapshotError(ValueError):
+    """ The data is not a (valid) snapshot """
+    pass
+
+
+def module_strings(module) -> List[str]:
+    """
+    Return a base string table for module -- the module name, the type names and the member names
+    :param module: module that contains the type declarations
+    :return: list of unique strings
+    """
+    names = dict.fromkeys([module.__name__, TYPE])
+    for name in sorted(vars(module)):
+        cls = getattr(module, name)
+        if isinstance(cls, JSGObjectMeta) and cls.__module__ == module.__name__:
+            names[name] = None
+            names.update(dict.fromkeys(f.name for f in cls._members))
+    return list(names)
+
+
+def dumps(obj: JSGObject, validate: bool = True, base: Optional[List[str]] = None) -> bytes:
+    """
+    Return a snapshot of obj
+    :param obj: object to snapshot
+    :param validate: if True, obj must be valid
+    :param base: base string table (see: module_strings).  The same table must be passed to loads
+    :return: snapshot
+    """
+    if validate and not obj._is_valid():
+        raise ValueError("Only a valid {} can be snapshotted".format(type(obj).__name__))
+    strings = {}                # type: Dict[str, int]
+    layouts = {}                # type: Dict[Tuple[type, Tuple[str, ...]], int]
+    objects = {}                # type: Dict[int, int]    id to object number
+    tokens = []                 # type: List[int]
+    append = tokens.append
+    for s in base or ():
+        strings.setdefault(s, len(strings))
+    nbase = len(strings)
+
+    def string(s: str) -> int:
+        idx = strings.get(s)
+        if idx is None:
+            idx = strings[s] = len(strings)
+            if idx > _MAX_VALUE:
+                raise ValueError("Too many strings")
+        return idx
+
+    def token(tag: int, value: int) -> None:
+        if value > _MAX_VALUE:
+            raise ValueError("Value too large to snapshot: {}".format(value))
+        append(value << 4 | tag)
+
+    def encode(v: Any) -> None:
+        if isinstance(v, str):
+            append(string(v) << 4 | STR)
+        elif v is None:
+            append(NONE)
+        elif v is True:
+            append(TRUE)
+        elif v is False:
+            append(FALSE)
+        elif isinstance(v, int):
+            z = v << 1 if v >= 0 else (-v << 1) - 1
+            if z < _MAX_INT:
+                append(z << 4 | INT)
+            else:
+                token(BIGINT, string(int.__repr__(v)))
+        elif isinstance(v, float):
+            token(FLOAT, string(float.__repr__(v)))
+        elif isinstance(v, JSGObject):
+            number = objects.get(id(v))
+            if number is not None:
+                token(REF, number)
+                return
+            objects[id(v)] = len(objects)
+            items = [(k, x) for k, x in v.__dict__.items() if x is not None and not k.startswith("_")]
+            layout_key = (type(v), tuple(k for k, _ in items))
+            layout = layouts.get(layout_key)
+            if layout is None:
+                layout = layouts[layout_key] = len(layouts)
+            token(OBJECT, layout)
+            for _, x in items:
+                encode(x)
+        elif isinstance(v, (JsonObj, dict)):
+            items = [(k, x) for k, x in v.__dict__.items() if x is not None and not k.startswith("_")] \
+                if isinstance(v, JsonObj) else list(v.items())
+            token(DICT, len(items))
+            for k, x in items:
+                append(string(JSGWriter._key(k)))
+                encode(x)
+        elif isinstance(v, (list, tuple)):
+            token(LIST, len(v))
+            for x in v:
+                encode(x)
+        elif isinstance(v, JSGString):
+            append(string(str(v)) << 4 | STR)
+        else:
+            raise TypeError("Object of type '{}' is not JSON serializable".format(type(v).__name__))
+
+    string(type(obj).__module__)
+    encode(obj)
+    header = [len(layouts)]
+    for cls, names in layouts:
+        header += [string(cls.__name__), len(names)] + [string(name) for name in names]
+
+    table = list(strings)[nbase:]
+    blob = ''.join(table).encode('utf-8')
+    lengths = array(_TOKEN, [len(s) for s in table])
+    body = array(_TOKEN, header)
+    body.extend(array(_TOKEN, tokens))
+    if sys.byteorder == 'big':
+        lengths.byteswap()
+        body.byteswap()
+    payload = b''.join([_BASE.pack(nbase) if base else b'', _SIZES.pack(len(table), len(blob), len(body)),
+                        lengths.tobytes(), blob, body.tobytes()])
+    return _HEADER.pack(MAGIC, VERSION, FLAG_BASE if base else 0, len(payload), zlib.crc32(payload)) + payload
+
+
+def dump(obj: JSGObject, fp: BinaryIO, validate: bool = True, base: Optional[List[str]] = None) -> None:
+    """
+    Write a snapshot of obj to fp
+    :param obj: object to snapshot
+    :param fp: binary output stream
+    :param validate: if True, obj must be valid
+    :param base: base string table (see: module_strings).  The same table must be passed to load
+    """
+    fp.write(dumps(obj, validate, base))
+
+
+def loads(data: bytes, module, base: Optional[List[str]] = None, compact: bool = False) -> JSGObject:
+    """
+    Load a snapshot
+    :param data: snapshot
+    :param module: module that contains the declarations for the types in the snapshot
+    :param base: the base string table that the snapshot was written with
+    :param compact: if true, the loaded objects use the compact representation (see: jsg.JSGObject)
+    :return: JSGObject
+    """
+    if len(data) < _HEADER.size:
+        raise SnapshotError("Snapshot is truncated")
+    magic, version, flags, length, crc = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SnapshotError("Not a snapshot")
+    if version != VERSION:
+        raise SnapshotError("Unsupported snapshot version: {}".format(version))
+    payload = memoryview(data)[_HEADER.size:]
+    if len(payload) != length:
+        raise SnapshotError("Snapshot is truncated")
+    if zlib.crc32(payload) != crc:
+        raise SnapshotError("Snapshot checksum mismatch")
+
+    pos = 0
+    strings = []
+    if flags & FLAG_BASE:
+        nbase, = _BASE.unpack_from(payload)
+        if base is None or len(base) != nbase:
+            raise SnapshotError("Snapshot requires a base string table of {} strings".format(nbase))
+        strings += base
+        pos = _BASE.size
+    nstrings, blob_len, ntokens = _SIZES.unpack_from(payload, pos)
+    pos += _SIZES.size
+    lengths = array(_TOKEN)
+    lengths.frombytes(payload[pos:pos + 4 * nstrings])
+    pos += 4 * nstrings
+    blob = str(payload[pos:pos + blob_len], 'utf-8')
+    pos += blob_len
+    body = array(_TOKEN)
+    body.frombytes(payload[pos:pos + 4 * ntokens])
+    if sys.byteorder == 'big':
+        lengths.byteswap()
+        body.byteswap()
+    start = 0
+    for n in lengths:
+        strings.append(blob[start:start + n])
+        start += n
+
+    if strings[0] != module.__name__:
+        raise SnapshotError("Snapshot is of {} not {}".format(strings[0], module.__name__))
+    tokens = iter(body)
+    nxt = tokens.__next__
+    objects = []                # type: List[JSGObject]
+
+    def decode(t: int) -> Any:
+        tag = t & 15
+        if tag == STR:
+            return strings[t >> 4]
+        elif tag == OBJECT or tag == SHARED:
+            cls, names, template = layouts[t >> 4]
+            obj = cls.__new__(cls)
+            if compact:
+                object.__setattr__(obj, '_compact', True)
+            if cls._incremental:
+                obj._init_state()
+            objects.append(obj)
+            d = obj.__dict__
+            if template:
+                d.update(template)
+            for name in names:
+                t = nxt()
+                d[name] = strings[t >> 4] if t & 15 == STR else decode(t)
+            return obj
+        elif tag == INT:
+            z = t >> 4
+            return z >> 1 if not z & 1 else -((z + 1) >> 1)
+        elif tag == LIST:
+            return [decode(nxt()) for _ in range(t >> 4)]
+        elif tag == DICT:
+            d = {}
+            for _ in range(t >> 4):
+                k = strings[nxt()]
+                d[k] = decode(nxt())
+            return d
+        elif tag <= FALSE:
+            return None if tag == NONE else tag == TRUE
+        elif tag == FLOAT:
+            return float(strings[t >> 4])
+        elif tag == BIGINT:
+            return int(strings[t >> 4])
+        elif tag == REF:
+            return objects[t >> 4]
+        raise SnapshotError("Invalid token: {}".format(t))
+
+    try:
+        layouts = []            # type: List[Tuple[JSGObjectMeta, List[str], Optional[Dict[str, None]]]]
+        for _ in range(nxt()):
+            name = strings[nxt()]
+            cls = getattr(module, name, None)
+            if not isinstance(cls, JSGObjectMeta):
+                raise SnapshotError("Unknown type: {}".format(name))
+            names = [strings[nxt()] for _ in range(nxt())]
+            # The standard representation has every member, in declaration order
+            template = None if compact else dict.fromkeys([TYPE] + [f.name for f in cls._members])
+            layouts.append((cls, names, template))
+        rval = decode(nxt())
+    except (StopIteration, IndexError):
+        raise SnapshotError("Snapshot is corrupt")
+    if next(tokens, None) is not None:
+        raise SnapshotError("Snapshot is corrupt")
+    return rval
+
+
+def load(fp: BinaryIO, module, base: Optional[List[str]] = None, compact: bool = False) -> JSGObject:
+    """
+    Load a snapshot from a binary stream
+    :param fp: binary input stream
+    :param module: module that contains the declarations for the types in the snapshot
+    :param base: the base string table that the snapshot was written with
+    :param compact: if true, the loaded objects use the compact representation (see: jsg.JSGObject)
+    :return: JSGObject
+    """
+    return loads(fp.read(), module, base, compact)
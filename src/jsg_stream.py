@@ -0,0 +1,227 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Incremental loading of very large JSG documents.
+
+The document is read from a file object in chunks.  The members of the outermost object are decoded one at a time
+and the entries of one nominated member (for ShExJ, the "shapes" map) are decoded entry by entry, so the raw text of
+the document is never held in memory at once:
+
+    with open("big.json") as f:
+        for label, shape in iterload(f, ShExJ):
+            ...
+
+    with open("big.json") as f:
+        schema = load(f, ShExJ)
+"""
+import json
+from typing import TextIO, Iterator, Tuple, Any, Callable
+
+from jsg import JSGObject, JSGLoader, loads_loader
+
+CHUNK_SIZE = 1 << 16            # type: int     Default read size
+TRUNCATION_MARGIN = 16          # type: int     An error this close to the end of the buffer may be a cut off token
+
+
+class JSONStream:
+    """
+    A JSON token reader over a text file object.  Only the structure of the outermost levels is interpreted here --
+    complete values are handed to a json.JSONDecoder.  The buffer holds the unconsumed text of at most one value
+    """
+    def __init__(self, fp: TextIO, chunk_size: int = CHUNK_SIZE):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size: int) -> bool:
+        """
+        Discard the consumed text and append (at least) size characters to the buffer
+        :param size: number of characters to read
+        :return: False if at end of file
+        """
+        if self.eof:
+            return False
+        chunk = self.fp.read(max(size, self.chunk_size))
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        self.eof = not chunk
+        return not self.eof
+
+    def _error(self, msg: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(msg, self.buf, self.pos)
+
+    def peek(self) -> str:
+        """
+        Skip white space and return the next character without consuming it
+        :return: next character or '' at end of file
+        """
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\n\r':
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._fill(self.chunk_size):
+                return self.buf[self.pos:self.pos + 1]
+
+    def next(self) -> str:
+        """
+        Consume and return the next non-white space character
+        """
+        c = self.peek()
+        self.pos += len(c)
+        return c
+
+    def expect(self, c: str) -> None:
+        if self.next() != c:
+            raise self._error("Expecting '{}'".format(c))
+
+    def _decode(self, decode: Callable[[str, int], Tuple[Any, int]]) -> Any:
+        """
+        Decode the next value in the stream, reading more text until the value is complete
+        :param decode: decoding function -- takes the buffer and a start position, returns value and end position
+        :return: decoded value
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = decode(self.buf, self.pos)
+                # A number or literal that runs to the end of the buffer may continue in the next chunk
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                # Only an unterminated string or an error in a token that the end of the buffer may have cut off
+                # (a literal, a \u escape, ...) can be cured by reading more.  Anything else is malformed input
+                if self.eof or not (e.msg.startswith("Unterminated string") or
+                                    e.pos >= len(self.buf) - TRUNCATION_MARGIN):
+                    raise
+            self._fill(len(self.buf) - self.pos)           # Double the window each time
+
+    def read_string(self) -> str:
+        """
+        Read an object key
+        """
+        if self.peek() != '"':
+            raise self._error("Expecting property name enclosed in double quotes")
+        return self._decode(lambda s, pos: json.decoder.scanstring(s, pos + 1))
+
+    def read_value(self, decoder: json.JSONDecoder) -> Any:
+        return self._decode(decoder.raw_decode)
+
+    def members(self, decode_value: Callable[[str], Any]) -> Iterator[Tuple[str, Any]]:
+        """
+        Iterate over the members of an object whose opening brace has already been consumed
+        :param decode_value: function to read the value of each member
+        :return: (key, value) iterator
+        """
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.read_string()
+            self.expect(':')
+            yield key, decode_value(key)
+            c = self.next()
+            if c == '}':
+                return
+            if c != ',':
+                raise self._error("Expecting ',' delimiter")
+
+
+class _Entries:
+    """
+    The entries of the incrementally decoded member.  They must be consumed before the next outer member is read
+    """
+    def __init__(self, entries: Iterator[Tuple[str, Any]]):
+        self.entries = entries
+
+    def __iter__(self) -> Iterator[Tuple[str, Any]]:
+        return self.entries
+
+
+def _outer_members(stream: JSONStream, module, member: str, compact: bool = False, **kwargs) \
+        -> Iterator[Tuple[str, Any]]:
+    """
+    Iterate over the members of the outermost object.  The value of member (if it is an object) is returned as an
+    _Entries iterator.
+    """
+    decoder = json.JSONDecoder(object_hook=JSGLoader.for_module(module, compact), **kwargs)
+
+    def decode_value(key: str) -> Any:
+        if key == member and stream.peek() == '{':
+            stream.pos += 1
+            return _Entries(stream.members(lambda _: stream.read_value(decoder)))
+        return stream.read_value(decoder)
+
+    stream.expect('{')
+    return stream.members(decode_value)
+
+
+def iterload(fp: TextIO, module, member: str = "shapes", chunk_size: int = CHUNK_SIZE, **kwargs) \
+        -> Iterator[Tuple[str, Any]]:
+    """
+    Lazily decode the entries of one member of the outermost JSON object.  For a ShExJ schema this yields
+    (shapeLabel, shapeExpr) pairs one at a time.  The other members of the outermost object are decoded and discarded.
+    :param fp: file-like object containing a JSON document
+    :param module: module that contains declarations for types
+    :param member: name of the member whose entries are returned
+    :param chunk_size: read size
+    :param kwargs: arguments. see: json.load for details
+    :return: (key, value) iterator
+    """
+    for key, value in _outer_members(JSONStream(fp, chunk_size), module, member, **kwargs):
+        if isinstance(value, _Entries):
+            yield from value
+
+
+def load(fp: TextIO, module, member: str = "shapes", chunk_size: int = CHUNK_SIZE, compact: bool = False,
+         **kwargs) -> JSGObject:
+    """
+    Convert a file-like object containing stringified JSON into a JSGObject.  The result is identical to
+    jsg.load(fp, module=module), but the entries of member are decoded one at a time, so the peak memory is the final
+    object plus the text of the largest single entry.
+    :param fp: file-like object to deserialize
+    :param module: module that contains declarations for types
+    :param member: name of the member to build entry by entry
+    :param chunk_size: read size
+    :param compact: if true, the loaded objects use the compact representation (see: jsg.JSGObject)
+    :param kwargs: arguments. see: json.load for details
+    :return: JSGObject representing fp
+    """
+    stream = JSONStream(fp, chunk_size)
+    pairs = {}
+    for key, value in _outer_members(stream, module, member, compact, **kwargs):
+        if isinstance(value, _Entries):
+            entries = {}
+            for label, entry in value:
+                entries[label] = entry
+            value = loads_loader(module, entries, compact)
+        pairs[key] = value
+    if stream.peek():
+        raise stream._error("Extra data")
+    return loads_loader(module, pairs, compact)
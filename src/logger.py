@@ -25,23 +25,155 @@
 # LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
 # OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
 # OF THE POSSIBILITY OF SUCH DAMAGE.
-from typing import Optional, TextIO
+import json
+from typing import Optional, TextIO, List, Any, Iterator, Tuple, Union
+
+# Error codes
+MESSAGE = 0             # Free text (Logger.log)
+UNIMPLEMENTED = 1       # No validate function
+TYPE_MISMATCH = 2       # The type member does not match the class
+MISSING_FIELD = 3       # A required member is absent
+FIELD_TYPE = 4          # A member value is not of the declared type
+EXTRA_ELEMENT = 5       # An undeclared member (strict mode)
+WRONG_TYPE = 6          # A string does not match its pattern
+
+Segment = Union[str, int, Tuple[Any]]      # Member name, list index or (dictionary key, )
+
+
+def format_path(segments: Tuple[Segment, ...]) -> str:
+    """
+    Format a location -- e.g. shapes["http://a.example/S1"].expression.expressions[3].valueExpr
+    :param segments: member names, list indices and (dictionary key, ) tuples
+    :return: JSON path
+    """
+    parts = []
+    for segment in segments:
+        if isinstance(segment, int):
+            parts.append('[{}]'.format(segment))
+        elif isinstance(segment, tuple):
+            parts.append('[{}]'.format(json.dumps(str(segment[0]))))
+        else:
+            parts.append('.' + segment if parts else segment)
+    return ''.join(parts)
+
+
+# Message formatters -- (context, field, expected, actual) to text
+_FORMATS = {
+    MESSAGE: lambda c, f, e, a: a,
+    UNIMPLEMENTED: lambda c, f, e, a: "Unimplemented validate function",
+    TYPE_MISMATCH: lambda c, f, e, a: "Type mismatch - Expected: {} Actual: {}".format(e, a),
+    MISSING_FIELD: lambda c, f, e, a: "{}: Missing required field: {}".format(c, f),
+    FIELD_TYPE: lambda c, f, e, a: "{}: Type mismatch for {}. Expecting: {} Got: {}".format(c, f, e, type(a)),
+    EXTRA_ELEMENT: lambda c, f, e, a: "Extra element: {}: {}".format(f, a),
+    WRONG_TYPE: lambda c, f, e, a: "Wrong type: {}: {}".format(c, a)
+}
+
+
+class ErrorRecord:
+    """
+    A single validation error.  The message and location are only formatted when they are read.  A pickled record
+    carries its message and location rather than the actual value and path.
+    """
+    __slots__ = ('code', 'context', 'field', 'expected', 'actual', 'path', '_message', '_location')
+
+    def __init__(self, code: int, context: Optional[str] = None, field: Optional[str] = None, expected: Any = None,
+                 actual: Any = None, path: Tuple[Segment, ...] = ()):
+        """
+        Construct an error record
+        :param code: error code
+        :param context: name of the type being validated
+        :param field: name of the member in error
+        :param expected: expected type
+        :param actual: actual value
+        :param path: location of the error in the document (see: format_path)
+        """
+        self.code = code
+        self.context = context
+        self.field = field
+        self.expected = expected
+        self.actual = actual
+        self.path = path
+        self._message = None            # type: Optional[str]
+        self._location = None           # type: Optional[str]
+
+    @property
+    def message(self) -> str:
+        if self._message is None:
+            self._message = _FORMATS[self.code](self.context, self.field, self.expected, self.actual)
+        return self._message
+
+    @property
+    def location(self) -> str:
+        if self._location is None:
+            self._location = format_path(self.path)
+        return self._location
+
+    def __str__(self) -> str:
+        return "{}: {}".format(self.location, self.message) if self.path or self._location else self.message
+
+    def __repr__(self) -> str:
+        return "ErrorRecord({}, {!r}, {!r})".format(self.code, self.message, self.location)
+
+    def __getstate__(self):
+        # The expected type is carried as text (types don't always pickle), but None stays None
+        return self.code, self.context, self.field, None if self.expected is None else str(self.expected), \
+            self.message, self.location
+
+    def __setstate__(self, state):
+        self.code, self.context, self.field, self.expected, self._message, self._location = state
+        self.actual = None
+        self.path = ()
 
 
 class Logger:
     """
     Basic error recording utility.  Used for validation routines where callers may simply wish to know whether something
     is or isn't valid or, in other circumstances, may wish to see the detail of all of the violations.  The mode is
-    controlled by the presence of logfile.  If it is present, errors are logged and all errors are recorded.  If
-    absent, the fact that the error exists is noted.
+    controlled by the presence of logfile or keep_records.  If either is present, all errors are recorded -- as text in
+    the logfile and/or as ErrorRecords in records.  If both are absent, the fact that the error exists is noted and
+    nothing is built.
+
+    When records are kept, the validators maintain the location of the value being tested as a stack of segments in
+    _path (a member name, a list index or a (dictionary key, ) tuple), which each record captures.
     """
-    def __init__(self, logfile: Optional[TextIO] = None):
+    def __init__(self, logfile: Optional[TextIO] = None, keep_records: bool = False,
+                 max_records: Optional[int] = None):
         """
         Construct a logging instance
-        :param logfile: File to log to.  If absent, no messages are recorded
+        :param logfile: File to log to.  If absent, no messages are written
+        :param keep_records: True means keep an ErrorRecord for every error
+        :param max_records: maximum number of records to keep.  Errors beyond this are counted but not kept
         """
         self.nerrors = 0
         self._logfile = logfile
+        self._keep = keep_records
+        self._max_records = max_records
+        self._records = [None] * max_records if keep_records and max_records is not None else []   # type: List
+        self._nrecords = 0
+        self._path = [] if keep_records else None       # type: Optional[List[Segment]]
+
+    def error(self, code: int, context: Optional[str] = None, field: Optional[str] = None, expected: Any = None,
+              actual: Any = None) -> bool:
+        """
+        Record an error.  Return value indicates whether it is ok to terminate on the first error or whether we need to
+        continue processing.
+        :param code: error code
+        :param context: name of the type being validated
+        :param field: name of the member in error
+        :param expected: expected type
+        :param actual: actual value
+        :return: True if we aren't logging, False if we are.
+        """
+        self.nerrors += 1
+        if self._keep:
+            if self._logfile is not None or self._max_records is None or self._nrecords < self._max_records:
+                path = tuple(self._path) if field is None else tuple(self._path) + (field, )
+                self._add(ErrorRecord(code, context, field, expected, actual, path))
+        elif self._logfile is not None:
+            print(_FORMATS[code](context, field, expected, actual), file=self._logfile)
+        else:
+            return True
+        return False
 
     def log(self, txt: str) -> bool:
         """
@@ -50,10 +182,18 @@ class Logger:
         :param txt: text to log.
         :return: True if we aren't logging, False if we are.
         """
-        self.nerrors += 1
+        return self.error(MESSAGE, actual=txt)
+
+    def _add(self, record: ErrorRecord) -> None:
+        if self._keep:
+            if self._max_records is None:
+                self._records.append(record)
+                self._nrecords += 1
+            elif self._nrecords < self._max_records:
+                self._records[self._nrecords] = record
+                self._nrecords += 1
         if self._logfile is not None:
-            print(txt, file=self._logfile)
-        return not self.logging
+            print(record.message, file=self._logfile)
 
     @property
     def logging(self):
@@ -61,4 +201,24 @@ class Logger:
         Return logging status
         :return: True if logging is occurring (meaning we want all errors) or False if we just want to find an error
         """
-        return self._logfile is not None
+        return self._logfile is not None or self._keep
+
+    @property
+    def records(self) -> List[ErrorRecord]:
+        """ The records kept so far """
+        return self._records[:self._nrecords]
+
+    def messages(self) -> Iterator[str]:
+        """ Format the records kept so far """
+        return (record.message for record in self._records[:self._nrecords])
+
+    def merge(self, nerrors: int, records: List[ErrorRecord]) -> None:
+        """
+        Add the errors recorded by another logger
+        :param nerrors: number of errors recorded
+        :param records: the records it kept
+        """
+        self.nerrors += nerrors
+        if self.logging:
+            for record in records:
+                self._add(record)
@@ -1,4 +1,4 @@
-from distutils.core import setup
+from setuptools import setup
 import sys
 
 requires = ["jsonasobj"]
@@ -15,6 +15,9 @@ setup(
     author='Harold Solbrig',
     author_email='solbrig.harold@mayo.edu',
     install_requires = requires,
+    entry_points={
+        'console_scripts': ['shexj_validate = shexj_validate:main']
+    },
     test_requires = ["dirlistproc"],
     description='python bindings and parser for ShExJ'
 )
@@ -0,0 +1,468 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Shape reference index for a ShExJ Schema.
+
+    index = SchemaIndex(schema)
+    index.closure("http://a.example/S1")        # Labels of every shape S1 (transitively) needs
+    index.referenced_by("http://a.example/S2")  # Labels of the shapes that reference S2
+    index.components()                          # Strongly connected components (mutually recursive shapes)
+    index.extract(["http://a.example/S1"])      # A Schema with S1 and the shapes it needs
+
+The index is built once and then kept up to date shape by shape.  It replaces Schema.shapes with an equal map that
+reports every change to its entries (schema.shapes[label] = shape, del schema.shapes[label], ... or, equivalently,
+index[label] = shape, del index[label]), and a new Schema.shapes map is indexed when the index is next used.  In
+incremental mode (see: jsg.JSGObject) the index is also told of every assignment to (or _invalidate of) the objects
+in a shape.  Otherwise a shape that has been changed in place must be reported (index.update(label)).  Building the
+index doesn't change the content of the schema.  Labels are always reported as (python) strings.
+"""
+import weakref
+from typing import Dict, Set, FrozenSet, List, Iterable, Iterator, Optional, Union, Any
+
+import ShExJ
+from jsg import JSGObject, JSGString
+
+Label = str
+
+
+def shape_references(shape: Any, nodes: Optional[List[Any]] = None) -> Set[Label]:
+    """
+    Return the labels referenced by a shape expression -- ShapeRef references, Inclusions and inherited shapes.  Only
+    the members that can hold shape or triple expressions are examined.
+    :param shape: shape expression
+    :param nodes: if present, the objects that were examined are appended to it
+    :return: set of labels
+    """
+    rval = set()
+    todo = [shape]
+    seen = set()                # Subtrees that appear more than once only need to be walked once
+    while todo:
+        node = todo.pop()
+        if node is None or id(node) in seen:
+            continue
+        seen.add(id(node))
+        if nodes is not None:
+            nodes.append(node)
+        if isinstance(node, ShExJ.TripleConstraint):
+            todo.append(node.valueExpr)
+        elif isinstance(node, (ShExJ.EachOf, ShExJ.OneOf)):
+            todo += node.expressions or ()
+        elif isinstance(node, ShExJ.ShapeRef):
+            rval.add(str(node.reference))
+        elif isinstance(node, ShExJ.Inclusion):
+            rval.add(str(node.include))
+        elif isinstance(node, ShExJ.Shape):
+            rval.update(str(label) for label in node.inherit or ())
+            todo.append(node.expression)
+        elif isinstance(node, (ShExJ.ShapeAnd, ShExJ.ShapeOr)):
+            todo += node.shapeExprs or ()
+        elif isinstance(node, ShExJ.ShapeNot):
+            todo.append(node.shapeExpr)
+    return rval
+
+
+class _ShapeMap(dict):
+    """
+    Schema.shapes, as installed by SchemaIndex.  Every change to an entry is reported to the indexes of the schema
+    """
+    def __init__(self, shapes: Iterable[Any]):
+        super().__init__(shapes)
+        self._indexes = weakref.WeakSet()
+
+    def _changed(self, key: Any) -> None:
+        for index in list(self._indexes):
+            index._entry_changed(key)
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self._changed(key)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._changed(key)
+
+    def pop(self, key, *default):
+        if key not in self:
+            return dict.pop(self, key, *default)
+        value = dict.pop(self, key)
+        self._changed(key)
+        return value
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        self._changed(key)
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        self[key] = default
+        return default
+
+    def update(self, *args, **kwargs):
+        for k, v in dict(*args, **kwargs).items():
+            self[k] = v
+
+    def clear(self):
+        keys = list(self)
+        dict.clear(self)
+        for key in keys:
+            self._changed(key)
+
+    def __reduce__(self):
+        return dict, (dict(self), )
+
+
+class SchemaIndex:
+    """
+    Label to shape, shape to referenced labels and referenced label to referencing shapes maps for a Schema, along
+    with its strongly connected components
+    """
+    def __init__(self, schema: ShExJ.Schema):
+        """
+        Index schema
+        :param schema: schema to index
+        """
+        self.schema = schema
+        self._nodes = {}            # type: Dict[Label, List[JSGObject]]    Label to the objects watched for it
+        self._watched = {}          # type: Dict[int, Set[Label]]           id(watched object) to labels
+        self.refresh()
+
+    def refresh(self) -> None:
+        """
+        Rebuild the entire index
+        """
+        for label in list(self._nodes):
+            self._unwatch(label)
+        self._keys = {}             # type: Dict[Label, Any]                Label to key in schema.shapes
+        self._refs = {}             # type: Dict[Label, FrozenSet[Label]]   Label to referenced labels
+        self._rrefs = {}            # type: Dict[Label, Set[Label]]         Label to labels that reference it
+        self._components = None     # type: Optional[Dict[Label, FrozenSet[Label]]]   Label to its SCC
+        shapes = self.schema.shapes
+        if shapes is not None:
+            if not isinstance(shapes, _ShapeMap):
+                shapes = self.schema.__dict__['shapes'] = _ShapeMap(shapes.items())
+            shapes._indexes.add(self)
+            for key, shape in shapes.items():
+                self._add(key, shape)
+        self._shapes = shapes
+
+    def _sync(self) -> None:
+        """ Index a Schema.shapes map that has been replaced """
+        if self.schema.shapes is not self._shapes:
+            self.refresh()
+
+    def _add(self, key: Any, shape: Any) -> None:
+        label = str(key)
+        self._keys[label] = key
+        nodes = [] if isinstance(shape, JSGObject) and shape._incremental else None
+        refs = self._refs[label] = frozenset(shape_references(shape, nodes))
+        for ref in refs:
+            self._rrefs.setdefault(ref, set()).add(label)
+        self._components = None
+        if nodes:
+            for node in nodes:
+                JSGObject._adopt(self, node)
+                self._watched.setdefault(id(node), set()).add(label)
+            self._nodes[label] = nodes
+
+    def _remove(self, label: Label) -> None:
+        del self._keys[label]
+        for ref in self._refs.pop(label):
+            referers = self._rrefs[ref]
+            referers.discard(label)
+            if not referers:
+                del self._rrefs[ref]
+        self._components = None
+        self._unwatch(label)
+
+    def _unwatch(self, label: Label) -> None:
+        """ Stop observing the objects of shape label """
+        for node in self._nodes.pop(label, ()):
+            labels = self._watched.get(id(node))
+            if labels is not None:
+                labels.discard(label)
+                if not labels:
+                    del self._watched[id(node)]
+                    parents = node._parent
+                    if parents is self:
+                        object.__setattr__(node, '_parent', None)
+                    elif isinstance(parents, dict):
+                        parents.pop(id(self), None)
+
+    def _changed(self, node: JSGObject) -> None:
+        """ Observer notification (incremental mode): node has been changed """
+        for label in list(self._watched.get(id(node), ())):
+            if label in self._keys:
+                self.update(label)
+
+    def _entry_changed(self, key: Any) -> None:
+        """ Schema.shapes notification: the entry for key has been added, replaced or removed """
+        if self.schema.shapes is not self._shapes:
+            return
+        label = str(key)
+        if label in self._keys:
+            key = self._keys[label]
+            self._remove(label)
+        if key in self._shapes:
+            self._add(key, self._shapes[key])
+        if isinstance(self.schema, JSGObject) and self.schema._incremental:
+            self.schema._invalidate()
+
+    # Mapping interface -- label to shape
+    def __getitem__(self, label: Label) -> Any:
+        self._sync()
+        return self.schema.shapes[self._keys[str(label)]]
+
+    def __contains__(self, label: Label) -> bool:
+        self._sync()
+        return str(label) in self._keys
+
+    def __iter__(self) -> Iterator[Label]:
+        self._sync()
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        self._sync()
+        return len(self._keys)
+
+    def get(self, label: Label, default: Any = None) -> Any:
+        return self[label] if label in self else default
+
+    def __setitem__(self, label: Union[Label, ShExJ.IRI, ShExJ.BNODE], shape: Any) -> None:
+        """
+        Add or replace a shape in the schema
+        :param label: shape label
+        :param shape: shape expression
+        """
+        if self.schema.shapes is None:
+            self.schema.shapes = {}
+        self._sync()
+        self.schema.shapes[self._keys.get(str(label), label)] = shape
+
+    def __delitem__(self, label: Label) -> None:
+        """
+        Remove a shape from the schema
+        :param label: shape label
+        """
+        self._sync()
+        del self.schema.shapes[self._keys[str(label)]]
+
+    def update(self, label: Label) -> None:
+        """
+        Rescan a shape that has been changed in place
+        :param label: shape label
+        """
+        self._sync()
+        label = str(label)
+        key = self._keys[label]
+        self._remove(label)
+        self._add(key, self.schema.shapes[key])
+
+    # Queries
+    def extract(self, labels: Union[Label, Iterable[Label]]) -> ShExJ.Schema:
+        """ Return the sub-schema needed by labels.  See: extract """
+        return extract(self.schema, labels, self)
+
+    def references(self, label: Label) -> FrozenSet[Label]:
+        """ Return the labels directly referenced by shape label """
+        self._sync()
+        return self._refs[str(label)]
+
+    def referenced_by(self, label: Label) -> FrozenSet[Label]:
+        """ Return the labels of the shapes that directly reference label """
+        self._sync()
+        return frozenset(self._rrefs.get(str(label), ()))
+
+    def undefined(self) -> Set[Label]:
+        """ Return the labels that are referenced but not defined """
+        self._sync()
+        return {ref for ref in self._rrefs if ref not in self._keys}
+
+    def closure(self, labels: Union[Label, Iterable[Label]]) -> Set[Label]:
+        """
+        Return the labels of the shapes that labels (transitively) need, including labels themselves.  Undefined
+        references are included.
+        :param labels: label or labels of the starting shapes
+        :return: set of labels
+        """
+        self._sync()
+        todo = [str(labels)] if isinstance(labels, str) else [str(label) for label in labels]
+        rval = set(todo)
+        while todo:
+            for ref in self._refs.get(todo.pop(), ()):
+                if ref not in rval:
+                    rval.add(ref)
+                    todo.append(ref)
+        return rval
+
+    def component(self, label: Label) -> FrozenSet[Label]:
+        """
+        Return the strongly connected component that contains label
+        :param label: shape label
+        :return: the labels of the shapes that are mutually dependent with label (including label itself)
+        """
+        self._sync()
+        if self._components is None:
+            self._components = {label: component for component in self._tarjan() for label in component}
+        return self._components[str(label)]
+
+    def components(self) -> List[FrozenSet[Label]]:
+        """
+        Return the strongly connected components of the reference graph, in reverse topological order (a component
+        comes after all of the components it references)
+        """
+        self._sync()
+        return list(self._tarjan())
+
+    def is_recursive(self, label: Label) -> bool:
+        """ Return True if shape label (directly or indirectly) references itself """
+        label = str(label)
+        return len(self.component(label)) > 1 or label in self._refs[label]
+
+    def _tarjan(self) -> Iterator[FrozenSet[Label]]:
+        """
+        Tarjan's strongly connected components algorithm (iterative).  References to undefined labels are ignored.
+        """
+        index = {}                  # type: Dict[Label, int]
+        lowlink = {}                # type: Dict[Label, int]
+        stack = []                  # type: List[Label]
+        on_stack = set()            # type: Set[Label]
+        for root in self._keys:
+            if root in index:
+                continue
+            work = [(root, iter(self._refs[root]))]
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, refs = work[-1]
+                for ref in refs:
+                    if ref not in self._keys:
+                        continue
+                    if ref not in index:
+                        index[ref] = lowlink[ref] = len(index)
+                        stack.append(ref)
+                        on_stack.add(ref)
+                        work.append((ref, iter(self._refs[ref])))
+                        break
+                    elif ref in on_stack:
+                        lowlink[node] = min(lowlink[node], index[ref])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+                    if lowlink[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        yield frozenset(component)
+
+
+def _strings(nodes: Iterable[Any]) -> Iterator[str]:
+    """
+    Return every string (including JSGString values) in nodes
+    """
+    todo = list(nodes)
+    seen = set()
+    while todo:
+        node = todo.pop()
+        if isinstance(node, str):
+            yield node
+        elif isinstance(node, JSGObject):
+            if id(node) not in seen:
+                seen.add(id(node))
+                todo += node.__dict__.values()
+        elif isinstance(node, list):
+            todo += node
+        elif isinstance(node, dict):
+            todo += node.keys()
+            todo += node.values()
+        elif isinstance(node, JSGString):
+            yield str(node)
+
+
+def extract(schema: ShExJ.Schema, labels: Union[Label, Iterable[Label]], index: Optional[SchemaIndex] = None) \
+        -> ShExJ.Schema:
+    """
+    Return a Schema with the shapes that labels (transitively) need.  The shapes are shared with schema, not copied,
+    and nothing is validated.  The new schema has the base of schema and:
+      * the prefixes whose namespace begins one of the IRIs (or other strings) in the extracted shapes
+      * the startActs for the semantic action extensions that the extracted shapes use
+      * the start shape expression, if everything it references is extracted
+    :param schema: schema to extract from
+    :param labels: label or labels of the shapes to extract
+    :param index: index of schema.  If absent, one is built
+    :return: sub-schema
+    """
+    if index is None:
+        index = SchemaIndex(schema)
+    needed = index.closure(labels)
+    shapes = {index._keys[label]: index[label] for label in index if label in needed}
+    strings = set(_strings(shapes.values()))
+    strings.update(str(key) for key in shapes)
+
+    prefixes = None
+    if schema.prefixes:
+        prefixes = {prefix: ns for prefix, ns in schema.prefixes.items()
+                    if any(s.startswith(str(ns)) for s in strings)} or None
+
+    start_acts = None
+    if schema.startActs:
+        extensions = {str(act.name) for shape in shapes.values() for act in _semacts(shape)}
+        start_acts = [act for act in schema.startActs if str(act.name) in extensions] or None
+
+    start = schema.start
+    if start is not None and not shape_references(start) <= needed:
+        start = None
+
+    return ShExJ.Schema(prefixes=prefixes, base=schema.base, startActs=start_acts, start=start, shapes=shapes)
+
+
+def _semacts(shape: Any) -> Iterator[Any]:
+    """
+    Return the semantic actions in shape
+    """
+    todo = [shape]
+    seen = set()
+    while todo:
+        node = todo.pop()
+        if isinstance(node, JSGObject):
+            if id(node) not in seen:
+                seen.add(id(node))
+                if isinstance(node, ShExJ.SemAct):
+                    yield node
+                else:
+                    todo += node.__dict__.values()
+        elif isinstance(node, list):
+            todo += node
@@ -0,0 +1,307 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Compiled ShExJ NodeConstraints.
+
+    check = compile_constraint(node_constraint)
+    check(literal("42", XSD_INTEGER))       # True or False
+    check.check_many(terms)                 # [True, False, ...]
+
+A NodeConstraint is examined once, when it is compiled: the pattern is compiled, the numeric facets are converted to
+numbers and the value set is indexed (see: shexj_valueset).  Each facet that is present becomes a single test, and a
+term satisfies the constraint if it passes every test.  Terms are as described in shexj_terms.
+
+The lexical forms of the xsd boolean, string and numeric datatypes are checked when they are named as the datatype.
+Other datatypes are compared by IRI only.
+"""
+import re
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Iterable, List, Optional, Tuple, Union
+
+import ShExJ
+from shexj_terms import Term, Literal, XSD, XSD_BOOLEAN
+from shexj_valueset import ValueSetIndex
+
+Number = Union[int, Decimal, float]
+Test = Callable[[Term], bool]
+
+_INTEGER = re.compile(r'[+-]?[0-9]+$')
+_DECIMAL = re.compile(r'[+-]?([0-9]+(\.[0-9]*)?|\.[0-9]+)$')
+_DOUBLE = re.compile(r'([+-]?([0-9]+(\.[0-9]*)?|\.[0-9]+)([eE][+-]?[0-9]+)?|[+-]?INF|NaN)$')
+_BOOLEAN = re.compile(r'(true|false|1|0)$')
+
+# Integer datatypes and their value ranges
+_INTEGER_TYPES = {XSD + name: (lower, upper) for name, lower, upper in [
+    ("integer", None, None),
+    ("nonPositiveInteger", None, 0),
+    ("negativeInteger", None, -1),
+    ("long", -2**63, 2**63 - 1),
+    ("int", -2**31, 2**31 - 1),
+    ("short", -2**15, 2**15 - 1),
+    ("byte", -2**7, 2**7 - 1),
+    ("nonNegativeInteger", 0, None),
+    ("unsignedLong", 0, 2**64 - 1),
+    ("unsignedInt", 0, 2**32 - 1),
+    ("unsignedShort", 0, 2**16 - 1),
+    ("unsignedByte", 0, 2**8 - 1),
+    ("positiveInteger", 1, None)]}
+_DECIMAL_TYPES = {XSD + "decimal"}
+_FLOAT_TYPES = {XSD + "float", XSD + "double"}
+
+
+def numeric_value(term: Term) -> Optional[Number]:
+    """
+    Return the value of a numeric literal
+    :param term: term to convert
+    :return: int, Decimal or float value.  None if term isn't a well formed literal of an xsd numeric datatype
+    """
+    if not isinstance(term, Literal):
+        return None
+    datatype = term.datatype
+    value = term.value
+    if datatype in _INTEGER_TYPES:
+        if not _INTEGER.match(value):
+            return None
+        rval = int(value)
+        lower, upper = _INTEGER_TYPES[datatype]
+        if (lower is not None and rval < lower) or (upper is not None and rval > upper):
+            return None
+        return rval
+    if datatype in _DECIMAL_TYPES:
+        return Decimal(value) if _DECIMAL.match(value) else None
+    if datatype in _FLOAT_TYPES:
+        return float(value) if _DOUBLE.match(value) else None
+    return None
+
+
+def lexical_test(datatype: str) -> Optional[Callable[[str], bool]]:
+    """
+    Return a test for the lexical forms of a datatype
+    :param datatype: datatype IRI
+    :return: test function or None if datatype isn't an xsd boolean or numeric type
+    """
+    if datatype in _INTEGER_TYPES:
+        lower, upper = _INTEGER_TYPES[datatype]
+        if lower is None and upper is None:
+            return lambda value: _INTEGER.match(value) is not None
+        return lambda value: _INTEGER.match(value) is not None and \
+            (lower is None or int(value) >= lower) and (upper is None or int(value) <= upper)
+    if datatype in _DECIMAL_TYPES:
+        return lambda value: _DECIMAL.match(value) is not None
+    if datatype in _FLOAT_TYPES:
+        return lambda value: _DOUBLE.match(value) is not None
+    if datatype == XSD_BOOLEAN:
+        return lambda value: _BOOLEAN.match(value) is not None
+    return None
+
+
+def well_formed(term: Literal) -> bool:
+    """
+    Determine whether the lexical form of a literal is valid for its datatype
+    :param term: literal to test
+    :return: False if the datatype is an xsd boolean or numeric type and the lexical form isn't valid for it
+    """
+    test = lexical_test(term.datatype)
+    return test is None or test(term.value)
+
+
+def digit_counts(term: Literal) -> Optional[Tuple[int, int]]:
+    """
+    Return the total and fraction digit counts of a decimal (or integer) literal
+    :param term: literal to examine
+    :return: (totaldigits, fractiondigits) or None if term isn't a well formed decimal or integer
+    """
+    if (term.datatype not in _INTEGER_TYPES and term.datatype not in _DECIMAL_TYPES) or numeric_value(term) is None:
+        return None
+    whole, _, fraction = term.value.lstrip('+-').partition('.')
+    whole = whole.lstrip('0')
+    fraction = fraction.rstrip('0')
+    return max(len(whole) + len(fraction), 1), len(fraction)
+
+
+def facet_number(value: Any) -> Number:
+    """
+    Convert a numeric facet (a ShExJ numericLiteral or a JSON number) to a number
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    text = str(value)
+    if _INTEGER.match(text):
+        return int(text)
+    try:
+        return float(text) if 'e' in text or 'E' in text else Decimal(text)
+    except InvalidOperation:
+        raise ValueError("Invalid numeric facet: {}".format(text))
+
+
+def _is_iri(term: Term) -> bool:
+    return isinstance(term, str) and not term.startswith('_:')
+
+
+def _node_kind_test(kind: str) -> Test:
+    if kind == 'iri':
+        return _is_iri
+    if kind == 'bnode':
+        return lambda term: isinstance(term, str) and term.startswith('_:')
+    if kind == 'nonliteral':
+        return lambda term: isinstance(term, str)
+    if kind == 'literal':
+        return lambda term: isinstance(term, Literal)
+    raise ValueError("Unknown nodeKind: {}".format(kind))
+
+
+def _datatype_test(datatype: str) -> Test:
+    lexical = lexical_test(datatype)
+    if lexical is None:
+        return lambda term: isinstance(term, Literal) and term.datatype == datatype
+    return lambda term: isinstance(term, Literal) and term.datatype == datatype and lexical(term.value)
+
+
+def _values_test(values: List[Any]) -> Test:
+    return ValueSetIndex(values).__contains__
+
+
+def _string_facets_test(length: Optional[int], minlength: Optional[int], maxlength: Optional[int]) -> Test:
+    """
+    Length facets apply to the lexical form of a literal or to the text of an IRI.  A blank node has neither
+    """
+    def test(term: Term) -> bool:
+        if isinstance(term, Literal):
+            n = len(term.value)
+        elif _is_iri(term):
+            n = len(term)
+        else:
+            return False
+        return (length is None or n == length) and (minlength is None or n >= minlength) and \
+               (maxlength is None or n <= maxlength)
+    return test
+
+
+def _pattern_test(pattern: str) -> Test:
+    search = re.compile(pattern).search
+
+    def test(term: Term) -> bool:
+        if isinstance(term, Literal):
+            return search(term.value) is not None
+        return _is_iri(term) and search(term) is not None
+    return test
+
+
+def _numeric_facets_test(mininclusive: Optional[Number], minexclusive: Optional[Number],
+                         maxinclusive: Optional[Number], maxexclusive: Optional[Number]) -> Test:
+    def test(term: Term) -> bool:
+        value = numeric_value(term)
+        return value is not None and \
+            (mininclusive is None or value >= mininclusive) and (minexclusive is None or value > minexclusive) and \
+            (maxinclusive is None or value <= maxinclusive) and (maxexclusive is None or value < maxexclusive)
+    return test
+
+
+def _digits_test(totaldigits: Optional[int], fractiondigits: Optional[int]) -> Test:
+    def test(term: Term) -> bool:
+        counts = digit_counts(term) if isinstance(term, Literal) else None
+        return counts is not None and (totaldigits is None or counts[0] <= totaldigits) and \
+            (fractiondigits is None or counts[1] <= fractiondigits)
+    return test
+
+
+class NodeConstraintChecker:
+    """
+    A compiled NodeConstraint.  Calling the checker with a term tests that term; check_many tests a batch
+    """
+    __slots__ = ('constraint', 'tests')
+
+    def __init__(self, constraint: ShExJ.NodeConstraint):
+        """
+        Compile constraint
+        :param constraint: NodeConstraint to compile
+        """
+        self.constraint = constraint
+        self.tests = []             # type: List[Test]      Cheapest first
+
+        def number(name: str) -> Optional[Number]:
+            value = getattr(constraint, name)
+            return facet_number(value) if value is not None else None
+
+        def integer(name: str) -> Optional[int]:
+            value = getattr(constraint, name)
+            return int(str(value)) if value is not None else None
+
+        if constraint.nodeKind is not None:
+            self.tests.append(_node_kind_test(str(constraint.nodeKind)))
+        if constraint.datatype is not None:
+            self.tests.append(_datatype_test(str(constraint.datatype)))
+        if constraint.values is not None:
+            self.tests.append(_values_test(constraint.values))
+        lengths = (integer('length'), integer('minlength'), integer('maxlength'))
+        if lengths != (None, None, None):
+            self.tests.append(_string_facets_test(*lengths))
+        bounds = (number('mininclusive'), number('minexclusive'), number('maxinclusive'), number('maxexclusive'))
+        if bounds != (None, None, None, None):
+            self.tests.append(_numeric_facets_test(*bounds))
+        digits = (integer('totaldigits'), integer('fractiondigits'))
+        if digits != (None, None):
+            self.tests.append(_digits_test(*digits))
+        if constraint.pattern is not None:
+            self.tests.append(_pattern_test(str(constraint.pattern)))
+
+    def __call__(self, term: Term) -> bool:
+        """
+        Determine whether term satisfies the constraint
+        :param term: term to test
+        :return: True if every facet is satisfied
+        """
+        for test in self.tests:
+            if not test(term):
+                return False
+        return True
+
+    def check_many(self, terms: Iterable[Term]) -> List[bool]:
+        """
+        Test a batch of terms.  The batch is tested one facet at a time, so each test runs over the terms that
+        passed the previous one, and a term that occurs more than once in the batch is only tested once.
+        :param terms: terms to test
+        :return: result for each term, in order
+        """
+        terms = terms if isinstance(terms, list) else list(terms)
+        candidates = list(dict.fromkeys(terms))
+        for test in self.tests:
+            if not candidates:
+                break
+            candidates = list(filter(test, candidates))
+        passed = set(candidates)
+        return [term in passed for term in terms]
+
+
+def compile_constraint(constraint: ShExJ.NodeConstraint) -> NodeConstraintChecker:
+    """
+    Compile a NodeConstraint
+    :param constraint: constraint to compile
+    :return: checker for the constraint
+    """
+    return NodeConstraintChecker(constraint)
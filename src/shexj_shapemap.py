@@ -0,0 +1,352 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Shape map validation of an in-memory graph against a ShExJ Schema.
+
+    graph = Graph(triples)
+    engine = ShapeMapEngine(schema, graph)
+    for result in engine.validate([(node, "http://a.example/S1"), ...]):
+        print(result.node, result.label, result.conforms)
+
+The result of testing a node against a labelled shape is kept in a memo table keyed by (node, label), and the table
+is shared by everything the engine validates -- the shape map entries themselves and every ShapeRef reached from them
+-- so a shape that many others refer to is evaluated once per node for the whole batch.  ShapeAnd, ShapeOr and ShapeNot
+are evaluated in terms of their operands, so they reach the memo through the ShapeRefs beneath them.  An external
+shape (ShapeExternal) is decided by the external function supplied to the engine, once per node.
+
+Recursive shapes are handled with a hypothesis (typing) stack: a (node, label) pair that is reached again while it is
+being evaluated is assumed to conform.  A pair that fails in spite of the assumptions fails outright, but a pair that
+conforms because of one conforms provisionally until the assumed pair is decided: if that conforms the results are
+added to the memo; if not they are discarded and recomputed if they are needed again.  This relies on negation not
+occurring on a recursive path (the schema must be stratified).
+
+The stack is explicit: before a pair is evaluated, the pairs that its node and the values of its arcs are referred to
+are pushed and decided, so a long chain of references through the data doesn't exhaust the interpreter stack.
+"""
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import ShExJ
+from shexj_nodeconstraint import compile_constraint
+from shexj_store import CacheInfo
+from shexj_terms import Term, Triple
+from shexj_tripleexpr import Arc, ShapeMatcher, schema_resolver
+
+START = "START"             # Shape map label for the start shape of the schema
+
+ShapeResult = NamedTuple('ShapeResult', [('node', Term), ('label', str), ('conforms', bool)])
+
+
+class Graph:
+    """
+    An in-memory triple store, indexed by subject and by object
+    """
+    def __init__(self, triples: Iterable[Triple] = ()):
+        self._out = {}              # type: Dict[Term, List[Arc]]      subject -> (predicate, object)
+        self._in = {}               # type: Dict[Term, List[Arc]]      object -> (predicate, subject)
+        self._size = 0
+        for triple in triples:
+            self.add(triple)
+
+    def add(self, triple: Triple) -> None:
+        s, p, o = triple
+        self._out.setdefault(s, []).append((p, o))
+        self._in.setdefault(o, []).append((p, s))
+        self._size += 1
+
+    def outgoing(self, node: Term) -> List[Arc]:
+        return self._out.get(node, [])
+
+    def incoming(self, node: Term) -> List[Arc]:
+        return self._in.get(node, [])
+
+    def subjects(self) -> Iterator[Term]:
+        return iter(self._out)
+
+    def __len__(self) -> int:
+        return self._size
+
+
+class ShapeMapEngine:
+    """
+    Validate (node, shape label) pairs against a schema
+    """
+    def __init__(self, schema: ShExJ.Schema, graph: Graph, external: Optional[Callable[[Term, str], bool]] = None):
+        """
+        Construct an engine.  Shapes and NodeConstraints are compiled as they are first needed
+        :param schema: Schema to validate against
+        :param graph: data to validate
+        :param external: function that determines whether a node conforms to a ShapeExternal -- called with the node
+        and the label of the shape.  If absent, testing a node against a ShapeExternal raises ValueError
+        """
+        self.schema = schema
+        self.graph = graph
+        self.external = external
+        self.shapes = {str(label): expr for label, expr in (schema.shapes or {}).items()}
+        if schema.start is not None:
+            self.shapes[START] = schema.start
+        self._resolver = schema_resolver(schema)
+        self._compiled = {}         # type: Dict[int, Any]     id(Shape or NodeConstraint) -> ShapeMatcher or checker
+        self._memo = {}             # type: Dict[Tuple[Term, str], bool]
+        self._hits = self._misses = 0
+        # Hypothesis stack
+        self._stack = []            # type: List[Tuple[Term, str]]     pairs being evaluated
+        self._depth = {}            # type: Dict[Tuple[Term, str], int]  pair -> stack position
+        self._low = []              # type: List[int]   lowest stack position each frame's result assumes
+        self._tentative = {}        # type: Dict[int, List[Tuple[Term, str]]]  position -> pairs that conform if it does
+        self._provisional = {}      # type: Dict[Tuple[Term, str], int]        pair -> position it relies on
+        self._refs = {}             # type: Dict[int, Dict[Tuple[str, bool], List[str]]]  id(Shape) -> references
+
+    def _compile(self, expr: Any) -> Any:
+        compiled = self._compiled.get(id(expr))
+        if compiled is None:
+            if isinstance(expr, ShExJ.Shape):
+                compiled = ShapeMatcher(expr, self._resolver, self._value_test)
+            else:
+                compiled = compile_constraint(expr)
+            self._compiled[id(expr)] = compiled
+        return compiled
+
+    def prepare(self) -> None:
+        """
+        Compile every Shape and NodeConstraint in the schema now rather than as they are first needed, so that the
+        compiled forms can be shared by processes forked from this one
+        """
+        todo = list(self.shapes.values())
+        seen = set()
+        while todo:
+            expr = todo.pop()
+            if id(expr) in seen:
+                continue
+            seen.add(id(expr))
+            if isinstance(expr, ShExJ.Shape):
+                matcher = self._compile(expr)
+                todo += [tc.valueExpr for tc in matcher.constraints if tc.valueExpr is not None]
+                todo += [tc.valueExpr for tcs in matcher.negations.values() for tc in tcs if tc.valueExpr is not None]
+                self._references(expr)
+            elif isinstance(expr, ShExJ.NodeConstraint):
+                self._compile(expr)
+            elif isinstance(expr, (ShExJ.ShapeAnd, ShExJ.ShapeOr)):
+                todo += expr.shapeExprs
+            elif isinstance(expr, ShExJ.ShapeNot):
+                todo.append(expr.shapeExpr)
+
+    def _value_test(self, expr: Any, value: Term) -> bool:
+        return self.satisfies(value, expr)
+
+    def satisfies(self, node: Term, expr: Any, label: Optional[str] = None) -> bool:
+        """
+        Determine whether node satisfies a shape expression
+        :param node: node to test
+        :param expr: shape expression
+        :param label: label of expr, if it is a labelled shape (needed for ShapeExternal)
+        :return: True if node conforms
+        """
+        if isinstance(expr, ShExJ.ShapeRef):
+            return self.conforms(node, str(expr.reference))
+        if isinstance(expr, ShExJ.Shape):
+            return self._compile(expr).match_arcs(self.graph.outgoing(node), self.graph.incoming(node))
+        if isinstance(expr, ShExJ.NodeConstraint):
+            return self._compile(expr)(node)
+        if isinstance(expr, ShExJ.ShapeAnd):
+            return all(self.satisfies(node, e) for e in expr.shapeExprs)
+        if isinstance(expr, ShExJ.ShapeOr):
+            return any(self.satisfies(node, e) for e in expr.shapeExprs)
+        if isinstance(expr, ShExJ.ShapeNot):
+            return not self.satisfies(node, expr.shapeExpr)
+        if isinstance(expr, ShExJ.ShapeExternal):
+            if self.external is None:
+                raise ValueError("Shape {} is external and no external function was supplied".format(label))
+            if label is None:
+                raise ValueError("An external shape must be a labelled shape")
+            return bool(self.external(node, label))
+        raise ValueError("Unrecognized shape expression: {}".format(type(expr).__name__))
+
+    def conforms(self, node: Term, label: str) -> bool:
+        """
+        Determine whether node conforms to the shape named label
+        :param node: node to test
+        :param label: shape label (or START)
+        :return: True if node conforms
+        """
+        key = (node, label)
+        rval = self._memo.get(key)
+        if rval is not None:
+            self._hits += 1
+            return rval
+        if self._assume(key):
+            return True
+        self._evaluate(key)
+        rval = self._memo.get(key)
+        return rval if rval is not None else self._assume(key)
+
+    def _assume(self, key: Tuple[Term, str]) -> bool:
+        """
+        If key is being evaluated, or conforms provided that a pair that is being evaluated does, record that the
+        evaluation at the top of the stack relies on that
+        :return: True if key is assumed to conform
+        """
+        position = self._depth.get(key)
+        if position is None:
+            position = self._provisional.get(key)
+            if position is None:
+                return False
+        if position < self._low[-1]:
+            self._low[-1] = position
+        return True
+
+    def _references(self, shape: ShExJ.Shape) -> Dict[Tuple[str, bool], List[str]]:
+        """
+        Return the labels that the value expressions of a shape refer to (not counting those inside nested Shapes),
+        by predicate and direction
+        """
+        refs = self._refs.get(id(shape))
+        if refs is None:
+            matcher = self._compile(shape)
+            refs = {}
+            for key in matcher.predicates.keys() | matcher.negations.keys():
+                labels = []
+                todo = [matcher.constraints[i].valueExpr for i in matcher.predicates.get(key, ())] + \
+                       [tc.valueExpr for tc in matcher.negations.get(key, ())]
+                while todo:
+                    expr = todo.pop()
+                    if isinstance(expr, ShExJ.ShapeRef):
+                        labels.append(str(expr.reference))
+                    elif isinstance(expr, (ShExJ.ShapeAnd, ShExJ.ShapeOr)):
+                        todo += expr.shapeExprs
+                    elif isinstance(expr, ShExJ.ShapeNot):
+                        todo.append(expr.shapeExpr)
+                if labels:
+                    refs[key] = labels
+            self._refs[id(shape)] = refs
+        return refs
+
+    def _dependencies(self, key: Tuple[Term, str]) -> Iterator[Tuple[Term, str]]:
+        """
+        Generate the (node, label) pairs that evaluating key will ask about -- the shapes the node itself must
+        conform to and those of the values of its arcs
+        """
+        node, label = key
+        todo = [self.shapes[label]]
+        while todo:
+            expr = todo.pop()
+            if isinstance(expr, ShExJ.ShapeRef):
+                yield node, str(expr.reference)
+            elif isinstance(expr, (ShExJ.ShapeAnd, ShExJ.ShapeOr)):
+                todo += expr.shapeExprs
+            elif isinstance(expr, ShExJ.ShapeNot):
+                todo.append(expr.shapeExpr)
+            elif isinstance(expr, ShExJ.Shape):
+                refs = self._references(expr)
+                if refs:
+                    for arcs, inverse in ((self.graph.outgoing(node), False), (self.graph.incoming(node), True)):
+                        for predicate, value in arcs:
+                            for ref in refs.get((predicate, inverse), ()):
+                                yield value, ref
+
+    def _push(self, key: Tuple[Term, str]) -> None:
+        if key[1] not in self.shapes:
+            raise ValueError("Shape {} is not in the schema".format(key[1]))
+        self._misses += 1
+        self._depth[key] = len(self._stack)
+        self._low.append(len(self._stack))
+        self._stack.append(key)
+
+    def _pop(self) -> Tuple[Tuple[Term, str], int, int, List[Tuple[Term, str]]]:
+        """
+        Remove the top of the hypothesis stack
+        :return: pair, its position, lowest position it relies on, the pairs that rely on it
+        """
+        key = self._stack.pop()
+        del self._depth[key]
+        return key, len(self._stack), self._low.pop(), self._tentative.pop(len(self._stack), [])
+
+    def _evaluate(self, key: Tuple[Term, str]) -> None:
+        """
+        Decide key.  The pairs it depends on are decided first, depth first, with an explicit stack, so that by the
+        time a pair is evaluated everything it asks about is in the memo, being evaluated or conforms provisionally.
+        """
+        base = len(self._stack)
+        self._push(key)
+        pending = [self._dependencies(key)]
+        try:
+            while pending:
+                dependency = next(pending[-1], None)
+                if dependency is not None:
+                    if dependency not in self._memo and dependency not in self._depth and \
+                            dependency not in self._provisional:
+                        self._push(dependency)
+                        pending.append(self._dependencies(dependency))
+                    continue
+                pending.pop()
+                node, label = self._stack[-1]
+                rval = self.satisfies(node, self.shapes[label], label)
+                self._resolve(rval)
+        except BaseException:
+            while len(self._stack) > base:
+                for pair in self._pop()[3]:
+                    del self._provisional[pair]
+            raise
+
+    def _resolve(self, rval: bool) -> None:
+        """
+        Record the result of the pair at the top of the stack and remove it
+        """
+        key, position, low, tentative = self._pop()
+        if low == position or not rval:
+            # Either nothing it assumed is still undecided, or it failed even though the undecided pairs were
+            # assumed to conform (which they may not), so the result is final.  The pairs that assumed it conform
+            # if it does
+            self._memo[key] = rval
+            for pair in tentative:
+                del self._provisional[pair]
+                if rval:
+                    self._memo[pair] = True
+        else:
+            # Conforms, provided that a pair further down the stack does
+            if low < self._low[-1]:
+                self._low[-1] = low
+            tentative.append(key)
+            self._tentative.setdefault(low, []).extend(tentative)
+            for pair in tentative:
+                self._provisional[pair] = low
+
+    def validate(self, shape_map: Iterable[Tuple[Term, str]]) -> Iterator[ShapeResult]:
+        """
+        Validate a shape map
+        :param shape_map: (node, shape label) pairs
+        :return: result for each pair, in order
+        """
+        for node, label in shape_map:
+            yield ShapeResult(node, str(label), self.conforms(node, str(label)))
+
+    def cache_info(self) -> CacheInfo:
+        return CacheInfo(self._hits, self._misses, None, len(self._memo))
+
+    def cache_clear(self) -> None:
+        self._memo.clear()
+        self._hits = self._misses = 0
@@ -0,0 +1,142 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Shape map validation across a process pool.
+
+    engine = ShapeMapEngine(schema, Graph(triples))
+    stats = {}
+    for result in validate_parallel(engine, shape_map, workers=64, stats=stats):
+        print(result.node, result.label, result.conforms)
+    print_stats(stats)
+
+The engine -- schema, graph and compiled shapes -- is prepared in this process and the workers are forked from it,
+so they share its pages copy-on-write rather than receiving a pickled copy (where the gc module can, the objects that
+exist at that point are also moved out of the collector's reach, so collections in the workers don't touch them).
+The shape map is divided into contiguous chunks, which keeps nodes that refer to each other in the same worker where
+the map allows it; only the chunk boundaries go to the workers and only the outcomes come back.  Each worker keeps
+its own (node, label) memo for the chunks it validates.  The results are yielded in shape map order as the chunks
+complete.
+
+On platforms that can't fork, or with a single worker, the map is validated by the engine in this process.
+"""
+import gc
+import multiprocessing
+import os
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, TextIO, Tuple
+
+from shexj_shapemap import ShapeMapEngine, ShapeResult
+from shexj_terms import Term
+
+CHUNKS_PER_WORKER = 4           # type: int     Chunks queued per worker (smooths out uneven nodes)
+MAX_CHUNK = 1000                # type: int     Largest chunk (bounds the delay before the first result)
+
+WorkerStats = NamedTuple('WorkerStats', [('pid', int), ('chunks', int), ('nodes', int), ('elapsed', float)])
+
+_engine = None                  # type: Optional[ShapeMapEngine]             Engine of a worker process
+_shape_map = None               # type: Optional[List[Tuple[Term, str]]]    Shape map of a worker process
+
+
+def _init_worker(engine: ShapeMapEngine, shape_map: List[Tuple[Term, str]]) -> None:
+    """
+    Pool initializer -- install the engine and shape map in a worker.  The workers are forked, so the arguments are
+    inherited rather than pickled, and as they are only set in the workers, any number of validate_parallel calls can
+    be in progress at once
+    :param engine: engine to validate with
+    :param shape_map: (node, shape label) pairs
+    """
+    global _engine, _shape_map
+    _engine, _shape_map = engine, shape_map
+
+
+def _validate_chunk(bounds: Tuple[int, int]) -> Tuple[int, List[bool], float]:
+    """
+    Validate a chunk of the shape map
+    :param bounds: start and end index
+    :return: worker process id, outcome for each entry and elapsed time
+    """
+    start = time.perf_counter()
+    rval = [_engine.conforms(node, label) for node, label in _shape_map[bounds[0]:bounds[1]]]
+    return os.getpid(), rval, time.perf_counter() - start
+
+
+def validate_parallel(engine: ShapeMapEngine, shape_map: Iterable[Tuple[Term, str]],
+                      workers: Optional[int] = None, stats: Optional[Dict[int, WorkerStats]] = None) \
+        -> Iterator[ShapeResult]:
+    """
+    Validate a shape map in a process pool.  The results are those of engine.validate(shape_map)
+    :param engine: engine to validate with
+    :param shape_map: (node, shape label) pairs
+    :param workers: number of worker processes.  Default: os.cpu_count()
+    :param stats: if present, receives the work done by each worker, by process id
+    :return: result for each pair, in order
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    shape_map = [(node, str(label)) for node, label in shape_map]
+    if workers < 2 or len(shape_map) < 2 or 'fork' not in multiprocessing.get_all_start_methods():
+        start = time.perf_counter()
+        yield from engine.validate(shape_map)
+        if stats is not None:
+            stats[os.getpid()] = WorkerStats(os.getpid(), 1, len(shape_map), time.perf_counter() - start)
+        return
+
+    nchunks = max(min(len(shape_map), workers * CHUNKS_PER_WORKER), -(-len(shape_map) // MAX_CHUNK))
+    bounds = [len(shape_map) * i // nchunks for i in range(nchunks + 1)]
+    engine.prepare()
+    freeze = getattr(gc, 'freeze', None)            # Python 3.7+
+    if freeze:
+        gc.collect()
+        freeze()
+    pool = multiprocessing.get_context('fork').Pool(workers, _init_worker, (engine, shape_map))
+    try:
+        for (start, end), (pid, outcomes, elapsed) in zip(zip(bounds, bounds[1:]),
+                                                          pool.imap(_validate_chunk, zip(bounds, bounds[1:]))):
+            if stats is not None:
+                prev = stats.get(pid, WorkerStats(pid, 0, 0, 0.0))
+                stats[pid] = WorkerStats(pid, prev.chunks + 1, prev.nodes + end - start, prev.elapsed + elapsed)
+            for (node, label), conforms in zip(shape_map[start:end], outcomes):
+                yield ShapeResult(node, label, conforms)
+    finally:
+        pool.terminate()
+        if freeze:
+            gc.unfreeze()
+
+
+def print_stats(stats: Dict[int, WorkerStats], file: TextIO = sys.stdout) -> None:
+    """
+    Print the throughput of each worker
+    :param stats: stats filled in by validate_parallel
+    :param file: output
+    """
+    for s in sorted(stats.values(), key=lambda s: s.pid):
+        print("Worker {}: {} nodes in {} chunks, {:.3f}s  ({:.0f} nodes/sec)"
+              .format(s.pid, s.nodes, s.chunks, s.elapsed, s.nodes / s.elapsed if s.elapsed else 0.0), file=file)
+    nodes = sum(s.nodes for s in stats.values())
+    print("Total: {} nodes, {} workers".format(nodes, len(stats)), file=file)
@@ -0,0 +1,215 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Read-only, memory-mapped shape store for very large ShExJ schemas.
+
+    shexj_store.build(schema, "schema.store")
+    with ShapeStore("schema.store") as store:
+        shape = store["http://a.example/S1"]
+
+Each shape expression is stored as an independent snapshot (see: jsg_snapshot) and the file is opened with mmap, so a
+lookup decodes only the one shape it needs and the processes on a host share a single copy of the file through the
+page cache.  Decoded shapes are kept in a bounded LRU cache.  The snapshots share the ShExJ type and member names as a
+base string table (jsg_snapshot.module_strings), whose checksum is recorded in the header.
+
+Format (all integers are unsigned, little endian):
+    header:   magic (b'JSGM'), version (16 bits), flags (16 bits), shape count (32 bits),
+              index offset (64 bits), index length (64 bits), index crc32 (32 bits), base table crc32 (32 bits)
+    schema:   snapshot of the schema without its shapes
+    shapes:   one snapshot per shape
+    index:    label lengths (in characters, 32 bits each), shape offsets (64 bits each, plus the end of the last shape),
+              labels (UTF-8)
+"""
+import mmap
+import sys
+import zlib
+from array import array
+from collections import OrderedDict
+from collections.abc import Mapping
+from struct import Struct
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+import ShExJ
+import jsg_snapshot
+from jsg_snapshot import SnapshotError
+
+MAGIC = b'JSGM'
+VERSION = 1
+
+_HEADER = Struct('<4sHHIQQII')
+_LENGTH = 'I' if array('I').itemsize == 4 else 'L'
+_OFFSET = 'Q'
+
+
+def _base_crc(base: List[str]) -> int:
+    return zlib.crc32('\0'.join(base).encode('utf-8'))
+
+
+CacheInfo = NamedTuple('CacheInfo', [('hits', int), ('misses', int), ('maxsize', int), ('currsize', int)])
+
+
+def build(schema: ShExJ.Schema, path: str, validate: bool = True) -> None:
+    """
+    Write a shape store for schema
+    :param schema: schema to store
+    :param path: file name
+    :param validate: if True, schema must be valid
+    """
+    if validate and not schema._is_valid():
+        raise ValueError("Only a valid Schema can be stored")
+    shapes = schema.shapes or {}
+    rest = ShExJ.Schema.__new__(ShExJ.Schema)
+    rest.__dict__.update(schema.__dict__)
+    rest.__dict__['shapes'] = None
+    labels = []                 # type: List[str]
+    base = jsg_snapshot.module_strings(ShExJ)
+    with open(path, 'wb') as f:
+        f.write(bytes(_HEADER.size))
+        f.write(jsg_snapshot.dumps(rest, validate=False, base=base))
+        offsets = array(_OFFSET, [f.tell()])
+        for label, shape in shapes.items():
+            labels.append(str(label))
+            f.write(jsg_snapshot.dumps(shape, validate=False, base=base))
+            offsets.append(f.tell())
+        lengths = array(_LENGTH, [len(label) for label in labels])
+        if sys.byteorder == 'big':
+            lengths.byteswap()
+            offsets.byteswap()
+        index = b''.join([lengths.tobytes(), offsets.tobytes(), ''.join(labels).encode('utf-8')])
+        index_offset = f.tell()
+        f.write(index)
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, VERSION, 0, len(labels), index_offset, len(index), zlib.crc32(index),
+                             _base_crc(base)))
+
+
+class ShapeStore(Mapping):
+    """
+    Label to shape expression map over a store file
+    """
+    def __init__(self, path: str, cache_size: int = 1024):
+        """
+        Open a store
+        :param path: file name
+        :param cache_size: maximum number of decoded shapes to keep
+        """
+        self.cache_size = cache_size
+        self._cache = OrderedDict()         # type: OrderedDict
+        self._hits = self._misses = 0
+        self._schema = None                 # type: Optional[ShExJ.Schema]
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._open()
+        except Exception:
+            self._mm.close()
+            raise
+
+    def _open(self) -> None:
+        mm = self._mm
+        if len(mm) < _HEADER.size:
+            raise SnapshotError("Store is truncated")
+        magic, version, _, count, index_offset, index_len, crc, base_crc = _HEADER.unpack_from(mm)
+        if magic != MAGIC:
+            raise SnapshotError("Not a shape store")
+        if version != VERSION:
+            raise SnapshotError("Unsupported store version: {}".format(version))
+        self._base = jsg_snapshot.module_strings(ShExJ)
+        if _base_crc(self._base) != base_crc:
+            raise SnapshotError("Store was built with a different version of ShExJ")
+        if index_offset + index_len != len(mm):
+            raise SnapshotError("Store is truncated")
+        index = mm[index_offset:]
+        if zlib.crc32(index) != crc:
+            raise SnapshotError("Store checksum mismatch")
+        lengths = array(_LENGTH)
+        lengths.frombytes(index[:4 * count])
+        offsets = array(_OFFSET)
+        offsets.frombytes(index[4 * count:12 * count + 8])
+        if sys.byteorder == 'big':
+            lengths.byteswap()
+            offsets.byteswap()
+        text = str(index[12 * count + 8:], 'utf-8')
+        self._offsets = offsets
+        self._index = {}                    # type: Dict[str, int]   Label to shape number
+        start = 0
+        for i, n in enumerate(lengths):
+            self._index[text[start:start + n]] = i
+            start += n
+
+    def _decode(self, start: int, end: int) -> Any:
+        return jsg_snapshot.loads(self._mm[start:end], ShExJ, self._base)
+
+    @property
+    def schema(self) -> ShExJ.Schema:
+        """ The schema without its shapes (prefixes, base, startActs and start) """
+        if self._schema is None:
+            self._schema = self._decode(_HEADER.size, self._offsets[0])
+        return self._schema
+
+    def __getitem__(self, label: Any) -> Any:
+        label = str(label)
+        shape = self._cache.get(label)
+        if shape is not None:
+            self._cache.move_to_end(label)
+            self._hits += 1
+            return shape
+        i = self._index[label]
+        self._misses += 1
+        shape = self._decode(self._offsets[i], self._offsets[i + 1])
+        if self.cache_size > 0:
+            self._cache[label] = shape
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return shape
+
+    def __contains__(self, label: Any) -> bool:
+        return str(label) in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def cache_info(self) -> CacheInfo:
+        return CacheInfo(self._hits, self._misses, self.cache_size, len(self._cache))
+
+    def cache_clear(self) -> None:
+        self._cache.clear()
+        self._hits = self._misses = 0
+
+    def close(self) -> None:
+        self._cache.clear()
+        self._mm.close()
+
+    def __enter__(self) -> "ShapeStore":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
@@ -0,0 +1,116 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+RDF terms for validating data against ShExJ schemas.
+
+Terms use the same conventions as ShExJ itself, so that labels and values can be taken from a schema as they are:
+    IRIs are (python) strings                           "http://a.example/p1"
+    blank nodes are strings that start with "_:"        "_:b1"
+    literals are Literal tuples                         Literal("5", XSD_INTEGER, None)
+
+Every term is hashable and compares by value.  A literal with no datatype is an xsd:string; a literal with a
+language tag is an rdf:langString and its tag is kept in lower case.
+"""
+from typing import NamedTuple, Optional, Union, Any, Tuple
+
+XSD = "http://www.w3.org/2001/XMLSchema#"
+RDF = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+
+XSD_STRING = XSD + "string"
+XSD_BOOLEAN = XSD + "boolean"
+XSD_INTEGER = XSD + "integer"
+XSD_DECIMAL = XSD + "decimal"
+XSD_DOUBLE = XSD + "double"
+RDF_LANGSTRING = RDF + "langString"
+
+Literal = NamedTuple('Literal', [('value', str), ('datatype', str), ('language', Optional[str])])
+
+Term = Union[str, Literal]
+Triple = Tuple[Term, str, Term]             # subject, predicate, object
+
+
+def literal(value: Any, datatype: Optional[str] = None, language: Optional[str] = None) -> Literal:
+    """
+    Construct a literal
+    :param value: lexical form
+    :param datatype: datatype IRI.  Default: xsd:string (rdf:langString if language is supplied)
+    :param language: language tag
+    :return: Literal
+    """
+    if language:
+        return Literal(str(value), RDF_LANGSTRING, str(language).lower())
+    return Literal(str(value), str(datatype) if datatype is not None else XSD_STRING, None)
+
+
+def is_iri(term: Term) -> bool:
+    return isinstance(term, str) and not term.startswith('_:')
+
+
+def is_bnode(term: Term) -> bool:
+    return isinstance(term, str) and term.startswith('_:')
+
+
+def is_literal(term: Term) -> bool:
+    return isinstance(term, Literal)
+
+
+def from_shexj(value: Any) -> Term:
+    """
+    Convert a ShExJ objectValue or shapeLabel (IRI, BNODE or RDFLiteral) into a term
+    :param value: ShExJ string, e.g. 'http://a.example/v1', '"chat"@fr' or '"5"^^http://www.w3.org/2001/XMLSchema#int'
+    :return: term
+    """
+    text = str(value)
+    if not text.startswith('"'):
+        return text
+    close = text.rfind('"')
+    if close < 1:
+        raise ValueError("Unterminated literal: {}".format(text))
+    lexical = text[1:close].replace('\\"', '"')
+    rest = text[close + 1:]
+    if rest.startswith('^^'):
+        return literal(lexical, rest[2:])
+    if rest.startswith('@'):
+        return literal(lexical, language=rest[1:])
+    if rest:
+        raise ValueError("Unrecognized literal: {}".format(text))
+    return literal(lexical)
+
+
+def to_shexj(term: Term) -> str:
+    """
+    Convert a term into its ShExJ string form.  The inverse of from_shexj
+    :param term: term to convert
+    :return: ShExJ string
+    """
+    if not isinstance(term, Literal):
+        return term
+    text = '"{}"'.format(term.value.replace('"', '\\"'))
+    if term.language:
+        return text + '@' + term.language
+    return text if term.datatype == XSD_STRING else text + '^^' + term.datatype
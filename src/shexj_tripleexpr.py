@@ -0,0 +1,345 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Matching the neighbourhood of a node against a ShExJ Shape.
+
+    matcher = ShapeMatcher(shape, resolve=schema_resolver(schema))
+    matcher.matches(node, triples)                  # triples: (subject, predicate, object) tuples
+    matcher.match_arcs(outgoing, incoming)          # arcs: (predicate, value) tuples
+
+The triple expression of the shape is compiled once.  Its TripleConstraints are indexed by predicate and direction,
+so each arc of a node is only tested against the constraints that name its predicate (dispatch) and the value test
+of those constraints.  Arcs with the same set of candidate constraints are interchangeable, so only the number of
+them assigned to each constraint matters.  In the usual case, where every arc has a single candidate, the assignment
+is fixed; otherwise the possible counts are enumerated, not the assignments of individual arcs.
+
+A set of counts is checked against the expression with interval arithmetic (Boneva, Labra Gayo, Staworko): every
+subexpression yields the interval of the number of times it can be repeated to produce the counts below it --
+TripleConstraint count c gives [c, c], EachOf intersects the intervals of its expressions, OneOf adds them and a
+cardinality of {n, m} turns [l, u] into [ceil(l / m), floor(u / n)].  The counts match if the expression can be
+repeated exactly once.  This is exact because each TripleConstraint occurs once in the compiled expression.
+
+Outgoing arcs that satisfy a TripleConstraint must be matched by the expression.  Outgoing arcs whose predicate
+appears in the expression but that satisfy none of its constraints are allowed only if the predicate is listed in
+extra, and arcs whose predicate doesn't appear at all are allowed only if the shape isn't closed.  Incoming arcs need
+not be matched.  Semantic actions are ignored.
+
+A negated TripleConstraint is not part of the count program: a node with an arc (in the constraint's direction) that
+satisfies it doesn't match, and arcs with its predicate that don't satisfy it are allowed.  In the expression it
+stands for the empty match.  A Shape that inherits from other shapes is matched as if its expression were an EachOf of
+Inclusions of the labels it inherits and its own expression -- only the triple expressions are inherited, not closed,
+extra or semantic actions, and the labels must name Shapes or triple expressions.
+
+A value expression that is a NodeConstraint is compiled (see: shexj_nodeconstraint); any other value expression is
+passed to the value_test function, which takes the expression and the value and returns True if the value conforms.
+"""
+from itertools import product
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import ShExJ
+from shexj_nodeconstraint import compile_constraint
+from shexj_terms import Term, Triple
+
+Arc = Tuple[str, Term]                  # predicate, value (object of an outgoing arc, subject of an incoming one)
+ValueTest = Callable[[Any, Term], bool]
+
+UNBOUNDED = float('inf')
+
+_TC, _EACH, _ONE, _EMPTY = range(4)
+
+
+def cardinality(expr: Any) -> Tuple[int, float]:
+    """
+    Return the (min, max) cardinality of a triple expression.  Default {1, 1}; max is UNBOUNDED for "*" or -1
+    """
+    n = 1 if expr.min is None else int(str(expr.min))
+    if expr.max is None:
+        m = 1
+    else:
+        m = str(expr.max)
+        m = UNBOUNDED if m in ('*', '-1') else int(m)
+    return n, m
+
+
+def _true(value: Any) -> bool:
+    """ Interpret an optional ShExJ BOOL """
+    return value is not None and str(value).lower() == 'true'
+
+
+def shape_expression(shape: ShExJ.Shape) -> Any:
+    """
+    Return the triple expression of a shape, including (by way of Inclusions) the expressions of the shapes it inherits
+    from
+    """
+    if not shape.inherit:
+        return shape.expression
+    expressions = [ShExJ.Inclusion(include=label) for label in shape.inherit]
+    if shape.expression is not None:
+        expressions.append(shape.expression)
+    return expressions[0] if len(expressions) == 1 else ShExJ.EachOf(expressions=expressions)
+
+
+def schema_resolver(schema: ShExJ.Schema) -> Callable[[str], Any]:
+    """
+    Return a function that looks up the triple expression of an Inclusion (or an inherited shape) in schema.  A label
+    may name a Shape, whose expression (see: shape_expression) is included, or a triple expression.
+    """
+    shapes = {str(label): expr for label, expr in (schema.shapes or {}).items()}
+    expressions = {}            # type: Dict[str, Any]
+
+    def resolve(label: str) -> Any:
+        if label not in expressions:
+            expr = shapes.get(label)
+            if expr is None:
+                raise ValueError("Included shape {} is not in the schema".format(label))
+            expressions[label] = shape_expression(expr) if isinstance(expr, ShExJ.Shape) else expr
+        return expressions[label]
+    return resolve
+
+
+def _card(l: float, u: float, n: int, m: float) -> Tuple[float, float]:
+    """
+    Apply a cardinality of {n, m} to an interval [l, u]
+    :return: [k | some j in [k * n, k * m] is in [l, u]].  Empty intervals have l > u
+    """
+    if l > u:
+        return 1, 0
+    if l == 0:
+        lo = 0
+    elif m == UNBOUNDED:
+        lo = 1
+    else:
+        lo = -(-l // m)
+    hi = UNBOUNDED if n == 0 or u == UNBOUNDED else u // n
+    return lo, hi
+
+
+def _distributions(count: int, caps: List[float]) -> Iterator[Tuple[int, ...]]:
+    """
+    Generate the ways of distributing count identical arcs over len(caps) constraints, no more than caps[i] to the
+    i'th one
+    """
+    if len(caps) == 1:
+        if count <= caps[0]:
+            yield (count, )
+        return
+    for first in range(int(min(count, caps[0])) + 1):
+        for rest in _distributions(count - first, caps[1:]):
+            yield (first, ) + rest
+
+
+class ShapeMatcher:
+    """
+    A compiled Shape
+    """
+    def __init__(self, shape: ShExJ.Shape, resolve: Optional[Callable[[str], Any]] = None,
+                 value_test: Optional[ValueTest] = None):
+        """
+        Compile shape
+        :param shape: Shape to compile
+        :param resolve: function that returns the triple expression included by a label (see: schema_resolver)
+        :param value_test: function that tests a value against a value expression other than a NodeConstraint
+        """
+        self.shape = shape
+        self.closed = _true(shape.closed)
+        self.extra = frozenset(str(p) for p in shape.extra or ())
+        self.value_test = value_test
+        self.constraints = []       # type: List[ShExJ.TripleConstraint]   in expression order
+        self.tests = []             # type: List[Optional[Callable[[Term], bool]]]
+        self.limits = []            # type: List[float]         most arcs each constraint can match
+        self.program = []           # type: List[tuple]         the expression in postorder
+        self.predicates = {}        # type: Dict[Tuple[str, bool], List[int]]  (predicate, inverse) -> constraints
+        self.negations = {}         # type: Dict[Tuple[str, bool], List[ShExJ.TripleConstraint]]   negated constraints
+        expression = shape_expression(shape)
+        if expression is not None:
+            self._compile(expression, resolve)
+        self._dispatch = {key: tuple((i, self.tests[i]) for i in constraints)
+                          for key, constraints in self.predicates.items()}
+        self._negated = {key: tuple(self._value_test(tc.valueExpr) for tc in constraints)
+                         for key, constraints in self.negations.items()}
+
+    def _value_test(self, expr: Any) -> Optional[Callable[[Term], bool]]:
+        if expr is None:
+            return None
+        if isinstance(expr, ShExJ.NodeConstraint):
+            checker = compile_constraint(expr)
+            return None if not checker.tests else checker.tests[0] if len(checker.tests) == 1 else checker
+        if self.value_test is None:
+            raise ValueError("A value_test is needed for {} value expressions".format(type(expr).__name__))
+        value_test = self.value_test
+        return lambda value: value_test(expr, value)
+
+    def _compile(self, expression: Any, resolve: Optional[Callable[[str], Any]]) -> None:
+        """
+        Flatten the expression into a postorder program, expanding inclusions
+        """
+        todo = [(expression, False, 1, frozenset())]   # expression, children done, max product of ancestors, includes
+        while todo:
+            expr, done, limit, including = todo.pop()
+            if isinstance(expr, ShExJ.Inclusion):
+                label = str(expr.include)
+                if label in including:
+                    raise ValueError("Circular inclusion of {}".format(label))
+                if resolve is None:
+                    raise ValueError("Inclusion of {} needs a resolver".format(label))
+                todo.append((resolve(label), False, limit, including | {label}))
+            elif expr is None:
+                # A Shape with no expression (inherited or included) matches nothing
+                self.program.append((_EMPTY, 0, 0, UNBOUNDED))
+            elif isinstance(expr, ShExJ.TripleConstraint) and _true(expr.negated):
+                self.negations.setdefault((str(expr.predicate), _true(expr.inverse)), []).append(expr)
+                self.program.append((_EMPTY, 0, 0, UNBOUNDED))
+            elif isinstance(expr, ShExJ.TripleConstraint):
+                n, m = cardinality(expr)
+                i = len(self.constraints)
+                self.constraints.append(expr)
+                self.tests.append(self._value_test(expr.valueExpr))
+                self.limits.append(limit * m if m else 0)
+                inverse = _true(expr.inverse)
+                self.predicates.setdefault((str(expr.predicate), inverse), []).append(i)
+                self.program.append((_TC, i, n, m))
+            elif isinstance(expr, (ShExJ.EachOf, ShExJ.OneOf)):
+                n, m = cardinality(expr)
+                if done:
+                    self.program.append((_EACH if isinstance(expr, ShExJ.EachOf) else _ONE,
+                                         len(expr.expressions), n, m))
+                else:
+                    todo.append((expr, True, limit, including))
+                    todo += ((e, False, limit * m if m else 0, including) for e in reversed(expr.expressions))
+            else:
+                raise ValueError("Unrecognized triple expression: {}".format(type(expr).__name__))
+
+    def _accepts(self, counts: List[int]) -> bool:
+        """
+        Determine whether the expression matches the given number of arcs for each constraint
+        """
+        stack = []
+        push = stack.append
+        for op, arg, n, m in self.program:
+            if op == _TC:
+                c = counts[arg]
+                push(_card(c, c, n, m) if c else (0, UNBOUNDED if n == 0 else 0))
+                continue
+            if op == _EMPTY:
+                push((0, UNBOUNDED))
+                continue
+            l = 0
+            u = UNBOUNDED if op == _EACH else 0
+            for il, iu in stack[len(stack) - arg:]:
+                if op == _EACH:
+                    if il > l:
+                        l = il
+                    if iu < u:
+                        u = iu
+                elif il > iu:
+                    # Arcs that an expression can't match can't be matched by the others either
+                    l, u = 1, 0
+                    break
+                else:
+                    l += il
+                    u += iu
+            del stack[len(stack) - arg:]
+            push(_card(l, u, n, m))
+        l, u = stack[0]
+        return l <= 1 <= u
+
+    def match_arcs(self, outgoing: Iterable[Arc], incoming: Iterable[Arc] = ()) -> bool:
+        """
+        Determine whether the arcs of a node match the shape
+        :param outgoing: (predicate, object) for each triple whose subject is the node
+        :param incoming: (predicate, subject) for each triple whose object is the node
+        :return: True if the arcs match
+        """
+        counts = [0] * len(self.constraints)
+        groups = {}                 # type: Dict[Tuple[Tuple[int, ...], bool], int]  (candidates, optional) -> count
+        dispatch = self._dispatch
+        negated = self._negated
+        for arcs, inverse in ((outgoing, False), (incoming, True)):
+            for predicate, value in arcs:
+                entries = dispatch.get((predicate, inverse))
+                if negated:
+                    tests = negated.get((predicate, inverse))
+                    if tests is not None:
+                        for test in tests:
+                            if test is None or test(value):
+                                return False
+                        if entries is None:
+                            continue
+                if entries is None:
+                    if self.closed and not inverse:
+                        return False
+                    continue
+                if len(entries) == 1:
+                    i, test = entries[0]
+                    if test is None or test(value):
+                        if not inverse:
+                            counts[i] += 1
+                            continue
+                        candidates = (i, )
+                    else:
+                        candidates = ()
+                else:
+                    candidates = tuple(i for i, test in entries if test is None or test(value))
+                if candidates:
+                    key = (candidates, inverse)
+                    groups[key] = groups.get(key, 0) + 1
+                elif not inverse and predicate not in self.extra and (predicate, False) not in negated:
+                    return False
+        if not self.program:
+            return True
+        if not groups:
+            return self._accepts(counts)
+        # Incoming arcs may be left unmatched -- the last bucket of an inverse group
+        limits = self.limits
+        choices = [list(_distributions(count, [limits[i] for i in candidates] + ([count] if inverse else [])))
+                   for (candidates, inverse), count in groups.items()]
+        groups = list(groups)
+        for choice in product(*choices):
+            trial = list(counts)
+            for (candidates, _), distribution in zip(groups, choice):
+                for i, c in zip(candidates, distribution):
+                    trial[i] += c
+            if self._accepts(trial):
+                return True
+        return False
+
+    def matches(self, node: Term, triples: Iterable[Triple]) -> bool:
+        """
+        Determine whether a node matches the shape
+        :param node: focus node
+        :param triples: triples -- those that neither start nor end at node are ignored
+        :return: True if the neighbourhood of node matches
+        """
+        outgoing = []
+        incoming = []
+        for s, p, o in triples:
+            if s == node:
+                outgoing.append((p, o))
+            if o == node:
+                incoming.append((p, s))
+        return self.match_arcs(outgoing, incoming)
@@ -0,0 +1,237 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Validate a directory tree of ShExJ files.
+
+    shexj_validate [-w WORKERS] [-c] [-s SUFFIX] [-x PATTERN] [-v] [--cache DIR] PATH [PATH ...]
+
+Each file is read and parsed once, converted into JSG objects and validated.  With -c, the serialized image of the
+validated schema is also compared with the parsed file.  Files are processed by a pool of worker processes and the run
+ends with the throughput (files/sec, MB/sec) and the per file latency percentiles.  The exit code is 1 if any file
+failed.
+
+With --cache, the outcome for each file is recorded in a persistent cache (see: jsg_cache) under the hash of its
+contents, so files that are unchanged since an earlier run are neither parsed nor validated.
+"""
+import json
+import multiprocessing
+import os
+import sys
+import time
+from argparse import ArgumentParser, Namespace
+from fnmatch import fnmatch
+from io import StringIO
+from typing import List, Optional, Iterator, Any, NamedTuple, Dict, Tuple
+
+import ShExJ
+from jsg import materialize, dumps, JSGWriter
+from jsg_cache import ResultCache, CacheEntry
+from logger import Logger
+
+FileResult = NamedTuple('FileResult', [('fn', str), ('success', bool), ('nbytes', int), ('elapsed', float),
+                                       ('messages', str), ('cached', bool)])
+
+_caches = {}            # type: Dict[Tuple[str, int], ResultCache]     The caches opened by this process
+
+
+def differences(raw: Any, typed: Any, path: str = '') -> Iterator[str]:
+    """
+    Compare a parsed JSON image with the JSON image of the equivalent JSG objects.  Used to locate the differences
+    once a round trip comparison has failed
+    :param raw: parsed JSON
+    :param typed: JSG object tree
+    :param path: location of raw in the document
+    :return: the paths at which the two differ
+    """
+    if not isinstance(typed, (str, int, float, list, dict)) and typed is not None:
+        typed = JSGWriter._default(typed)
+    if isinstance(raw, dict) and isinstance(typed, dict):
+        for k in sorted(raw.keys() | typed.keys()):
+            if k not in raw or k not in typed:
+                yield "{}/{}".format(path, k)
+            else:
+                yield from differences(raw[k], typed[k], "{}/{}".format(path, k))
+    elif isinstance(raw, list) and isinstance(typed, list) and len(raw) == len(typed):
+        for i, (r, t) in enumerate(zip(raw, typed)):
+            yield from differences(r, t, "{}/{}".format(path, i))
+    elif type(raw) is not type(typed) or raw != typed:
+        yield path or '/'
+
+
+def validate_file(fn: str, compare: bool = False, cache_dir: Optional[str] = None,
+                  cache_size: int = 1 << 28) -> FileResult:
+    """
+    Validate a ShExJ file
+    :param fn: file name
+    :param compare: True means compare the JSON image of the loaded schema with the file contents
+    :param cache_dir: result cache directory, if any
+    :param cache_size: maximum size of the result cache in bytes
+    :return: result
+    """
+    start = time.perf_counter()
+    out = StringIO()
+    nbytes = 0
+    cache = key = None
+    try:
+        with open(fn, 'rb') as f:
+            data = f.read()
+        nbytes = len(data)
+        if cache_dir is not None:
+            cache = _caches.get((cache_dir, cache_size))
+            if cache is None:
+                cache = _caches[(cache_dir, cache_size)] = ResultCache(cache_dir, cache_size)
+            key = cache.key(data, ShExJ, compare=compare)
+            entry = cache.get(key, ShExJ)
+            if entry is not None:
+                return FileResult(fn, entry.valid, nbytes, time.perf_counter() - start, entry.messages, True)
+        raw = json.loads(data.decode('utf-8'))
+        schema = materialize(ShExJ, raw)
+        log = Logger(keep_records=True)
+        success = schema._is_valid(log)
+        for record in log.records:
+            print(record, file=out)
+        if success and compare and json.loads(dumps(schema)) != raw:
+            for path in differences(raw, schema):
+                print("Round trip mismatch: {}".format(path), file=out)
+                success = False
+    except Exception as e:
+        print("{}: {}".format(type(e).__name__, e), file=out)
+        success = False
+    if key is not None:
+        cache.put(key, CacheEntry(success, out.getvalue(), None))
+    return FileResult(fn, success, nbytes, time.perf_counter() - start, out.getvalue(), False)
+
+
+def _validate_file(args) -> FileResult:
+    return validate_file(*args)
+
+
+def find_files(paths: List[str], suffix: str, exclude: List[str]) -> List[str]:
+    """
+    Return the files to validate
+    :param paths: files and directories to search
+    :param suffix: file name suffix to select in directories
+    :param exclude: fnmatch patterns for files or directories to skip
+    :return: sorted list of file names
+    """
+    def excluded(fn: str) -> bool:
+        return any(fnmatch(fn, pattern) or fnmatch(os.path.basename(fn), pattern) for pattern in exclude)
+
+    rval = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames[:] = sorted(d for d in dirnames if not excluded(os.path.join(dirpath, d)))
+                rval += [os.path.join(dirpath, fn) for fn in sorted(filenames)
+                         if fn.endswith(suffix) and not excluded(os.path.join(dirpath, fn))]
+        elif not excluded(path):
+            rval.append(path)
+    return rval
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Nearest rank percentile
+    :param values: sorted values
+    :param pct: percentile (0-100)
+    :return: value
+    """
+    return values[max(0, min(len(values) - 1, int(len(values) * pct / 100.0 + 0.5) - 1))]
+
+
+def genargs() -> ArgumentParser:
+    parser = ArgumentParser(prog="shexj_validate", description="Validate a directory tree of ShExJ files")
+    parser.add_argument("paths", nargs='+', metavar="PATH", help="ShExJ file or directory")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes (default: %(default)s)")
+    parser.add_argument("-c", "--compare", action="store_true",
+                        help="Compare the JSON image of each validated schema with the input")
+    parser.add_argument("-s", "--suffix", default=".json", help="File suffix (default: %(default)s)")
+    parser.add_argument("-x", "--exclude", action="append", default=[], metavar="PATTERN",
+                        help="Skip files and directories matching PATTERN (repeatable)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print the name of every file processed")
+    parser.add_argument("--cache", metavar="DIR", help="Persistent result cache directory")
+    parser.add_argument("--cache-size", type=int, default=256, metavar="MB",
+                        help="Maximum result cache size in MB (default: %(default)s)")
+    return parser
+
+
+def run(opts: Namespace) -> int:
+    """
+    Validate the files selected by opts
+    :param opts: parsed arguments
+    :return: number of failures
+    """
+    files = find_files(opts.paths, opts.suffix, opts.exclude)
+    tasks = [(fn, opts.compare, opts.cache, opts.cache_size << 20) for fn in files]
+    results = []            # type: List[FileResult]
+    start = time.perf_counter()
+    pool = multiprocessing.Pool(opts.workers) if opts.workers > 1 and len(files) > 1 else None
+    try:
+        for result in (pool.imap(_validate_file, tasks, chunksize=max(1, len(tasks) // (opts.workers * 16)))
+                       if pool else map(_validate_file, tasks)):
+            results.append(result)
+            if not result.success:
+                print("File: {} - ".format(result.fn))
+                print(result.messages, end='')
+            elif opts.verbose:
+                print("File: {} - OK".format(result.fn))
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    elapsed = time.perf_counter() - start
+
+    nerrors = sum(1 for r in results if not r.success)
+    print("Files: {}, Errors: {}".format(len(results), nerrors))
+    if results:
+        latencies = sorted(r.elapsed * 1000 for r in results)
+        print("Elapsed: {:.3f}s  {:.1f} files/sec  {:.2f} MB/sec  ({} workers)"
+              .format(elapsed, len(results) / elapsed, sum(r.nbytes for r in results) / elapsed / 1e6,
+                      opts.workers))
+        print("Latency (ms): p50 {:.2f}  p90 {:.2f}  p99 {:.2f}  max {:.2f}"
+              .format(percentile(latencies, 50), percentile(latencies, 90), percentile(latencies, 99),
+                      latencies[-1]))
+        if opts.cache:
+            hits = sum(1 for r in results if r.cached)
+            print("Cache: {} hits, {} misses ({:.1%} hit rate)".format(hits, len(results) - hits,
+                                                                      hits / len(results)))
+    return nerrors
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command line entry point
+    :param argv: arguments (default: sys.argv[1:])
+    :return: exit code -- 0 if every file is valid
+    """
+    return 1 if run(genargs().parse_args(argv)) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
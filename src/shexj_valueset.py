@@ -0,0 +1,172 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Value set index for ShExJ NodeConstraint values.
+
+    index = ValueSetIndex(node_constraint.values)
+    "http://a.example/v1" in index
+
+Exact values (IRIs and literals) are kept in a hash set.  Stems, StemRanges and the stems in their exclusion lists
+are inserted into a compressed (radix) prefix trie over IRIs.  Each node that a stem ends at carries an override:
+the set of entries (Stems and StemRanges) that cover every IRI below it, taking the exclusions along the path into
+account.  A lookup walks the trie once, remembering the deepest override it passes, so its cost depends on the length
+of the IRI and not on the size of the value set.  Exact exclusions are kept in a hash table of the entries that
+exclude each value.
+"""
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import ShExJ
+from shexj_terms import Term, from_shexj
+
+_STEMS = 0          # Entry number shared by every Stem -- a Stem has no exclusions
+
+
+class _TrieNode:
+    __slots__ = ('edges', 'marks', 'cover')
+
+    def __init__(self):
+        self.edges = {}             # type: Dict[str, List]                 first character -> [label, child]
+        self.marks = []             # type: List[Tuple[int, bool]]          (entry, True=stem / False=exclusion)
+        self.cover = None           # type: Optional[FrozenSet[int]]        None means same as the parent
+
+
+class ValueSetIndex:
+    """
+    Membership test for a list of ShExJ valueSetValues
+    """
+    def __init__(self, values: Iterable[Any]):
+        """
+        Build the index
+        :param values: list of objectValue, Stem and StemRange entries
+        """
+        self._exact = set()
+        self._root = None           # type: Optional[_TrieNode]
+        root = _TrieNode()
+        excluded = {}
+        wildcards = set()
+        for entry, value in enumerate(values, start=_STEMS + 1):
+            if isinstance(value, ShExJ.StemRange):
+                if isinstance(value.stem, ShExJ.Wildcard):
+                    root.marks.append((entry, True))
+                    wildcards.add(entry)
+                else:
+                    self._insert(root, str(value.stem)).marks.append((entry, True))
+                for exclusion in value.exclusions or ():
+                    if isinstance(exclusion, ShExJ.Stem):
+                        self._insert(root, str(exclusion.stem)).marks.append((entry, False))
+                    else:
+                        excluded.setdefault(from_shexj(exclusion), set()).add(entry)
+            elif isinstance(value, ShExJ.Stem):
+                self._insert(root, str(value.stem)).marks.append((_STEMS, True))
+            else:
+                self._exact.add(from_shexj(value))
+        self._excluded = {value: frozenset(entries) for value, entries in excluded.items()}     # value -> entries
+        self._wildcards = frozenset(wildcards)          # Entries that cover every term
+        if root.marks or root.edges:
+            self._root = root
+            self._resolve(root)
+
+    @staticmethod
+    def _insert(root: _TrieNode, stem: str) -> _TrieNode:
+        """
+        Add stem to the trie, splitting an edge if it ends part way along one
+        :return: the node for stem
+        """
+        node = root
+        pos = 0
+        while pos < len(stem):
+            edge = node.edges.get(stem[pos])
+            if edge is None:
+                child = _TrieNode()
+                node.edges[stem[pos]] = [stem[pos:], child]
+                return child
+            label, child = edge
+            common = 1
+            while common < len(label) and pos + common < len(stem) and label[common] == stem[pos + common]:
+                common += 1
+            if common < len(label):
+                middle = _TrieNode()
+                middle.edges[label[common]] = [label[common:], child]
+                edge[0] = label[:common]
+                edge[1] = middle
+                child = middle
+            node = child
+            pos += common
+        return node
+
+    @staticmethod
+    def _resolve(root: _TrieNode) -> None:
+        """
+        Convert the marks into overrides.  An entry covers an IRI if the IRI starts with the entry's stem and with
+        none of its exclusion stems, so an exclusion, once passed, holds for the entire subtree.
+        """
+        stack = [(root, {})]            # type: List[Tuple[_TrieNode, Dict[int, bool]]]
+        while stack:
+            node, state = stack.pop()
+            if node.marks:
+                state = dict(state)
+                for entry, stem in sorted(node.marks, key=lambda mark: not mark[1]):
+                    if not stem or state.get(entry) is not False:
+                        state[entry] = stem
+                node.cover = frozenset(entry for entry, covered in state.items() if covered)
+                node.marks = None
+            stack += ((child, state) for _, child in node.edges.values())
+
+    def _cover(self, iri: str) -> Optional[FrozenSet[int]]:
+        """
+        Return the entries whose stems cover iri
+        """
+        node = self._root
+        cover = node.cover
+        pos = 0
+        n = len(iri)
+        while pos < n:
+            edge = node.edges.get(iri[pos])
+            if edge is None:
+                break
+            label, node = edge
+            if not iri.startswith(label, pos):
+                break
+            pos += len(label)
+            if node.cover is not None:
+                cover = node.cover
+        return cover
+
+    def __contains__(self, term: Term) -> bool:
+        if term in self._exact:
+            return True
+        if isinstance(term, str) and not term.startswith('_:'):
+            if self._root is None:
+                return False
+            cover = self._cover(term)
+        else:
+            cover = self._wildcards         # Stems only apply to IRIs
+        if not cover:
+            return False
+        excluded = self._excluded.get(term)
+        return excluded is None or not cover <= excluded
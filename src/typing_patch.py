@@ -26,29 +26,168 @@
 # OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
 # OF THE POSSIBILITY OF SUCH DAMAGE.
 import sys
-from typing import GenericMeta, _ForwardRef, Dict, Any
+from typing import GenericMeta, _ForwardRef, Dict, Any, Callable, List
 if sys.version_info < (3, 6):
     from typing import Union
 else:
     from typing import _Union
 
-from collections import Iterable
+from collections import Iterable, OrderedDict
 
 
 # TODO: Pay attention to the goings on at the python development (http://bugs.python.org/issue29262) and #377
 
+Checker = Callable[[Any], bool]
+
+_checkers = {}          # type: Dict[Any, Checker]    Compiled conformance checkers, keyed by type
+
+
 def conforms(element, typ) -> bool:
+    return conformance_checker(typ)(element)
+
+
+def conformance_checker(typ) -> Checker:
+    """
+    Return a function that determines whether an element conforms to typ.  The typing structure of typ is analyzed
+    once and the resulting checker is memoized.  Types that still contain unresolved forward references are compiled
+    but not memoized, as their hash changes when the reference is resolved.
+    :param typ: type to check against
+    :return: checker function
+    """
+    try:
+        return _checkers[typ]
+    except KeyError:
+        checker = _compile(typ)
+        if is_resolved(typ):
+            _checkers[typ] = checker
+        return checker
+    except TypeError:                       # Unhashable type -- compile it each time
+        return _compile(typ)
+
+
+def _compile(typ) -> Checker:
     if is_forward(typ):
-        ns = {}
-        typ = typ._eval_type(ns, ns)        # All forwards have to already be fixed
+        if typ.__forward_evaluated__:
+            return conformance_checker(typ.__forward_value__)
+        return lambda element: conformance_checker(typ._eval_type({}, {}))(element)
     if is_union(typ):
-        return union_conforms(element, typ)
+        return _compile_union(typ)
     elif is_dict(typ):
-        return dict_conforms(element, typ)
+        return _compile_dict(typ)
     elif is_iterable(typ):
-        return iterable_conforms(element, typ)
+        return _compile_iterable(typ)
     else:
-        return element_conforms(element, typ)
+        return _compile_element(typ)
+
+
+def _compile_union(typ) -> Checker:
+    """
+    Compile a union into a single checker.  Nested unions are flattened, duplicates removed and None is tested by
+    identity.  Simple classes are collapsed into a single isinstance tuple, dropping any that are subclasses of an
+    earlier plain class as they can never add a match.
+    """
+    members = []            # type: List[Any]
+    for t in union_members(typ):
+        if t not in members:
+            members.append(t)
+    nullable = type(None) in members
+    classes = []            # type: List[type]
+    others = []             # type: List[Checker]
+    for t in members:
+        if t is type(None):
+            pass
+        elif is_forward(t) or is_typing_type(t) or not isinstance(t, type) or isinstance(t, GenericMeta):
+            others.append(conformance_checker(t))
+        elif not any(type(c) is type and type(t) is type and issubclass(t, c) for c in classes):
+            classes.append(t)
+    # Classes whose metaclass knows how to test several of its members at once (e.g. JSGString lexer patterns) are
+    # replaced by a single fused test
+    fusable = OrderedDict()     # type: Dict[type, List[type]]
+    for c in classes:
+        if hasattr(type(c), 'fused_instancecheck'):
+            fusable.setdefault(type(c), []).append(c)
+    for meta, group in fusable.items():
+        if len(group) > 1:
+            classes = [c for c in classes if c not in group]
+            others.insert(0, meta.fused_instancecheck(group))
+    class_tuple = tuple(classes)
+    if len(classes) == 1 and not others:            # The typical Optional[cls]
+        cls = classes[0]
+        if nullable:
+            return lambda element: element is None or isinstance(element, cls)
+        return lambda element: element is not None and isinstance(element, cls)
+
+    def check(element) -> bool:
+        if element is None:
+            return nullable
+        if class_tuple and isinstance(element, class_tuple):
+            return True
+        for other in others:
+            if other(element):
+                return True
+        return False
+    return check
+
+
+def _compile_dict(typ) -> Checker:
+    if typ.__args__ is None:
+        return lambda element: isinstance(element, dict)
+    kc, vc = (conformance_checker(t) for t in typ.__args__)
+
+    def check(element) -> bool:
+        if not isinstance(element, dict):
+            return False
+        for k, v in element.items():
+            if not kc(k) or not vc(v):
+                return False
+        return True
+    return check
+
+
+def _compile_iterable(typ) -> Checker:
+    if typ.__args__ is None:
+        return lambda element: isinstance(element, Iterable)
+    vc = conformance_checker(typ.__args__[0])
+
+    def check(element) -> bool:
+        if not isinstance(element, Iterable):
+            return False
+        for e in element:
+            if not vc(e):
+                return False
+        return True
+    return check
+
+
+def _compile_element(typ) -> Checker:
+    if isinstance(typ, type(type)) and issubclass(typ, type(None)):
+        return lambda element: element is None
+    return lambda element: element is not None and isinstance(element, typ)
+
+
+def is_resolved(typ) -> bool:
+    """
+    Determine whether typ is free of unresolved forward references
+    """
+    if is_forward(typ):
+        return typ.__forward_evaluated__
+    elif is_union(typ):
+        return all(is_resolved(t) for t in union_members(typ))
+    elif (is_dict(typ) or is_iterable(typ)) and typ.__args__ is not None:
+        return all(is_resolved(t) for t in typ.__args__)
+    return True
+
+
+def union_members(typ) -> List[Any]:
+    """
+    Return the members of a union, resolving forward references where possible and flattening nested unions
+    """
+    rval = []
+    for t in (typ.__union_params__ if sys.version_info < (3, 6) else typ.__args__):
+        if is_forward(t) and t.__forward_evaluated__:
+            t = t.__forward_value__
+        rval += union_members(t) if is_union(t) else [t]
+    return rval
 
 
 def is_typing_type(typ) -> bool:
@@ -0,0 +1,76 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Revalidate a synthetic schema after a single field edit, with and without incremental validation.  Run from the tests
+directory with src on the path:
+
+    PYTHONPATH=../src python benchmark_incremental.py [nshapes] [nedits]
+"""
+import sys
+import time
+
+import ShExJ
+from jsg import loads, JSGObject
+from schemagen import schema_text, shape_label
+
+
+def edit_and_validate(s: ShExJ.Schema, nshapes: int, nedits: int) -> float:
+    """
+    Toggle the closed flag of nedits shapes, validating the schema after each change
+    :return: average time per revalidation
+    """
+    elapsed = 0.0
+    for n in range(nedits):
+        shape = s.shapes[shape_label(n * 7919 % nshapes)]
+        shape.closed = not shape.closed
+        start = time.perf_counter()
+        valid = s._is_valid()
+        elapsed += time.perf_counter() - start
+        assert valid
+    return elapsed / nedits
+
+
+def main(nshapes: int = 20000, nedits: int = 100) -> None:
+    text = schema_text(nshapes)
+    print("Schema: {} shapes, {:.1f} MB".format(nshapes, len(text) / 1e6))
+    s = loads(text, ShExJ)
+    start = time.perf_counter()
+    s._is_valid()
+    print("full _is_valid:          {:10.3f}ms".format((time.perf_counter() - start) * 1000))
+    print("edit + _is_valid:        {:10.3f}ms".format(edit_and_validate(s, nshapes, min(nedits, 5)) * 1000))
+
+    JSGObject._incremental = True
+    s = loads(text, ShExJ)
+    start = time.perf_counter()
+    s._is_valid()
+    print("initial (incremental):   {:10.3f}ms".format((time.perf_counter() - start) * 1000))
+    print("edit + _is_valid (incr): {:10.3f}ms".format(edit_and_validate(s, nshapes, nedits) * 1000))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,74 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Load, validate and serialize a synthetic schema.  Run from the tests directory with src on the path:
+
+    PYTHONPATH=../src python benchmark_load.py [nshapes]
+"""
+import os
+import sys
+import time
+
+import ShExJ
+from jsg import loads, dumps
+from jsg_parallel import validate_parallel
+import jsg_snapshot
+from schemagen import schema_text
+
+
+def best_of(n: int, f) -> float:
+    best = None
+    for _ in range(n):
+        start = time.perf_counter()
+        f()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(nshapes: int = 10000) -> None:
+    text = schema_text(nshapes)
+    print("Schema: {} shapes, {:.1f} MB".format(nshapes, len(text) / 1e6))
+    load_time = best_of(3, lambda: loads(text, ShExJ))
+    print("loads:     {:8.3f}s".format(load_time))
+    s = loads(text, ShExJ)
+    valid_time = best_of(3, lambda: s._is_valid())
+    print("_is_valid: {:8.3f}s  (valid: {})".format(valid_time, s._is_valid()))
+    print("validate_parallel: {:8.3f}s  ({} workers)".format(best_of(3, lambda: validate_parallel(s)),
+                                                              os.cpu_count()))
+    print("_as_json:  {:8.3f}s  dumps: {:8.3f}s".format(best_of(3, lambda: s._as_json), best_of(3, lambda: dumps(s))))
+    print("_as_json_dumps: {:8.3f}s  dumps(indent): {:8.3f}s".format(best_of(3, lambda: s._as_json_dumps()),
+                                                                    best_of(3, lambda: dumps(s, '   '))))
+    snapshot = jsg_snapshot.dumps(s)
+    print("snapshot:  {:8.3f}s  ({:.1f} MB)  loads + _is_valid: {:8.3f}s".format(
+        best_of(3, lambda: jsg_snapshot.loads(snapshot, ShExJ)), len(snapshot) / 1e6,
+        best_of(3, lambda: loads(text, ShExJ)._is_valid())))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
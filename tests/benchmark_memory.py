@@ -0,0 +1,70 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Report the memory used per shape by a loaded synthetic schema in the standard and compact representations, with and
+without interning.  Run from
+the tests directory with src on the path:
+
+    PYTHONPATH=../src python benchmark_memory.py [nshapes]
+"""
+import gc
+import sys
+import tracemalloc
+
+import ShExJ
+from jsg import loads
+from schemagen import schema_text
+
+
+def bytes_per_shape(text: str, nshapes: int, **kwargs) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    s = loads(text, ShExJ, **kwargs)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    assert s._is_valid()
+    return used / nshapes
+
+
+def main(nshapes: int = 10000) -> None:
+    text = schema_text(nshapes)
+    standard = bytes_per_shape(text, nshapes)
+    compact = bytes_per_shape(text, nshapes, compact=True)
+    interned = bytes_per_shape(text, nshapes, intern=True)
+    compact_interned = bytes_per_shape(text, nshapes, intern=True, compact=True)
+    print("Standard: {:8.0f} bytes/shape".format(standard))
+    print("Compact:  {:8.0f} bytes/shape ({:.0%} of standard)".format(compact, compact / standard))
+    print("Interned: {:8.0f} bytes/shape ({:.0%} of standard)".format(interned, interned / standard))
+    print("Compact + interned: {:8.0f} bytes/shape ({:.0%} of standard)"
+          .format(compact_interned, compact_interned / standard))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,88 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Check batches of literals and IRIs against compiled NodeConstraints.  Run from the tests directory with src on the path:
+
+    PYTHONPATH=../src python benchmark_nodeconstraint.py [nterms] [ndistinct]
+"""
+import json
+import random
+import sys
+import time
+
+import ShExJ
+from jsg import loads
+from shexj_nodeconstraint import compile_constraint
+from shexj_terms import literal, XSD_INTEGER
+
+EX = "http://a.example/"
+
+# (name, facets, test IRIs rather than literals)
+CONSTRAINTS = [
+    ("datatype", {"datatype": XSD_INTEGER}, False),
+    ("datatype + range", {"datatype": XSD_INTEGER, "mininclusive": 0, "maxexclusive": "500000"}, False),
+    ("pattern", {"nodeKind": "literal", "pattern": "^[0-9]+5$"}, False),
+    ("values (1000)", {"values": ['"{}"^^{}'.format(i, XSD_INTEGER) for i in range(1000)] +
+                                 [{"type": "Stem", "stem": EX + "s{}/".format(i)} for i in range(100)]}, False),
+    ("stem ranges (10000)", {"values": [{"type": "StemRange", "stem": EX + "r{}/".format(i),
+                                         "exclusions": [EX + "r{}/y".format(i), {"type": "Stem",
+                                                                                 "stem": EX + "r{}/x/".format(i)}]}
+                                        for i in range(10000)]}, True),
+]
+
+
+def best_of(n: int, f) -> float:
+    best = None
+    for _ in range(n):
+        start = time.perf_counter()
+        f()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(nterms: int = 1000000, ndistinct: int = 100000) -> None:
+    random.seed(42)
+    distinct = [literal(random.randrange(-100000, 1000000), XSD_INTEGER) for _ in range(ndistinct)]
+    literals = [random.choice(distinct) for _ in range(nterms)]
+    distinct = [EX + "r{}/{}".format(random.randrange(12000), random.choice(["a", "x/b", "y"]))
+                for _ in range(ndistinct)]
+    iris = [random.choice(distinct) for _ in range(nterms)]
+    print("{} terms ({} distinct)".format(nterms, ndistinct))
+    print("{:24} {:>10} {:>12}".format("", "per term", "check_many"))
+    for name, facets, use_iris in CONSTRAINTS:
+        terms = iris if use_iris else literals
+        facets["type"] = "NodeConstraint"
+        checker = compile_constraint(loads(json.dumps(facets), ShExJ))
+        one = best_of(3, lambda: [checker(term) for term in terms])
+        many = best_of(3, lambda: checker.check_many(terms))
+        print("{:24} {:9.3f}s {:11.3f}s  ({:.0f} terms/sec)".format(name, one, many, nterms / many))
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
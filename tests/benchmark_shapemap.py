@@ -0,0 +1,135 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Validate a synthetic product graph against a shape map.  Run from the tests directory with src on the path:
+
+    PYTHONPATH=../src python benchmark_shapemap.py [nproducts]
+
+The last run validates the map in a pool of os.cpu_count() workers (see: shexj_shapemap_parallel).
+"""
+import json
+import os
+import sys
+import time
+from typing import List, Tuple
+
+import ShExJ
+from jsg import loads
+from shexj_shapemap import Graph, ShapeMapEngine
+from shexj_shapemap_parallel import validate_parallel, print_stats
+from shexj_terms import literal, XSD_INTEGER, XSD_DECIMAL, Triple
+
+EX = "http://a.example/"
+
+
+def tc(p: str, value_expr: dict = None, min: int = 1, max=1) -> dict:
+    rval = {"type": "TripleConstraint", "predicate": EX + p, "min": min, "max": max}
+    if value_expr is not None:
+        rval["valueExpr"] = value_expr
+    return rval
+
+
+def ref(label: str) -> dict:
+    return {"type": "ShapeRef", "reference": EX + label}
+
+
+def product_schema() -> ShExJ.Schema:
+    """ Products refer to categories (which form a tree) and makers; makers refer to their products """
+    string = {"type": "NodeConstraint", "nodeKind": "literal", "minlength": 1}
+    return loads(json.dumps({"type": "Schema", "shapes": {
+        EX + "Product": {"type": "Shape", "closed": True, "expression": {"type": "EachOf", "expressions": [
+            tc("name", string), tc("sku", {"type": "NodeConstraint", "pattern": "^[A-Z]{3}-[0-9]+$"}),
+            tc("price", {"type": "NodeConstraint", "datatype": XSD_DECIMAL, "mininclusive": 0}),
+            tc("category", ref("Category"), max="*"), tc("maker", ref("Maker")),
+            tc("related", ref("Product"), min=0, max="*")]}},
+        EX + "Category": {"type": "Shape", "expression": {"type": "EachOf", "expressions": [
+            tc("label", string), tc("parent", ref("Category"), min=0)]}},
+        EX + "Maker": {"type": "Shape", "expression": {"type": "EachOf", "expressions": [
+            tc("name", string), tc("founded", {"type": "NodeConstraint", "datatype": XSD_INTEGER}),
+            tc("makes", ref("Product"), min=0, max="*")]}}}}), ShExJ)
+
+
+def product_graph(nproducts: int) -> Tuple[Graph, List[Triple]]:
+    """
+    :return: graph and shape map -- every product checked against Product
+    """
+    ncategories = max(nproducts // 100, 10)
+    nmakers = max(nproducts // 20, 10)
+    triples = []
+    for i in range(ncategories):
+        c = EX + "category{}".format(i)
+        triples.append((c, EX + "label", literal("Category {}".format(i))))
+        if i:
+            triples.append((c, EX + "parent", EX + "category{}".format((i - 1) // 4)))
+    for i in range(nmakers):
+        m = EX + "maker{}".format(i)
+        triples += [(m, EX + "name", literal("Maker {}".format(i))), (m, EX + "founded", literal(1900 + i % 100,
+                                                                                                 XSD_INTEGER))]
+    for i in range(nproducts):
+        p = EX + "product{}".format(i)
+        triples += [(p, EX + "name", literal("Product {}".format(i))), (p, EX + "sku", literal("ABC-{}".format(i))),
+                    (p, EX + "price", literal("{}.99".format(i % 500), XSD_DECIMAL)),
+                    (p, EX + "category", EX + "category{}".format(i % ncategories)),
+                    (p, EX + "category", EX + "category{}".format(i * 7 % ncategories)),
+                    (p, EX + "maker", EX + "maker{}".format(i % nmakers)),
+                    (EX + "maker{}".format(i % nmakers), EX + "makes", p)]
+        if i % 10:
+            triples.append((p, EX + "related", EX + "product{}".format(i - 1)))
+    shape_map = [(EX + "product{}".format(i), EX + "Product") for i in range(nproducts)]
+    return Graph(triples), shape_map
+
+
+def main(nproducts: int = 20000) -> None:
+    schema = product_schema()
+    graph, shape_map = product_graph(nproducts)
+    print("{} products, {} triples".format(nproducts, len(graph)))
+    # Without reuse: a new engine (memo) for each focus node
+    sample = shape_map[:1000]
+    start = time.perf_counter()
+    for pair in sample:
+        assert all(r.conforms for r in ShapeMapEngine(schema, graph).validate([pair]))
+    per_node = (time.perf_counter() - start) / len(sample)
+    print("engine per node:  {:8.1f} us/node".format(per_node * 1e6))
+    engine = ShapeMapEngine(schema, graph)
+    start = time.perf_counter()
+    assert all(r.conforms for r in engine.validate(shape_map))
+    elapsed = time.perf_counter() - start
+    print("shared engine:    {:8.1f} us/node  ({:.0f} nodes/sec)  {}".format(elapsed / nproducts * 1e6,
+                                                                          nproducts / elapsed, engine.cache_info()))
+    workers = os.cpu_count() or 1
+    stats = {}
+    start = time.perf_counter()
+    assert all(r.conforms for r in validate_parallel(ShapeMapEngine(schema, graph), shape_map, workers, stats))
+    elapsed = time.perf_counter() - start
+    print("{} workers:  {:8.1f} us/node  ({:.0f} nodes/sec)".format(workers, elapsed / nproducts * 1e6,
+                                                                   nproducts / elapsed))
+    print_stats(stats)
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,67 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Stream the shapes of a large synthetic schema and report the peak resident set size.  Run from the tests directory
+with src on the path:
+
+    PYTHONPATH=../src python benchmark_stream.py [megabytes] [max_rss_megabytes]
+
+Exits with a non-zero status if the peak RSS exceeds max_rss_megabytes (default 200).
+"""
+import os
+import sys
+import time
+import resource
+import tempfile
+
+import ShExJ
+from jsg_stream import iterload
+from schemagen import write_schema
+
+
+def main(megabytes: int = 500, max_rss: int = 200) -> int:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fn = os.path.join(tmpdir, "big.json")
+        with open(fn, 'w') as f:
+            write_schema(f, megabytes * 1000000 // 870)           # A generated shape is ~870 bytes
+        size = os.path.getsize(fn)
+        start = time.perf_counter()
+        nshapes = nvalid = 0
+        with open(fn) as f:
+            for label, shape in iterload(f, ShExJ):
+                nshapes += 1
+                nvalid += shape._is_valid()
+        elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024           # Linux reports kilobytes
+    print("{:.0f} MB, {} shapes ({} valid) in {:.1f}s -- peak RSS {:.0f} MB".format(size / 1e6, nshapes, nvalid,
+                                                                                 elapsed, peak))
+    return 0 if peak <= max_rss else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(*[int(a) for a in sys.argv[1:]]))
@@ -0,0 +1,100 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Validate synthetic deep and wide shape expression trees.  Run from the tests directory with src on the path:
+
+    PYTHONPATH=../src python benchmark_validate.py [depth] [width]
+"""
+import sys
+import time
+
+import ShExJ
+from ShExJ import *
+from jsg import loads
+from logger import Logger
+from schemagen import schema_text
+
+
+def best_of(n: int, f) -> float:
+    best = None
+    for _ in range(n):
+        start = time.perf_counter()
+        f()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def triple_constraint(i: int) -> TripleConstraint:
+    return TripleConstraint(predicate=IRI("http://a.example/p{}".format(i)),
+                            valueExpr=NodeConstraint(datatype=IRI("http://a.example/dt1")), min=INTEGER(0),
+                            max=INTEGER(1))
+
+
+def deep_schema(depth: int) -> Schema:
+    """ A shape whose expression is depth nested ShapeAnd / ShapeOr / ShapeNot / EachOf / OneOf levels """
+    expr = Shape(expression=triple_constraint(0))
+    for i in range(depth):
+        level = i % 4
+        if level == 0:
+            expr = ShapeAnd(shapeExprs=[expr, NodeConstraint(nodeKind="iri")])
+        elif level == 1:
+            expr = ShapeOr(shapeExprs=[NodeConstraint(nodeKind="bnode"), expr])
+        elif level == 2:
+            expr = ShapeNot(shapeExpr=expr)
+        else:
+            expr = Shape(expression=OneOf(expressions=[triple_constraint(i), EachOf(expressions=[
+                triple_constraint(i + 1), TripleConstraint(predicate=IRI("http://a.example/p"), valueExpr=expr)])]))
+    return Schema(shapes={IRI("http://a.example/S1"): expr})
+
+
+def wide_schema(width: int) -> Schema:
+    """ A shape with a single EachOf of width triple constraints """
+    return Schema(shapes={IRI("http://a.example/S1"): Shape(expression=EachOf(
+        expressions=[triple_constraint(i) for i in range(width)]))})
+
+
+def report(name: str, s: Schema) -> None:
+    try:
+        valid = s._is_valid()
+        print("{:24} {:8.3f}s  {:8.3f}s  (valid: {})".format(name, best_of(3, lambda: s._is_valid()),
+                                                             best_of(3, lambda: s._is_valid(Logger(keep_records=True))),
+                                                             valid))
+    except RecursionError:
+        print("{:24} RecursionError".format(name))
+
+
+def main(depth: int = 2000, width: int = 100000) -> None:
+    print("{:24} {:>9}  {:>9}".format("", "fast-fail", "records"))
+    report("schema (10000 shapes)", loads(schema_text(10000), ShExJ))
+    report("deep ({})".format(depth), deep_schema(depth))
+    report("wide ({})".format(width), wide_schema(width))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -30,8 +30,13 @@ from typing import Optional
 
 class MemLogger:
     def __init__(self, prefix: Optional[str] = None):
-        self.prefix = prefix
-        self.log = ""
+        self.prefix = prefix or ''
+        self._parts = []
 
     def write(self, txt):
-        self.log += self.prefix + txt
+        self._parts.append(self.prefix)
+        self._parts.append(txt)
+
+    @property
+    def log(self) -> str:
+        return ''.join(self._parts)
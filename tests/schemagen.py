@@ -0,0 +1,91 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+import json
+from typing import Dict, Any, TextIO
+
+EX = "http://a.example/"
+XSD = "http://www.w3.org/2001/XMLSchema#"
+
+
+def shape_label(n: int) -> str:
+    return "{}S{}".format(EX, n)
+
+
+def shape_json(n: int, nshapes: int) -> Dict[str, Any]:
+    """
+    Generate a representative ShExJ Shape -- an EachOf of triple constraints over datatypes, value sets and references
+    to other shapes
+    :param n: shape number
+    :param nshapes: total number of shapes in the schema (bounds the references)
+    :return: JSON image of the shape
+    """
+    return {
+        "type": "Shape",
+        "closed": n % 2 == 0,
+        "expression": {
+            "type": "EachOf",
+            "expressions": [
+                {"type": "TripleConstraint", "predicate": EX + "name",
+                 "valueExpr": {"type": "NodeConstraint", "datatype": XSD + "string"}},
+                {"type": "TripleConstraint", "predicate": EX + "age", "min": 0, "max": 1,
+                 "valueExpr": {"type": "NodeConstraint", "datatype": XSD + "integer", "mininclusive": 0}},
+                {"type": "TripleConstraint", "predicate": EX + "status",
+                 "valueExpr": {"type": "NodeConstraint",
+                               "values": [EX + "active", EX + "retired", {"type": "Stem", "stem": EX + "s/"}]}},
+                {"type": "TripleConstraint", "predicate": EX + "p{}".format(n % 50), "min": 0, "max": "*",
+                 "valueExpr": {"type": "ShapeRef", "reference": shape_label((n + 1) % nshapes)}}
+            ]
+        }
+    }
+
+
+def schema_json(nshapes: int) -> Dict[str, Any]:
+    """
+    Generate a ShExJ schema with nshapes shapes
+    :param nshapes: number of shapes
+    :return: JSON image of the schema
+    """
+    return {"type": "Schema",
+            "prefixes": {"ex": EX, "xsd": XSD},
+            "shapes": {shape_label(n): shape_json(n, nshapes) for n in range(nshapes)}}
+
+
+def schema_text(nshapes: int) -> str:
+    return json.dumps(schema_json(nshapes))
+
+
+def write_schema(fp: TextIO, nshapes: int) -> None:
+    """
+    Write a ShExJ schema with nshapes shapes to fp one shape at a time
+    :param fp: output file
+    :param nshapes: number of shapes
+    """
+    fp.write('{"type": "Schema", "prefixes": {"ex": "%s", "xsd": "%s"}, "shapes": {' % (EX, XSD))
+    for n in range(nshapes):
+        fp.write('{}{}: {}'.format(", " if n else "", json.dumps(shape_label(n)), json.dumps(shape_json(n, nshapes))))
+    fp.write('}}')
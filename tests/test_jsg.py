@@ -25,11 +25,20 @@
 # LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
 # OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
 # OF THE POSSIBILITY OF SUCH DAMAGE.
+import copy
+import json
+import pickle
+import types
 import unittest
 
 import ShExJ
 from ShExJ import *
-from jsg import loads
+from io import StringIO
+
+from logger import Logger
+
+from jsg import loads, JSGStringUnion, JSGLazyDict, JSGObject, JSGLoader, dump, dumps
+from schemagen import schema_text, shape_label
 from jsonasobj import loads as jao_loads
 
 from dict_compare import dict_compare
@@ -111,5 +120,387 @@ class FunctionTestCase(unittest.TestCase):
         self.assertTrue(s.shapes["http://a.example/S1"].closed)
 
 
+class JSGStringTestCase(unittest.TestCase):
+    def test_pattern_cache(self):
+        BOOL.pattern.matches.cache_clear()
+        self.assertTrue(isinstance("true", BOOL))
+        self.assertTrue(isinstance("true", BOOL))
+        self.assertFalse(isinstance("maybe", BOOL))
+        self.assertEqual((1, 2), BOOL.pattern.matches.cache_info()[:2])
+
+    def test_fused_union(self):
+        u = JSGStringUnion([BOOL, INTEGER, STAR])
+        self.assertIs(BOOL, u.classify(True))
+        self.assertIs(INTEGER, u.classify(17))
+        self.assertIs(STAR, u.classify("*"))
+        self.assertIsNone(u.classify("abc"))
+        self.assertTrue(u("-12"))
+        self.assertIs(STRING, JSGStringUnion([BOOL, STRING, INTEGER]).classify("12"))
+
+    def test_interned(self):
+        self.assertIs(IRI("http://a.example/" + "p1").val, IRI("http://a.example/p" + "1").val)
+
+
+class LazyLoaderTestCase(unittest.TestCase):
+    def test_lazy(self):
+        text = schema_text(25)
+        eager = loads(text, ShExJ)
+        lazy = loads(text, ShExJ, lazy=True)
+        self.assertTrue(isinstance(lazy.shapes, JSGLazyDict))
+        self.assertEqual(25, len(lazy.shapes._pending))
+        s3 = lazy.shapes[shape_label(3)]
+        self.assertTrue(isinstance(s3, Shape))
+        self.assertIs(s3, lazy.shapes[shape_label(3)])
+        self.assertEqual(24, len(lazy.shapes._pending))
+        self.assertEqual(eager.prefixes, lazy.prefixes)
+        self.assertEqual(eager._as_json, lazy._as_json)
+        self.assertEqual(eager._as_json_dumps(), loads(text, ShExJ, lazy=True)._as_json_dumps())
+        self.assertTrue(loads(text, ShExJ, lazy=True)._is_valid())
+        self.assertEqual(eager.shapes, loads(text, ShExJ, lazy=True).shapes)
+
+    def test_lazy_invalid(self):
+        lazy = loads('{"type": "Schema", "shapes": {"http://a.example/S1": {"type": "Shape", "closed": 17}}}',
+                     ShExJ, lazy=True)
+        self.assertFalse(lazy._is_valid())
+
+    def test_lazy_mutation(self):
+        lazy = loads(schema_text(3), ShExJ, lazy=True)
+        lazy.shapes[shape_label(0)] = Shape()
+        self.assertEqual(Shape(), lazy.shapes.pop(shape_label(0)))
+        self.assertTrue(isinstance(lazy.shapes.copy()[shape_label(1)], Shape))
+        self.assertTrue(isinstance(lazy.shapes.popitem()[1], Shape))
+
+
+class CompactTestCase(unittest.TestCase):
+    def test_compact(self):
+        nc = loads('{"type": "NodeConstraint", "datatype": "http://a.example/dt1"}', ShExJ, compact=True)
+        self.assertEqual(['type', 'datatype'], list(nc.__dict__.keys()))
+        self.assertIsNone(nc.values)
+        self.assertTrue(nc._is_valid())
+        nc.length = INTEGER("3")
+        self.assertEqual('3', str(nc.length))
+        nc.length = None
+        self.assertNotIn('length', nc)
+        with self.assertRaises(AttributeError):
+            _ = nc.clown
+        self.assertTrue(copy.deepcopy(nc)._compact)
+        self.assertIsNone(copy.deepcopy(nc).values)
+
+    def test_standard(self):
+        nc = NodeConstraint(datatype="http://a.example/dt1")
+        self.assertFalse(nc._compact)
+        nc.length = None
+        self.assertIn('length', nc)
+        del nc.__dict__['length']
+        self.assertIsNone(nc.length)
+        with self.assertRaises(AttributeError):
+            _ = nc.clown
+
+    def test_compact_load(self):
+        text = schema_text(10)
+        compact = loads(text, ShExJ, compact=True)
+        standard = loads(text, ShExJ)
+        self.assertEqual(standard._as_json, compact._as_json)
+        self.assertTrue(compact._is_valid())
+        self.assertEqual(2, len(compact.shapes[shape_label(0)].expression.expressions[0].valueExpr))
+        self.assertEqual(14, len(standard.shapes[shape_label(0)].expression.expressions[0].valueExpr))
+        for kwargs in ({'lazy': True}, {'intern': True}):
+            s = loads(text, ShExJ, compact=True, **kwargs)
+            self.assertEqual(standard._as_json, s._as_json)
+            self.assertTrue(s.shapes[shape_label(0)].expression.expressions[0].valueExpr._compact)
+
+
+class WriterTestCase(unittest.TestCase):
+    def test_dumps(self):
+        s = loads(schema_text(10), ShExJ)
+        self.assertEqual(s._as_json, dumps(s))
+        self.assertEqual(s._as_json_dumps(), dumps(s, '   '))
+        self.assertEqual(s._as_json_dumps(indent=2), dumps(s, 2))
+
+    def test_dump(self):
+        s = loads(schema_text(10), ShExJ)
+        out = StringIO()
+        dump(s, out)
+        self.assertEqual(s._as_json, out.getvalue())
+        out = StringIO()
+        dump(s, out, indent='\t')
+        self.assertEqual(s._as_json_dumps(indent='\t'), out.getvalue())
+
+    def test_values(self):
+        nc = NodeConstraint(datatype=IRI("http://a.example/dt1"), length=INTEGER("3"))
+        nc.values = [1.5, True, None, {}, [], "x\u00e9"]
+        self.assertEqual(nc._as_json, dumps(nc))
+        self.assertEqual(nc._as_json_dumps(), dumps(nc, '   '))
+        self.assertEqual('{"type": "Schema"}', dumps(Schema()))
+        nc.values = [object()]
+        self.assertEqual(nc._as_json, dumps(nc))
+        nc.values = None
+        nc.__dict__[''] = 1
+        nc.__dict__['_private'] = 2
+        self.assertEqual(nc._as_json, dumps(nc))
+        self.assertIn('"": 1', dumps(nc))
+
+
+class LoaderTestCase(unittest.TestCase):
+    def test_equivalence(self):
+        text = schema_text(10)
+        legacy = json.loads(text, object_hook=lambda pairs: getattr(ShExJ, pairs['type'])(**pairs)
+                            if 'type' in pairs else pairs)
+        fast = loads(text, ShExJ)
+        self.assertEqual(legacy._as_json, fast._as_json)
+        self.assertEqual(list(legacy.shapes[shape_label(1)].__dict__.items()),
+                         list(fast.shapes[shape_label(1)].__dict__.items()))
+        self.assertIs(JSGLoader.for_module(ShExJ), JSGLoader.for_module(ShExJ))
+        self.assertIn('Shape', JSGLoader.for_module(ShExJ).dispatch)
+        self.assertNotIn('IRI', JSGLoader.for_module(ShExJ).dispatch)
+
+    def test_errors(self):
+        stem = loads('{"type": "Stem", "stem": "http://a.example/", "clown": 17}', ShExJ)
+        self.assertEqual(['type', 'stem'], list(stem.__dict__.keys()))
+        with self.assertRaises(TypeError):
+            loads('{"type": "TripleConstraint"}', ShExJ)
+        with self.assertRaises(TypeError):
+            loads('{"type": "IRI"}', ShExJ)
+        with self.assertRaises(Exception) as e:
+            loads('{"type": "Clown"}', ShExJ)
+        self.assertEqual("Unknown type: Clown", str(e.exception))
+        self.assertEqual({"a": 1}, loads('{"a": 1}', ShExJ))
+
+    def test_compact(self):
+        self.assertEqual(['type', 'datatype'], list(loads('{"type": "NodeConstraint", "datatype": "http://a/"}',
+                                                          ShExJ, compact=True).__dict__.keys()))
+        self.assertIsNot(JSGLoader.for_module(ShExJ), JSGLoader.for_module(ShExJ, compact=True))
+
+    def test_opt_out(self):
+        class Counted(JSGObject):
+            _fast_load = False
+            ninstances = 0
+
+            def __init__(self, n: Optional[INTEGER] = None, **_: Dict[str, object]):
+                JSGObject.__init__(self)
+                self.n = n
+                type(self).ninstances += 1
+
+        module = types.ModuleType("counted")
+        module.Counted = Counted
+        c = loads('{"type": "Counted", "n": 1}', module)
+        self.assertEqual(1, Counted.ninstances)
+        self.assertEqual(1, c.n)
+        self.assertEqual({}, dict(JSGLoader.for_module(module).dispatch))
+
+
+class IncrementalTestCase(unittest.TestCase):
+    def setUp(self):
+        JSGObject._incremental = True
+        self.s = loads(schema_text(20), ShExJ)
+        self.assertTrue(self.s._is_valid())
+
+    def tearDown(self):
+        JSGObject._incremental = False
+
+    def messages(self, s) -> str:
+        out = StringIO()
+        s._is_valid(Logger(out))
+        return out.getvalue()
+
+    def test_edit(self):
+        s = self.s
+        shape = s.shapes[shape_label(3)]
+        self.assertIs(s, shape._parent)
+        shape.closed = BOOL("true")
+        self.assertIsNone(shape._valid)
+        self.assertEqual([shape], list(s._dirty.values()))
+        self.assertTrue(s._is_valid())
+        self.assertIsNone(s._dirty)
+        self.assertTrue(shape._valid)
+        self.assertNotIn('_valid', shape.__dict__)
+
+    def test_invalid_edit(self):
+        s = self.s
+        tc = s.shapes[shape_label(5)].expression.expressions[1]
+        tc.min = "x"
+        shape = s.shapes[shape_label(7)]
+        shape.closed = BOOL("maybe")
+        self.assertFalse(s._is_valid())
+        messages = self.messages(s)
+        JSGObject._incremental = False
+        self.assertEqual(self.messages(s), messages)
+        self.assertEqual(2, len(messages.strip().split('\n')))
+        JSGObject._incremental = True
+        tc.min = 1
+        self.assertFalse(s._is_valid())
+        shape.closed = BOOL("false")
+        self.assertTrue(s._is_valid())
+
+    def test_container_edit(self):
+        s = self.s
+        each_of = s.shapes[shape_label(2)].expression
+        each_of.expressions.append(NodeConstraint())
+        self.assertTrue(s._is_valid())              # Not seen...
+        each_of._invalidate()
+        self.assertFalse(s._is_valid())             # ... until the owner is invalidated
+        each_of.expressions.pop()
+        each_of._invalidate()
+        self.assertTrue(s._is_valid())
+
+    def test_shared(self):
+        s = self.s
+        nc = NodeConstraint(datatype=IRI("http://a.example/dt1"))
+        tc1 = s.shapes[shape_label(1)].expression.expressions[0]
+        tc2 = s.shapes[shape_label(2)].expression.expressions[0]
+        tc1.valueExpr = nc
+        tc2.valueExpr = nc
+        self.assertTrue(s._is_valid())
+        self.assertEqual({id(tc1): tc1, id(tc2): tc2}, nc._parent)
+        nc.length = "x"
+        self.assertIn(id(nc), tc1._dirty)
+        self.assertIn(id(nc), tc2._dirty)
+        self.assertFalse(s._is_valid())
+        nc.length = 3
+        self.assertTrue(s._is_valid())
+
+    def test_detach(self):
+        s = self.s
+        nc = NodeConstraint(datatype=IRI("http://a.example/dt1"))
+        tc1 = s.shapes[shape_label(1)].expression.expressions[0]
+        tc2 = s.shapes[shape_label(2)].expression.expressions[0]
+        tc1.valueExpr = nc
+        tc2.valueExpr = nc
+        self.assertTrue(s._is_valid())
+        tc1.valueExpr = None
+        self.assertIs(tc2, nc._parent)
+        self.assertTrue(s._is_valid())
+        nc.length = 3
+        self.assertIsNone(tc1._dirty)
+        self.assertIn(id(nc), tc2._dirty)
+        tc2.valueExpr = None
+        self.assertIsNone(nc._parent)
+        self.assertTrue(s._is_valid())
+        nc.length = "x"
+        self.assertIsNone(s._dirty)
+        self.assertTrue(s._is_valid())
+        # Replacing a container releases the objects in it
+        each_of = s.shapes[shape_label(3)].expression
+        old = each_of.expressions
+        each_of.expressions = old[:1] + [old[1]._copy()] + old[2:]
+        self.assertTrue(s._is_valid())
+        self.assertIs(each_of, old[0]._parent)
+        self.assertIsNone(old[1]._parent)
+        old[1].min = "x"
+        self.assertIsNone(each_of._dirty)
+        self.assertTrue(s._is_valid())
+
+    def test_copy(self):
+        s = self.s
+        for c in (copy.deepcopy(s), pickle.loads(pickle.dumps(s))):
+            self.assertEqual(s, c)
+            self.assertEqual(s._as_json, c._as_json)
+            self.assertIsNone(c._valid)
+            self.assertTrue(c._is_valid())
+
+
+class InternTestCase(unittest.TestCase):
+    def setUp(self):
+        self.text = schema_text(60)
+        self.s = loads(self.text, ShExJ, intern=True)
+
+    def expressions(self, n: int) -> list:
+        return self.s.shapes[shape_label(n)].expression.expressions
+
+    def test_intern(self):
+        s = self.s
+        self.assertEqual(loads(self.text, ShExJ)._as_json, s._as_json)
+        self.assertTrue(s._is_valid())
+        self.assertIsNot(self.expressions(0)[0], self.expressions(1)[0])
+        self.assertIs(self.expressions(0)[3].predicate, self.expressions(50)[3].predicate)
+        self.assertIs(self.expressions(0)[0].valueExpr.datatype, self.expressions(1)[0].valueExpr.datatype)
+        standard = loads(self.text, ShExJ)
+        self.assertIsNot(standard.shapes[shape_label(0)].expression.expressions[3].predicate,
+                         standard.shapes[shape_label(50)].expression.expressions[3].predicate)
+        with self.assertRaises(ValueError):
+            loads(self.text, ShExJ, lazy=True, intern=True)
+
+    def test_lists(self):
+        s = loads('{"type": "Schema", "shapes": {"http://a.example/S1": {"type": "Shape", "extra": ["http://a/p"]}, '
+                  '"http://a.example/S2": {"type": "Shape", "extra": [["http://a/p"]]}}}', ShExJ, intern=True)
+        self.assertIs(s.shapes["http://a.example/S1"].extra[0], s.shapes["http://a.example/S2"].extra[0][0])
+
+    def test_types(self):
+        s = loads('{"type": "Schema", "shapes": {"http://a.example/S1": {"type": "Shape", "closed": true}, '
+                  '"http://a.example/S2": {"type": "Shape", "closed": 1}, '
+                  '"http://a.example/S3": {"type": "Shape", "closed": 1.0}}}', ShExJ, intern=True)
+        self.assertEqual('{"type": "Schema", "shapes": {"http://a.example/S1": {"type": "Shape", "closed": true}, '
+                         '"http://a.example/S2": {"type": "Shape", "closed": 1}, '
+                         '"http://a.example/S3": {"type": "Shape", "closed": 1.0}}}', s._as_json)
+
+    def test_mutable(self):
+        tc0, tc1 = self.expressions(0)[0], self.expressions(1)[0]
+        self.assertEqual(tc0, tc1)
+        tc0.min = 1
+        tc0.valueExpr.datatype = IRI("http://a.example/dt1")
+        self.assertIsNone(tc1.min)
+        self.assertEqual("http://www.w3.org/2001/XMLSchema#string", tc1.valueExpr.datatype)
+        self.assertTrue(self.s._is_valid())
+
+    def test_copy(self):
+        c = pickle.loads(pickle.dumps(self.s))
+        self.assertEqual(self.s._as_json, c._as_json)
+        self.assertTrue(c._is_valid())
+
+    def test_incremental(self):
+        try:
+            JSGObject._incremental = True
+            s = loads(self.text, ShExJ, intern=True)
+            self.assertTrue(s._is_valid())
+            each_of = s.shapes[shape_label(0)].expression
+            each_of.expressions[1].min = "x"
+            self.assertFalse(s._is_valid())
+            each_of.expressions[1].min = 0
+            self.assertTrue(s._is_valid())
+        finally:
+            JSGObject._incremental = False
+
+
+class DeepTestCase(unittest.TestCase):
+    depth = 5000
+
+    def deep(self) -> Schema:
+        expr = NodeConstraint(nodeKind="iri")
+        for i in range(self.depth):
+            expr = ShapeNot(shapeExpr=expr) if i % 2 else ShapeAnd(shapeExprs=[NodeConstraint(nodeKind="iri"), expr])
+        return Schema(shapes={IRI("http://a.example/S1"): expr})
+
+    def innermost(self, s: Schema):
+        expr = s.shapes["http://a.example/S1"]
+        for i in range(self.depth):
+            expr = expr.shapeExpr if isinstance(expr, ShapeNot) else expr.shapeExprs[1]
+        return expr
+
+    def test_deep(self):
+        s = self.deep()
+        self.assertTrue(s._is_valid())
+        self.innermost(s).__dict__['clown'] = 1
+        self.assertFalse(s._is_valid())
+        log = Logger(keep_records=True)
+        self.assertFalse(s._is_valid(log))
+        self.assertEqual(1, log.nerrors)
+        location = log.records[0].location
+        self.assertTrue(location.startswith('shapes["http://a.example/S1"].shapeExpr.shapeExprs[1].shapeExpr'))
+        self.assertTrue(location.endswith('.shapeExprs[1].clown'))
+        self.assertEqual(self.depth, location.count('.shapeExpr'))
+
+    def test_deep_incremental(self):
+        try:
+            JSGObject._incremental = True
+            s = self.deep()
+            self.assertTrue(s._is_valid())
+            self.innermost(s).nodeKind = "clown"
+            self.assertFalse(s._is_valid())
+            self.innermost(s).nodeKind = "literal"
+            self.assertTrue(s._is_valid())
+        finally:
+            JSGObject._incremental = False
+
+
 if __name__ == '__main__':
     unittest.main()
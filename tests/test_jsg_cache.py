@@ -0,0 +1,180 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+import os
+import shutil
+import tempfile
+import time
+import types
+import unittest
+
+import ShExJ
+import jsg
+import jsg_cache
+import jsg_snapshot
+import typing_patch
+from jsg import loads
+from jsg_cache import ResultCache, CacheEntry, SUFFIX, code_digest
+from schemagen import schema_text, shape_label
+
+
+class ResultCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.text = schema_text(20)
+        self.fn = os.path.join(self.dir, "schema.json")
+        with open(self.fn, 'w') as f:
+            f.write(self.text)
+        self.cache = ResultCache(os.path.join(self.dir, "cache"))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def entries(self) -> list:
+        return [fn for fn in os.listdir(self.cache.directory) if fn.endswith(SUFFIX)]
+
+    def test_load(self):
+        s = jsg.load(self.fn, module=ShExJ, cache=self.cache)
+        self.assertEqual((0, 1), (self.cache.hits, self.cache.misses))
+        self.assertEqual(1, len(self.entries()))
+        s2 = jsg.load(self.fn, module=ShExJ, cache=self.cache)
+        self.assertEqual((1, 1), (self.cache.hits, self.cache.misses))
+        self.assertIsNot(s, s2)
+        self.assertEqual(s._as_json, s2._as_json)
+        with open(self.fn) as f:
+            self.assertEqual(s._as_json, jsg.load(f, module=ShExJ, cache=self.cache)._as_json)
+        self.assertEqual(2, self.cache.hits)
+        # Load options are part of the key
+        s3 = jsg.load(self.fn, module=ShExJ, compact=True, cache=self.cache)
+        self.assertEqual(2, self.cache.misses)
+        self.assertTrue(s3.shapes[shape_label(0)].expression.expressions[0]._compact)
+        self.assertTrue(jsg.load(self.fn, module=ShExJ, compact=True, cache=self.cache).shapes[shape_label(0)]._compact)
+        self.assertEqual("Cache: 3 hits, 2 misses (60.0% hit rate)", self.cache.summary())
+
+    def test_validate(self):
+        data = self.text.encode('utf-8')
+        entry = self.cache.validate(data, ShExJ)
+        self.assertTrue(entry.valid)
+        self.assertEqual('', entry.messages)
+        self.assertEqual(loads(self.text, ShExJ)._as_json, entry.obj._as_json)
+        self.assertEqual(entry, self.cache.validate(data, ShExJ))
+        self.assertEqual(1, self.cache.hits)
+
+        s = loads(self.text, ShExJ)
+        s.shapes[shape_label(0)].expression.expressions[0].__dict__['min'] = "x"
+        bad = s._as_json.encode('utf-8')
+        entry = self.cache.validate(bad, ShExJ)
+        self.assertFalse(entry.valid)
+        self.assertIn("min", entry.messages)
+        entry2 = ResultCache(self.cache.directory).validate(bad, ShExJ)
+        self.assertFalse(entry2.valid)
+        self.assertEqual(entry.messages, entry2.messages)
+
+    def test_key(self):
+        data = self.text.encode('utf-8')
+        key = ResultCache.key(data, ShExJ)
+        self.assertEqual(key, ResultCache.key(data, ShExJ))
+        self.assertNotEqual(key, ResultCache.key(data + b' ', ShExJ))
+        self.assertNotEqual(key, ResultCache.key(data, ShExJ, intern=True))
+        version = jsg.__version__
+        try:
+            jsg.__version__ = version + '.1'
+            self.assertNotEqual(key, ResultCache.key(data, ShExJ))
+        finally:
+            jsg.__version__ = version
+
+    def test_code_digest(self):
+        data = self.text.encode('utf-8')
+
+        def module(n: int, source: str) -> types.ModuleType:
+            m = types.ModuleType(ShExJ.__name__)
+            m.__file__ = os.path.join(self.dir, "ShExJ{}.py".format(n))
+            with open(m.__file__, 'w') as f:
+                f.write(source)
+            return m
+
+        original, changed, same = module(1, "x = 1\n"), module(2, "x = 2\n"), module(3, "x = 1\n")
+        self.assertEqual(code_digest(original), code_digest(same))
+        self.assertNotEqual(code_digest(original), code_digest(changed))
+        self.assertNotEqual(ResultCache.key(data, original), ResultCache.key(data, changed))
+        self.assertNotEqual(ResultCache.key(data, ShExJ), ResultCache.key(data, original))
+        # The modules that check types and store the objects are part of the digest
+        digest = code_digest(original)
+        for m in (typing_patch, jsg_snapshot):
+            fn = m.__file__
+            try:
+                m.__file__ = module(4, "# Changed\n").__file__
+                jsg_cache._code_digests.clear()
+                self.assertNotEqual(digest, code_digest(original))
+            finally:
+                m.__file__ = fn
+                jsg_cache._code_digests.clear()
+        self.assertEqual(digest, code_digest(original))
+
+    def test_corrupt(self):
+        key = ResultCache.key(b'x', ShExJ)
+        self.cache.put(key, CacheEntry(False, "JSONDecodeError: é\n", None))
+        self.assertEqual(CacheEntry(False, "JSONDecodeError: é\n", None), self.cache.get(key, ShExJ))
+        path = os.path.join(self.cache.directory, self.entries()[0])
+        with open(path, 'r+b') as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b'!')
+        self.assertIsNone(self.cache.get(key, ShExJ))
+        self.assertIsNone(self.cache.get(ResultCache.key(b'y', ShExJ), ShExJ))
+        self.assertEqual((1, 2), (self.cache.hits, self.cache.misses))
+
+    def test_evict(self):
+        cache = ResultCache(self.cache.directory, max_size=3000)
+        keys = [ResultCache.key(str(i).encode(), ShExJ) for i in range(4)]
+        now = time.time()
+        for i, key in enumerate(keys[:3]):
+            cache.put(key, CacheEntry(True, "x" * 900, None))
+            os.utime(os.path.join(cache.directory, key + SUFFIX), (now - 100 + i, now - 100 + i))
+        self.assertEqual(3, len(self.entries()))
+        self.assertIsNotNone(cache.get(keys[0], ShExJ))     # Now the most recently used
+        cache.put(keys[3], CacheEntry(True, "x" * 900, None))
+        self.assertEqual(3, len(self.entries()))
+        self.assertIsNone(cache.get(keys[1], ShExJ))
+        self.assertIsNotNone(cache.get(keys[0], ShExJ))
+        self.assertEqual(3, cache.evict(0))
+        self.assertEqual([], self.entries())
+
+    def test_overwrite(self):
+        cache = ResultCache(self.cache.directory, max_size=3000)
+        keys = [ResultCache.key(str(i).encode(), ShExJ) for i in range(2)]
+        for key in keys:
+            cache.put(key, CacheEntry(True, "x" * 900, None))
+        for _ in range(5):
+            cache.put(keys[1], CacheEntry(True, "x" * 900, None))
+        self.assertEqual(2, len(self.entries()))
+        self.assertEqual(sum(os.path.getsize(os.path.join(cache.directory, fn)) for fn in self.entries()), cache._size)
+        cache.put(keys[1], CacheEntry(True, "x", None))
+        self.assertEqual(sum(os.path.getsize(os.path.join(cache.directory, fn)) for fn in self.entries()), cache._size)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+import unittest
+from io import StringIO
+from unittest import mock
+
+import ShExJ
+from jsg import loads
+from jsg_parallel import validate_parallel, CHUNKS_PER_WORKER
+from logger import Logger
+from schemagen import schema_text, shape_label
+
+
+class ParallelTestCase(unittest.TestCase):
+    def compare(self, s, logging: bool, **kwargs) -> bool:
+        serial_out, parallel_out = StringIO(), StringIO()
+        serial = Logger(serial_out if logging else None)
+        parallel = Logger(parallel_out if logging else None)
+        rval = s._is_valid(serial)
+        self.assertEqual(rval, validate_parallel(s, parallel, **kwargs))
+        self.assertEqual(serial.nerrors, parallel.nerrors)
+        self.assertEqual(serial_out.getvalue(), parallel_out.getvalue())
+        return rval
+
+    def test_valid(self):
+        s = loads(schema_text(50), ShExJ)
+        self.assertTrue(self.compare(s, False, workers=2))
+        self.assertTrue(self.compare(s, True, workers=3))
+        self.assertTrue(validate_parallel(s, workers=2))
+
+    def test_invalid(self):
+        s = loads(schema_text(50), ShExJ)
+        for n in (3, 17, 41):
+            s.shapes[shape_label(n)].expression.expressions[1].min = "x"
+        s.shapes[shape_label(30)].expression.__dict__["type"] = "OneOf"
+        s.__dict__["clown"] = 1
+        for logging in (False, True):
+            self.assertFalse(self.compare(s, logging, workers=2))
+        self.assertFalse(validate_parallel(s, workers=2))
+        out = StringIO()
+        validate_parallel(s, Logger(out), workers=2)
+        self.assertEqual(5, len(out.getvalue().strip().split('\n')))
+        serial, parallel = Logger(keep_records=True), Logger(keep_records=True)
+        s._is_valid(serial)
+        validate_parallel(s, parallel, workers=2)
+        self.assertEqual([str(r) for r in serial.records], [str(r) for r in parallel.records])
+        self.assertEqual('shapes["{}"].expression.expressions[1].min'.format(shape_label(3)),
+                         parallel.records[0].location)
+
+    def test_pool(self):
+        s = loads(schema_text(50), ShExJ)
+        for n in (3, 41):
+            s.shapes[shape_label(n)].expression.expressions[1].min = "x"
+        serial = Logger(keep_records=True)
+        self.assertFalse(s._is_valid(serial))
+        for workers in (2, 3):
+            parallel = Logger(keep_records=True)
+            with mock.patch.object(Logger, 'merge', autospec=True, side_effect=Logger.merge) as merge:
+                self.assertFalse(validate_parallel(s, parallel, workers=workers))
+            # Every chunk came back through the pool
+            self.assertEqual(workers * CHUNKS_PER_WORKER, merge.call_count)
+            merged = [r for call in merge.call_args_list for r in call[0][2]]
+            self.assertEqual(serial.nerrors, sum(call[0][1] for call in merge.call_args_list))
+            self.assertEqual([str(r) for r in serial.records], [str(r) for r in merged])
+            self.assertEqual(serial.nerrors, parallel.nerrors)
+            self.assertEqual([str(r) for r in serial.records], [str(r) for r in parallel.records])
+
+    def test_serial(self):
+        s = loads(schema_text(5), ShExJ)
+        self.assertTrue(self.compare(s, True, workers=1))
+        self.assertTrue(self.compare(s, True, workers=2, member="prefixes"))
+        self.assertTrue(self.compare(loads('{"type": "Schema"}', ShExJ), True, workers=2))
+
+
+if __name__ == '__main__':
+    unittest.main()
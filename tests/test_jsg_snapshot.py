@@ -0,0 +1,143 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+import struct
+import unittest
+from io import BytesIO
+
+import ShExJ
+from ShExJ import *
+from jsg import loads
+from jsg_snapshot import dumps, dump, loads as snapshot_loads, load, SnapshotError, MAGIC, module_strings
+from schemagen import schema_text, shape_label
+
+
+class SnapshotTestCase(unittest.TestCase):
+    def setUp(self):
+        self.text = schema_text(60)
+        self.s = loads(self.text, ShExJ)
+
+    def test_round_trip(self):
+        c = snapshot_loads(dumps(self.s), ShExJ)
+        self.assertEqual(self.s._as_json, c._as_json)
+        self.assertEqual(self.s, c)
+        self.assertEqual(list(self.s.shapes[shape_label(1)].__dict__.keys()),
+                         list(c.shapes[shape_label(1)].__dict__.keys()))
+        self.assertTrue(c._is_valid())
+        self.assertTrue(dumps(self.s).startswith(MAGIC))
+
+    def test_stream(self):
+        out = BytesIO()
+        dump(self.s, out)
+        out.seek(0)
+        self.assertEqual(self.s._as_json, load(out, ShExJ)._as_json)
+
+    def test_values(self):
+        nc = NodeConstraint(datatype=IRI("http://a.example/dt1"))
+        nc.values = [1.5, -0.0, True, False, None, 0, -1, 17, -(1 << 40), 1 << 80, {}, [], {"a": [1, {"b": None}]},
+                     "xé\U0001f600", ""]
+        c = snapshot_loads(dumps(nc, validate=False), ShExJ)
+        self.assertEqual(nc._as_json, c._as_json)
+        self.assertEqual(nc.values, c.values)
+
+    def test_shared(self):
+        tc = self.s.shapes[shape_label(0)].expression.expressions[0]
+        self.s.shapes[shape_label(1)].expression.expressions[0] = tc
+        data = dumps(self.s)
+        c = snapshot_loads(data, ShExJ)
+        self.assertEqual(self.s._as_json, c._as_json)
+        e0 = c.shapes[shape_label(0)].expression.expressions
+        e1 = c.shapes[shape_label(1)].expression.expressions
+        self.assertIs(e0[0], e1[0])
+        self.assertIsNot(e0[3], e1[3])
+        e0[0].min = 1
+        self.assertEqual(1, e1[0].min)
+        self.assertEqual(self.s._as_json, snapshot_loads(dumps(loads(self.text, ShExJ, intern=True)), ShExJ)._as_json)
+
+    def test_compact(self):
+        c = snapshot_loads(dumps(self.s), ShExJ, compact=True)
+        vc = c.shapes[shape_label(0)].expression.expressions[0].valueExpr
+        self.assertEqual(['type', 'datatype'], list(vc.__dict__.keys()))
+        self.assertTrue(vc._compact)
+        self.assertIsNone(vc.values)
+        self.assertEqual(self.s._as_json, c._as_json)
+        self.assertFalse(snapshot_loads(dumps(self.s), ShExJ).shapes[shape_label(0)]._compact)
+
+    def test_base(self):
+        base = module_strings(ShExJ)
+        self.assertEqual(['ShExJ', 'type'], base[:2])
+        self.assertIn('TripleConstraint', base)
+        self.assertIn('valueExpr', base)
+        self.assertEqual(len(base), len(set(base)))
+        data = dumps(self.s, base=base)
+        self.assertLess(len(data), len(dumps(self.s)))
+        self.assertEqual(self.s._as_json, snapshot_loads(data, ShExJ, base)._as_json)
+        with self.assertRaises(SnapshotError) as e:
+            snapshot_loads(data, ShExJ)
+        self.assertEqual("Snapshot requires a base string table of {} strings".format(len(base)), str(e.exception))
+        with self.assertRaises(SnapshotError):
+            snapshot_loads(data, ShExJ, base[:-1])
+        out = BytesIO()
+        dump(self.s, out, base=base)
+        self.assertEqual(data, out.getvalue())
+        out.seek(0)
+        self.assertEqual(self.s._as_json, load(out, ShExJ, base)._as_json)
+        out.seek(0)
+        with self.assertRaises(SnapshotError):
+            load(out, ShExJ)
+
+    def test_invalid(self):
+        self.s.shapes[shape_label(0)].expression.expressions[0].__dict__['min'] = "x"
+        with self.assertRaises(ValueError):
+            dumps(self.s)
+        c = snapshot_loads(dumps(self.s, validate=False), ShExJ)
+        self.assertFalse(c._is_valid())
+
+    def test_errors(self):
+        data = dumps(self.s)
+        with self.assertRaises(SnapshotError) as e:
+            snapshot_loads(b'JSON' + data[4:], ShExJ)
+        self.assertEqual("Not a snapshot", str(e.exception))
+        with self.assertRaises(SnapshotError) as e:
+            snapshot_loads(data[:4] + struct.pack('<H', 99) + data[6:], ShExJ)
+        self.assertEqual("Unsupported snapshot version: 99", str(e.exception))
+        with self.assertRaises(SnapshotError) as e:
+            snapshot_loads(data[:-1], ShExJ)
+        self.assertEqual("Snapshot is truncated", str(e.exception))
+        with self.assertRaises(SnapshotError) as e:
+            snapshot_loads(data[:-1] + bytes([data[-1] ^ 1]), ShExJ)
+        self.assertEqual("Snapshot checksum mismatch", str(e.exception))
+        with self.assertRaises(SnapshotError):
+            snapshot_loads(data[:8], ShExJ)
+        with self.assertRaises(SnapshotError) as e:
+            snapshot_loads(data, unittest)
+        self.assertEqual("Snapshot is of ShExJ not unittest", str(e.exception))
+        self.assertTrue(issubclass(SnapshotError, ValueError))
+
+
+if __name__ == '__main__':
+    unittest.main()
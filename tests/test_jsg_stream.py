@@ -0,0 +1,93 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+import json
+import unittest
+from io import StringIO
+
+import ShExJ
+import jsg_stream
+from jsg import loads
+from schemagen import schema_text, shape_label
+
+
+class StreamTestCase(unittest.TestCase):
+    def test_load(self):
+        text = schema_text(20)
+        expected = loads(text, ShExJ)._as_json
+        for chunk_size in (1, 7, 64, 1 << 16):
+            s = jsg_stream.load(StringIO(text), ShExJ, chunk_size=chunk_size)
+            self.assertTrue(isinstance(s, ShExJ.Schema))
+            self.assertEqual(expected, s._as_json)
+            self.assertTrue(s._is_valid())
+
+    def test_pretty_printed(self):
+        text = json.dumps(json.loads(schema_text(3)), indent=3)
+        self.assertEqual(loads(text, ShExJ)._as_json, jsg_stream.load(StringIO(text), ShExJ, chunk_size=5)._as_json)
+
+    def test_numbers_across_chunks(self):
+        text = '{"type": "Schema", "start": {"type": "NodeConstraint", "mininclusive": 123456789}, "shapes": {}}'
+        for chunk_size in range(1, 20):
+            s = jsg_stream.load(StringIO(text), ShExJ, chunk_size=chunk_size)
+            self.assertEqual(123456789, s.start.mininclusive)
+            self.assertEqual({}, s.shapes)
+
+    def test_tokens_across_chunks(self):
+        text = '{"type": "Schema", "shapes": {"http://a.example/S\\u00e9": {"type": "Shape", "closed": true, ' \
+               '"extra": ["http://a.example/p\\u00e9"]}}, "base": null}'
+        for chunk_size in range(1, 20):
+            s = jsg_stream.load(StringIO(text), ShExJ, chunk_size=chunk_size)
+            self.assertEqual(loads(text, ShExJ)._as_json, s._as_json)
+
+    def test_malformed_early(self):
+        # A syntax error near the start is reported without reading the rest of the document
+        text = '{"type": "Schema", "shapes": {"http://a.example/S1": {"type": "Shape", "closed": tru}, ' + \
+               ', '.join('"http://a.example/S{}": {{"type": "Shape"}}'.format(n) for n in range(2, 20000)) + '}}'
+        f = StringIO(text)
+        with self.assertRaises(ValueError):
+            list(jsg_stream.iterload(f, ShExJ, chunk_size=64))
+        self.assertLess(f.tell(), 1000)
+
+    def test_iterload(self):
+        text = schema_text(10)
+        entries = jsg_stream.iterload(StringIO(text), ShExJ, chunk_size=32)
+        label, shape = next(entries)
+        self.assertEqual(shape_label(0), label)
+        self.assertTrue(isinstance(shape, ShExJ.Shape) and shape._is_valid())
+        self.assertEqual([shape_label(n) for n in range(1, 10)], [label for label, _ in entries])
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            jsg_stream.load(StringIO('{"type": "Schema", "shapes": {"a": 1'), ShExJ)
+        with self.assertRaises(ValueError):
+            jsg_stream.load(StringIO('{"type": "Schema"} x'), ShExJ)
+        with self.assertRaises(ValueError):
+            list(jsg_stream.iterload(StringIO('{"type": "Schema", "shapes": {"a": 1 "b": 2}}'), ShExJ))
+
+
+if __name__ == '__main__':
+    unittest.main()
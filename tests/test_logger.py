@@ -0,0 +1,153 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+import pickle
+import unittest
+from io import StringIO
+
+import ShExJ
+from ShExJ import *
+from jsg import loads
+from logger import Logger, ErrorRecord, MISSING_FIELD, FIELD_TYPE, EXTRA_ELEMENT, WRONG_TYPE, MESSAGE, format_path
+from memlogger import MemLogger
+
+
+class LoggerTestCase(unittest.TestCase):
+    def broken(self) -> Schema:
+        s = loads('{"type": "Schema", "shapes": {"http://a.example/S1": {"type": "Shape", "closed": true, '
+                  '"expression": {"type": "TripleConstraint", "predicate": "http://a.example/p1"}}}}', ShExJ)
+        tc = s.shapes["http://a.example/S1"].expression
+        tc.__dict__['min'] = "x"
+        tc.__dict__['clown'] = 1
+        del tc.__dict__['predicate']
+        return s
+
+    def test_text(self):
+        out = StringIO()
+        log = Logger(out)
+        self.assertFalse(self.broken()._is_valid(log))
+        self.assertEqual(3, log.nerrors)
+        self.assertEqual("TripleConstraint: Missing required field: predicate\n"
+                         "TripleConstraint: Type mismatch for min. Expecting: typing.Union[ShExJ.INTEGER, NoneType] "
+                         "Got: <class 'str'>\n"
+                         "Extra element: clown: 1\n", out.getvalue())
+        self.assertEqual([], log.records)
+
+    def test_records(self):
+        log = Logger(keep_records=True)
+        self.assertTrue(log.logging)
+        self.assertFalse(self.broken()._is_valid(log))
+        self.assertEqual([MISSING_FIELD, FIELD_TYPE, EXTRA_ELEMENT], [r.code for r in log.records])
+        record = log.records[1]
+        self.assertEqual(('TripleConstraint', 'min', 'x'), (record.context, record.field, record.actual))
+        self.assertIsNone(record._message)
+        out = StringIO()
+        self.broken()._is_valid(Logger(out))
+        self.assertEqual(out.getvalue(), ''.join(m + '\n' for m in log.messages()))
+        self.assertIsNotNone(record._message)
+        self.assertEqual('shapes["http://a.example/S1"].expression.min: ' + record.message, str(record))
+
+    def test_fast_fail(self):
+        log = Logger()
+        self.assertFalse(log.logging)
+        self.assertFalse(self.broken()._is_valid(log))
+        self.assertEqual(1, log.nerrors)
+        self.assertEqual([], log.records)
+        self.assertTrue(log.log("text"))
+        self.assertTrue(log.error(WRONG_TYPE, "IRI", actual="x"))
+
+    def test_cap(self):
+        log = Logger(keep_records=True, max_records=2)
+        for i in range(5):
+            self.assertFalse(log.log("error {}".format(i)))
+        self.assertEqual(5, log.nerrors)
+        self.assertEqual(["error 0", "error 1"], list(log.messages()))
+        log = Logger(keep_records=True, max_records=0)
+        self.assertFalse(self.broken()._is_valid(log))
+        self.assertEqual(3, log.nerrors)
+        self.assertEqual([], log.records)
+
+    def test_merge(self):
+        worker = Logger(keep_records=True)
+        self.broken()._is_valid(worker)
+        records = pickle.loads(pickle.dumps(worker.records))
+        self.assertEqual(list(worker.messages()), [r.message for r in records])
+        self.assertIsNone(records[1].actual)
+        self.assertEqual([None if r.expected is None else str(r.expected) for r in worker.records],
+                         [r.expected for r in records])
+        record = pickle.loads(pickle.dumps(ErrorRecord(WRONG_TYPE, "IRI", actual="x")))
+        self.assertIsNone(record.expected)
+        self.assertEqual("Wrong type: IRI: x", record.message)
+        self.assertEqual([r.location for r in worker.records], [r.location for r in records])
+        self.assertEqual(str(worker.records[0]), str(records[0]))
+        out = StringIO()
+        log = Logger(out, keep_records=True, max_records=2)
+        log.log("first")
+        log.merge(worker.nerrors, records)
+        self.assertEqual(4, log.nerrors)
+        self.assertEqual(["first"] + list(worker.messages()), out.getvalue().splitlines())
+        self.assertEqual(2, len(log.records))
+        log = Logger()
+        log.merge(2, [])
+        self.assertEqual(2, log.nerrors)
+
+    def test_record(self):
+        self.assertEqual("Wrong type: IRI: x", ErrorRecord(WRONG_TYPE, "IRI", actual="x").message)
+        self.assertEqual("ErrorRecord(0, 'text', '')", repr(ErrorRecord(MESSAGE, actual="text")))
+        self.assertEqual("text", str(ErrorRecord(MESSAGE, actual="text")))
+
+    def test_paths(self):
+        self.assertEqual('shapes["http://a.example/S1"].expression.expressions[3].valueExpr',
+                         format_path(('shapes', (IRI("http://a.example/S1"), ), 'expression', 'expressions', 3,
+                                      'valueExpr')))
+        self.assertEqual('[0]["a\\"b"]', format_path((0, ('a"b', ))))
+        self.assertEqual('', format_path(()))
+        s = loads('{"type": "Schema", "shapes": {"http://a.example/S1": {"type": "Shape", "expression": '
+                  '{"type": "EachOf", "expressions": [{"type": "TripleConstraint", "predicate": "http://a.example/p1"},'
+                  ' {"type": "TripleConstraint", "predicate": "http://a.example/p2", "valueExpr": '
+                  '{"type": "NodeConstraint", "datatype": "http://a.example/dt1"}}]}}}}', ShExJ)
+        tcs = s.shapes["http://a.example/S1"].expression.expressions
+        tcs[1].valueExpr.length = INTEGER("x")
+        tcs[0].__dict__['type'] = "Clown"
+        log = Logger(keep_records=True)
+        self.assertFalse(s._is_valid(log))
+        self.assertEqual(['shapes["http://a.example/S1"].expression.expressions[0]',
+                          'shapes["http://a.example/S1"].expression.expressions[1].valueExpr.length'],
+                         [r.location for r in log.records])
+        self.assertEqual([], log._path)
+        self.assertIsNone(Logger()._path)
+        self.assertIsNone(Logger(StringIO())._path)
+
+    def test_memlogger(self):
+        log = MemLogger("\t")
+        print("a", file=log)
+        print("b", file=log)
+        self.assertEqual("\ta\t\n\tb\t\n", log.log)
+
+
+if __name__ == '__main__':
+    unittest.main()
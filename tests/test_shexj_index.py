@@ -0,0 +1,254 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+import copy
+import json
+import pickle
+import unittest
+
+import ShExJ
+from jsg import loads, JSGObject
+from schemagen import schema_text, shape_label
+from shexj_index import SchemaIndex, shape_references, extract
+
+EX = "http://a.example/"
+
+
+def ref(n: str) -> dict:
+    return {"type": "ShapeRef", "reference": EX + n}
+
+
+def tc(p: str, value_expr: dict) -> dict:
+    return {"type": "TripleConstraint", "predicate": EX + p, "valueExpr": value_expr}
+
+
+# A -> B -> C -> B, A includes D, E inherits A, F -> missing, G alone
+SCHEMA = {"type": "Schema", "shapes": {
+    EX + "A": {"type": "Shape", "expression": {"type": "EachOf", "expressions": [
+        tc("p1", ref("B")), {"type": "Inclusion", "include": EX + "D"}]}},
+    EX + "B": {"type": "ShapeAnd", "shapeExprs": [{"type": "NodeConstraint", "nodeKind": "iri"},
+                                                   {"type": "Shape", "expression": tc("p2", ref("C"))}]},
+    EX + "C": {"type": "ShapeNot", "shapeExpr": ref("B")},
+    EX + "D": {"type": "Shape", "expression": tc("p3", {"type": "NodeConstraint", "datatype": EX + "dt"})},
+    EX + "E": {"type": "Shape", "inherit": [EX + "A"]},
+    EX + "F": {"type": "ShapeOr", "shapeExprs": [ref("missing"), ref("F")]},
+    EX + "G": {"type": "ShapeExternal"}}}
+
+
+class SchemaIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.schema = loads(json.dumps(SCHEMA), ShExJ)
+        self.index = SchemaIndex(self.schema)
+
+    def labels(self, *names: str) -> set:
+        return {EX + n for n in names}
+
+    def test_references(self):
+        index = self.index
+        self.assertEqual(7, len(index))
+        self.assertIs(self.schema.shapes[EX + "A"], index[EX + "A"])
+        self.assertIs(self.schema.shapes[EX + "A"], index[ShExJ.IRI(EX + "A")])
+        self.assertIsNone(index.get(EX + "missing"))
+        self.assertEqual(self.labels("B", "D"), index.references(EX + "A"))
+        self.assertEqual(self.labels("A"), index.references(EX + "E"))
+        self.assertEqual(self.labels("A", "C"), index.referenced_by(EX + "B"))
+        self.assertEqual(set(), index.referenced_by(EX + "G"))
+        self.assertEqual(self.labels("missing"), index.undefined())
+
+    def test_closure(self):
+        index = self.index
+        self.assertEqual(self.labels("A", "B", "C", "D"), index.closure(EX + "A"))
+        self.assertEqual(self.labels("E", "A", "B", "C", "D"), index.closure([EX + "E"]))
+        self.assertEqual(self.labels("F", "missing"), index.closure(EX + "F"))
+        self.assertEqual(self.labels("G"), index.closure(EX + "G"))
+
+    def test_components(self):
+        index = self.index
+        components = index.components()
+        self.assertEqual(6, len(components))
+        self.assertEqual(self.labels("B", "C"), index.component(EX + "C"))
+        self.assertLess(components.index(index.component(EX + "B")), components.index(index.component(EX + "A")))
+        self.assertLess(components.index(index.component(EX + "A")), components.index(index.component(EX + "E")))
+        self.assertTrue(index.is_recursive(EX + "B"))
+        self.assertTrue(index.is_recursive(EX + "F"))
+        self.assertFalse(index.is_recursive(EX + "A"))
+
+    def test_update(self):
+        index = self.index
+        index[EX + "G"] = loads(json.dumps({"type": "ShapeNot", "shapeExpr": ref("E")}), ShExJ)
+        self.assertIn(EX + "G", index.referenced_by(EX + "E"))
+        self.assertEqual(self.labels("G", "E", "A", "B", "C", "D"), index.closure(EX + "G"))
+        index[ShExJ.IRI(EX + "H")] = ShExJ.ShapeRef(reference=ShExJ.IRI(EX + "A"))
+        self.assertEqual(self.labels("A", "B", "C", "D", "H"), index.closure(EX + "H"))
+        self.assertTrue(self.schema._is_valid())
+
+        del index[EX + "C"]
+        self.assertNotIn(EX + "C", self.schema.shapes)
+        self.assertEqual(self.labels("C", "missing"), index.undefined())
+        self.assertFalse(index.is_recursive(EX + "B"))
+
+        # In place change
+        self.schema.shapes[EX + "D"].expression.valueExpr = ShExJ.ShapeRef(reference=ShExJ.IRI(EX + "A"))
+        index.update(EX + "D")
+        self.assertTrue(index.is_recursive(EX + "A"))
+        self.assertEqual(self.labels("A", "D"), index.component(EX + "D"))
+
+        self.schema.shapes = {}
+        self.assertEqual(0, len(index))
+        self.assertEqual([], index.components())
+        self.schema.shapes[EX + "A"] = ShExJ.ShapeRef(reference=ShExJ.IRI(EX + "B"))
+        self.assertEqual(self.labels("B"), index.references(EX + "A"))
+
+    def test_mutation(self):
+        index, shapes = self.index, self.schema.shapes
+        shapes["http://a/S3"] = ShExJ.ShapeRef(reference=ShExJ.IRI(EX + "G"))
+        self.assertIn("http://a/S3", index)
+        self.assertEqual({"http://a/S3"}, index.referenced_by(EX + "G"))
+        shapes["http://a/S3"] = ShExJ.ShapeRef(reference=ShExJ.IRI(EX + "A"))
+        self.assertEqual(set(), index.referenced_by(EX + "G"))
+        self.assertEqual(self.labels("A", "B", "C", "D") | {"http://a/S3"}, index.closure("http://a/S3"))
+        del shapes[EX + "C"]
+        self.assertNotIn(EX + "C", index)
+        self.assertFalse(index.is_recursive(EX + "B"))
+        shapes.pop(EX + "B")
+        self.assertEqual(self.labels("B", "missing"), index.undefined())
+        shapes.update({EX + "B": ShExJ.ShapeRef(reference=ShExJ.IRI(EX + "B"))})
+        self.assertTrue(index.is_recursive(EX + "B"))
+        shapes.setdefault(EX + "X", ShExJ.ShapeRef(reference=ShExJ.IRI(EX + "A")))
+        self.assertEqual(self.labels("A"), index.references(EX + "X"))
+        self.assertEqual(len(shapes), len(index))
+        other = SchemaIndex(self.schema)
+        shapes.clear()
+        self.assertEqual(0, len(index))
+        self.assertEqual(0, len(other))
+        self.assertEqual(dict, type(copy.deepcopy(self.schema).shapes))
+        self.assertEqual(dict, type(pickle.loads(pickle.dumps(self.schema)).shapes))
+
+    def test_empty(self):
+        s = ShExJ.Schema()
+        index = SchemaIndex(s)
+        self.assertEqual(0, len(index))
+        self.assertEqual('{"type": "Schema"}', s._as_json)
+        index[EX + "A"] = ShExJ.ShapeRef(reference=ShExJ.IRI(EX + "B"))
+        self.assertEqual({EX + "A": index[EX + "A"]}, s.shapes)
+
+    def test_interned(self):
+        s = loads(schema_text(100), ShExJ, intern=True)
+        index = SchemaIndex(s)
+        self.assertEqual({shape_label(1)}, index.references(shape_label(0)))
+        self.assertEqual(1, len(index.components()))
+        self.assertEqual(100, len(index.closure(shape_label(42))))
+        self.assertEqual({shape_label(1)}, shape_references(s.shapes[shape_label(0)]))
+
+    def test_incremental(self):
+        try:
+            JSGObject._incremental = True
+            s = loads(json.dumps(SCHEMA), ShExJ)
+            index = SchemaIndex(s)
+            self.assertTrue(s._is_valid())
+            index[EX + "X"] = ShExJ.Shape(closed="maybe")
+            self.assertFalse(s._is_valid())
+            del index[EX + "X"]
+            self.assertTrue(s._is_valid())
+            s.shapes[EX + "X"] = ShExJ.Shape(closed="maybe")
+            self.assertFalse(s._is_valid())
+            del s.shapes[EX + "X"]
+            self.assertTrue(s._is_valid())
+
+            # Changes inside a shape are reported to the index, before and after validation
+            s = loads(json.dumps(SCHEMA), ShExJ)
+            index = SchemaIndex(s)
+            s.shapes[EX + "D"].expression.valueExpr = ShExJ.ShapeRef(reference=ShExJ.IRI(EX + "A"))
+            self.assertTrue(index.is_recursive(EX + "A"))
+            self.assertTrue(s._is_valid())
+            s.shapes[EX + "D"].expression.valueExpr = None
+            self.assertFalse(index.is_recursive(EX + "A"))
+            s.shapes[EX + "D"].expression.valueExpr = ShExJ.ShapeRef(reference=ShExJ.IRI(EX + "G"))
+            self.assertEqual(self.labels("G"), index.references(EX + "D"))
+            tc = s.shapes[EX + "D"].expression
+            s.shapes[EX + "D"] = ShExJ.ShapeRef(reference=ShExJ.IRI(EX + "F"))
+            tc.valueExpr = ShExJ.ShapeRef(reference=ShExJ.IRI(EX + "A"))
+            self.assertEqual(self.labels("F"), index.references(EX + "D"))
+            self.assertTrue(s._is_valid())
+        finally:
+            JSGObject._incremental = False
+
+
+class ExtractTestCase(unittest.TestCase):
+    def setUp(self):
+        schema = dict(SCHEMA)
+        schema["prefixes"] = {"ex": EX, "xsd": "http://www.w3.org/2001/XMLSchema#", "other": "http://other.example/"}
+        schema["base"] = "http://base.example/"
+        schema["startActs"] = [{"type": "SemAct", "name": EX + "ext1"}, {"type": "SemAct", "name": EX + "ext2"}]
+        schema["start"] = ref("A")
+        schema["shapes"] = dict(schema["shapes"])
+        schema["shapes"][EX + "G"] = {"type": "Shape", "semActs": [{"type": "SemAct", "name": EX + "ext2"}]}
+        self.schema = loads(json.dumps(schema), ShExJ)
+
+    def test_extract(self):
+        s = self.schema
+        sub = extract(s, EX + "A")
+        self.assertEqual([EX + n for n in "ABCD"], list(sub.shapes.keys()))
+        self.assertIs(s.shapes[EX + "A"], sub.shapes[EX + "A"])
+        self.assertEqual({"ex": EX}, sub.prefixes)
+        self.assertEqual("http://base.example/", sub.base)
+        self.assertIsNone(sub.startActs)
+        self.assertIs(s.start, sub.start)
+        self.assertTrue(sub._is_valid())
+
+        sub = extract(s, [EX + "G", EX + "F"])
+        self.assertEqual([EX + "F", EX + "G"], list(sub.shapes.keys()))
+        self.assertEqual([EX + "ext2"], [act.name for act in sub.startActs])
+        self.assertIsNone(sub.start)
+        self.assertEqual({"ex": EX}, sub.prefixes)
+
+        self.assertEqual({}, extract(s, []).shapes)
+
+    def test_source_unchanged(self):
+        text = self.schema._as_json
+        extract(self.schema, [EX + "A", EX + "G"])
+        self.assertEqual(text, self.schema._as_json)
+        s = ShExJ.Schema(start=ShExJ.ShapeRef(reference=ShExJ.IRI(EX + "A")))
+        self.assertEqual({}, extract(s, EX + "A").shapes)
+        self.assertEqual('{"type": "Schema", "start": {"type": "ShapeRef", "reference": "http://a.example/A"}}',
+                         s._as_json)
+
+    def test_index(self):
+        index = SchemaIndex(self.schema)
+        self.assertEqual(extract(self.schema, EX + "E")._as_json, index.extract(EX + "E")._as_json)
+        self.assertEqual(5, len(index.extract([EX + "E"]).shapes))
+
+    def test_large(self):
+        s = loads(schema_text(50), ShExJ)
+        s.shapes[shape_label(49)].expression.expressions[3].valueExpr = ShExJ.NodeConstraint(nodeKind="iri")
+        sub = extract(s, shape_label(45))
+        self.assertEqual([shape_label(n) for n in range(45, 50)], list(sub.shapes.keys()))
+        self.assertEqual(s.prefixes, sub.prefixes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+import json
+import unittest
+
+import ShExJ
+from jsg import loads
+from shexj_nodeconstraint import compile_constraint, numeric_value, digit_counts
+from shexj_terms import literal, XSD, XSD_INTEGER, XSD_DECIMAL, XSD_DOUBLE
+
+EX = "http://a.example/"
+
+
+def nc(**kwargs) -> ShExJ.NodeConstraint:
+    kwargs["type"] = "NodeConstraint"
+    rval = loads(json.dumps(kwargs), ShExJ)
+    assert rval._is_valid()
+    return rval
+
+
+class NodeConstraintTestCase(unittest.TestCase):
+    def check(self, constraint: ShExJ.NodeConstraint, passes: list, fails: list) -> None:
+        checker = compile_constraint(constraint)
+        for term in passes:
+            self.assertTrue(checker(term), "{} should pass".format(term))
+        for term in fails:
+            self.assertFalse(checker(term), "{} should fail".format(term))
+        self.assertEqual([True] * len(passes) + [False] * len(fails), checker.check_many(passes + fails))
+
+    def test_empty(self):
+        self.check(nc(), [EX + "a", "_:b", literal("x")], [])
+
+    def test_node_kind(self):
+        iri, bnode, lit = EX + "a", "_:b", literal("x")
+        self.check(nc(nodeKind="iri"), [iri], [bnode, lit])
+        self.check(nc(nodeKind="bnode"), [bnode], [iri, lit])
+        self.check(nc(nodeKind="nonliteral"), [iri, bnode], [lit])
+        self.check(nc(nodeKind="literal"), [lit], [iri, bnode])
+
+    def test_datatype(self):
+        self.check(nc(datatype=XSD_INTEGER), [literal("12", XSD_INTEGER), literal("-0", XSD_INTEGER)],
+                   [literal("12"), literal("1.5", XSD_INTEGER), literal(" 1", XSD_INTEGER), EX + "a"])
+        self.check(nc(datatype=XSD + "byte"), [literal("127", XSD + "byte")], [literal("128", XSD + "byte")])
+        self.check(nc(datatype=XSD + "boolean"), [literal("true", XSD + "boolean"), literal("0", XSD + "boolean")],
+                   [literal("yes", XSD + "boolean")])
+        self.check(nc(datatype=EX + "dt"), [literal("anything", EX + "dt")], [literal("anything")])
+
+    def test_string_facets(self):
+        self.check(nc(length=3), [literal("abc"), literal("123", XSD_INTEGER), "ex:"], [literal("ab"), "_:b"])
+        self.check(nc(minlength=2, maxlength=3), [literal("ab"), literal("abc")], [literal("a"), literal("abcd")])
+        self.check(nc(pattern="^[0-9]{2}-"), [literal("12-ab"), "12-http"], [literal("1-2"), "_:12-"])
+        self.check(nc(pattern="b"), [literal("abc")], [literal("xyz")])
+
+    def test_numeric_facets(self):
+        self.check(nc(mininclusive="1", maxexclusive="2.5"),
+                   [literal("1", XSD_INTEGER), literal("2.4", XSD_DECIMAL), literal("2.0E0", XSD_DOUBLE)],
+                   [literal("0", XSD_INTEGER), literal("2.5", XSD_DECIMAL), literal("1"), literal("NaN", XSD_DOUBLE),
+                    EX + "a"])
+        self.check(nc(minexclusive=1, maxinclusive=1.5e1),
+                   [literal("15", XSD_INTEGER), literal("1.5E1", XSD_DOUBLE)],
+                   [literal("1", XSD_INTEGER), literal("15.01", XSD_DECIMAL), literal("INF", XSD_DOUBLE)])
+        self.check(nc(totaldigits="3", fractiondigits="1"),
+                   [literal("12.5", XSD_DECIMAL), literal("0012.50", XSD_DECIMAL), literal("999", XSD_INTEGER)],
+                   [literal("1.25", XSD_DECIMAL), literal("1234", XSD_INTEGER), literal("1.5", XSD_DOUBLE)])
+
+    def test_values(self):
+        values = [EX + "v1", '"abc"', '"5"^^' + XSD_INTEGER, '"chat"@fr',
+                  {"type": "Stem", "stem": EX + "s/"},
+                  {"type": "Stem", "stem": EX + "s/sub/"},
+                  {"type": "StemRange", "stem": EX + "r/", "exclusions": [EX + "r/x", {"type": "Stem",
+                                                                                     "stem": EX + "r/no/"}]}]
+        self.check(nc(values=values),
+                   [EX + "v1", literal("abc"), literal("5", XSD_INTEGER), literal("chat", language="FR"),
+                    EX + "s/", EX + "s/a", EX + "s/sub/a", EX + "r/a", EX + "r/no"],
+                   [EX + "v2", literal("abd"), literal("05", XSD_INTEGER), literal(EX + "v1"), EX + "s", EX + "r/x",
+                    EX + "r/no/a", EX + "t/"])
+
+    def test_wildcard(self):
+        values = [{"type": "StemRange", "stem": {"type": "Wildcard"},
+                   "exclusions": [EX + "x", '"x"', {"type": "Stem", "stem": EX + "no/"}]}]
+        self.check(nc(values=values), [EX + "a", literal("a"), "_:x", EX + "no"],
+                   [EX + "x", literal("x"), EX + "no/a"])
+
+    def test_check_many(self):
+        checker = compile_constraint(nc(datatype=XSD_INTEGER, mininclusive=0))
+        terms = [literal(str(i % 7 - 3), XSD_INTEGER) for i in range(100)]
+        self.assertEqual([checker(term) for term in terms], checker.check_many(iter(terms)))
+        self.assertEqual([], checker.check_many([]))
+
+    def test_helpers(self):
+        self.assertEqual(12, numeric_value(literal("+12", XSD_INTEGER)))
+        self.assertIsNone(numeric_value(literal("12")))
+        self.assertEqual((3, 1), digit_counts(literal("-012.50", XSD_DECIMAL)))
+        self.assertEqual((1, 0), digit_counts(literal("0", XSD_INTEGER)))
+        self.assertIsNone(digit_counts(literal("1.5", XSD_DOUBLE)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,233 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+import json
+import random
+import unittest
+
+import ShExJ
+from jsg import loads
+from shexj_nodeconstraint import compile_constraint
+from shexj_shapemap import Graph, ShapeMapEngine, ShapeResult, START
+from shexj_terms import literal, XSD_INTEGER
+from shexj_tripleexpr import ShapeMatcher
+
+EX = "http://a.example/"
+INTEGER = {"type": "NodeConstraint", "datatype": XSD_INTEGER}
+STRING = {"type": "NodeConstraint", "nodeKind": "literal"}
+
+
+def ref(label: str) -> dict:
+    return {"type": "ShapeRef", "reference": EX + label}
+
+
+def tc(p: str, value_expr: dict = None, min: int = None, max=None, inverse: bool = None) -> dict:
+    rval = {"type": "TripleConstraint", "predicate": EX + p}
+    for k, v in (("valueExpr", value_expr), ("min", min), ("max", max), ("inverse", inverse)):
+        if v is not None:
+            rval[k] = v
+    return rval
+
+
+def each_of(*expressions) -> dict:
+    return {"type": "EachOf", "expressions": list(expressions)}
+
+
+def schema(shapes: dict, start: dict = None) -> ShExJ.Schema:
+    rval = {"type": "Schema", "shapes": {EX + k: v for k, v in shapes.items()}}
+    if start is not None:
+        rval["start"] = start
+    return loads(json.dumps(rval), ShExJ)
+
+
+def graph(*triples) -> Graph:
+    return Graph((EX + s, EX + p, o if not isinstance(o, str) else EX + o) for s, p, o in triples)
+
+
+PERSON = schema({"Person": {"type": "Shape", "expression": each_of(tc("name", STRING),
+                                                                   tc("knows", ref("Person"), min=0, max="*"))}})
+
+
+class GraphTestCase(unittest.TestCase):
+    def test_graph(self):
+        g = graph(("a", "p", "b"), ("a", "q", literal("x")), ("c", "p", "b"))
+        self.assertEqual(3, len(g))
+        self.assertEqual([(EX + "p", EX + "b"), (EX + "q", literal("x"))], g.outgoing(EX + "a"))
+        self.assertEqual([(EX + "p", EX + "a"), (EX + "p", EX + "c")], g.incoming(EX + "b"))
+        self.assertEqual([], g.outgoing(EX + "b"))
+        self.assertEqual({EX + "a", EX + "c"}, set(g.subjects()))
+
+
+class ShapeMapEngineTestCase(unittest.TestCase):
+    def test_recursive(self):
+        g = graph(("a", "name", literal("A")), ("a", "knows", "b"), ("b", "name", literal("B")), ("b", "knows", "a"),
+                  ("c", "name", literal("C")), ("c", "knows", "d"), ("d", "knows", "c"))
+        engine = ShapeMapEngine(PERSON, g)
+        results = list(engine.validate([(EX + n, EX + "Person") for n in "abcd"]))
+        self.assertEqual([ShapeResult(EX + n, EX + "Person", n in "ab") for n in "abcd"], results)
+        hits, misses, _, size = engine.cache_info()
+        self.assertEqual((3, 4, 4), (hits, misses, size))     # Each pair is only evaluated once
+        engine.cache_clear()
+        self.assertEqual((0, 0, None, 0), engine.cache_info())
+
+    def test_failed_hypothesis(self):
+        # b only conforms if a does -- which it doesn't.  b's result under that assumption must not be kept
+        s = schema({"S": {"type": "Shape", "expression": each_of(tc("p", ref("S")), tc("q", INTEGER))}})
+        g = graph(("a", "p", "b"), ("b", "p", "a"), ("b", "q", literal("1", XSD_INTEGER)))
+        engine = ShapeMapEngine(s, g)
+        self.assertFalse(engine.conforms(EX + "a", EX + "S"))
+        self.assertFalse(engine.conforms(EX + "b", EX + "S"))
+        engine = ShapeMapEngine(s, g)
+        self.assertFalse(engine.conforms(EX + "b", EX + "S"))
+        g.add((EX + "a", EX + "q", literal("2", XSD_INTEGER)))
+        engine = ShapeMapEngine(s, g)
+        self.assertTrue(engine.conforms(EX + "a", EX + "S"))
+        self.assertEqual((EX + "b", EX + "S"), next(k for k in engine._memo if k[0] == EX + "b"))
+
+    def test_logic(self):
+        s = schema({"Int": INTEGER,
+                    "NotInt": {"type": "ShapeNot", "shapeExpr": ref("Int")},
+                    "Either": {"type": "ShapeOr", "shapeExprs": [ref("Int"), {"type": "NodeConstraint",
+                                                                              "nodeKind": "iri"}]},
+                    "Both": {"type": "ShapeAnd", "shapeExprs": [ref("Either"), ref("NotInt")]}},
+                   start=ref("Int"))
+        engine = ShapeMapEngine(s, Graph())
+        engine.prepare()
+        self.assertEqual(2, len(engine._compiled))      # The two NodeConstraints
+        one = literal("1", XSD_INTEGER)
+        self.assertEqual([True, False, True, False],
+                         [engine.conforms(one, EX + label) for label in ("Int", "NotInt", "Either", "Both")])
+        self.assertEqual([False, True, True, True],
+                         [engine.conforms(EX + "x", EX + label) for label in ("Int", "NotInt", "Either", "Both")])
+        self.assertTrue(engine.conforms(one, START))
+        with self.assertRaises(ValueError):
+            engine.conforms(one, EX + "Missing")
+        self.assertEqual([], engine._stack)
+        self.assertEqual({}, engine._tentative)
+
+    def test_inverse(self):
+        s = schema({"Parent": {"type": "Shape", "expression": tc("child", ref("Child"), min=1, max="*")},
+                    "Child": {"type": "Shape", "expression": tc("child", ref("Parent"), inverse=True)}})
+        g = graph(("p", "child", "c1"), ("p", "child", "c2"))
+        engine = ShapeMapEngine(s, g)
+        self.assertTrue(engine.conforms(EX + "p", EX + "Parent"))
+        self.assertTrue(engine.conforms(EX + "c1", EX + "Child"))
+        self.assertFalse(engine.conforms(EX + "p", EX + "Child"))
+
+    def test_external(self):
+        banned = dict(tc("banned", ref("Ext")), negated=True)
+        s = schema({"Ext": {"type": "ShapeExternal"},
+                    "S": {"type": "Shape", "expression": each_of(tc("p", ref("Ext")), banned)}})
+        g = graph(("a", "p", "good"), ("b", "p", "bad"), ("c", "p", "good"), ("c", "banned", "good"))
+        with self.assertRaises(ValueError):
+            ShapeMapEngine(s, g).conforms(EX + "a", EX + "S")
+        calls = []
+
+        def external(node, label) -> bool:
+            calls.append((node, label))
+            return node == EX + "good"
+        engine = ShapeMapEngine(s, g, external)
+        self.assertEqual([True, False, False], [engine.conforms(EX + n, EX + "S") for n in "abc"])
+        self.assertEqual([(EX + "good", EX + "Ext"), (EX + "bad", EX + "Ext")], calls)
+        with self.assertRaises(ValueError):
+            engine.satisfies(EX + "good", s.shapes[EX + "Ext"])
+
+    def test_long_chain(self):
+        # Each node refers to the next one -- much deeper than the interpreter stack
+        s = schema({"S": {"type": "Shape", "expression": each_of(tc("next", ref("S"), min=0), tc("v", INTEGER))}})
+        n = 20000
+        g = Graph((EX + "n{}".format(i), EX + "next", EX + "n{}".format(i + 1)) for i in range(n))
+        for i in range(n + 1):
+            g.add((EX + "n{}".format(i), EX + "v", literal(str(i), XSD_INTEGER)))
+        self.assertTrue(ShapeMapEngine(s, g).conforms(EX + "n0", EX + "S"))
+        g.add((EX + "n{}".format(n), EX + "v", literal("x")))
+        engine = ShapeMapEngine(s, g)
+        self.assertFalse(engine.conforms(EX + "n0", EX + "S"))
+        self.assertEqual(n + 1, engine.cache_info().currsize)
+        # A cycle back to the start -- everything conforms on the assumption that n0 does
+        g = Graph((EX + "n{}".format(i), EX + "next", EX + "n{}".format((i + 1) % n)) for i in range(n))
+        for i in range(n):
+            g.add((EX + "n{}".format(i), EX + "v", literal(str(i), XSD_INTEGER)))
+        engine = ShapeMapEngine(s, g)
+        self.assertTrue(engine.conforms(EX + "n0", EX + "S"))
+        self.assertTrue(all(engine.conforms(EX + "n{}".format(i), EX + "S") for i in range(n)))
+        self.assertEqual((n, n), engine.cache_info()[1::2])
+
+    def test_random(self):
+        """ Compare with the greatest fixed point, computed by iterating over every (node, label) pair """
+        rand = random.Random(3)
+        nodes = [EX + "n{}".format(i) for i in range(6)]
+        labels = ["S0", "S1", "S2"]
+
+        def value_expr() -> dict:
+            kind = rand.randrange(4)
+            if kind == 0:
+                return ref(rand.choice(labels))
+            if kind == 1:
+                return {"type": "ShapeOr", "shapeExprs": [ref(rand.choice(labels)), INTEGER]}
+            if kind == 2:
+                return {"type": "ShapeAnd", "shapeExprs": [ref(rand.choice(labels)), ref(rand.choice(labels))]}
+            return INTEGER
+
+        for _ in range(60):
+            s = schema({label: {"type": "Shape", "expression": each_of(
+                *[tc(p, value_expr(), min=rand.choice([0, 1]), max=rand.choice([1, 2, "*"])) for p in ("p", "q")])}
+                for label in labels})
+            triples = [(rand.choice(nodes), EX + rand.choice("pq"),
+                        rand.choice(nodes + [literal("1", XSD_INTEGER)])) for _ in range(rand.randrange(12))]
+            g = Graph(set(triples))
+            typing = {(n, EX + label): True for n in nodes + [literal("1", XSD_INTEGER)] for label in labels}
+            matchers = {}
+
+            def value_test(expr, value) -> bool:
+                if isinstance(expr, ShExJ.ShapeRef):
+                    return typing[(value, str(expr.reference))]
+                if isinstance(expr, ShExJ.ShapeOr):
+                    return any(value_test(e, value) for e in expr.shapeExprs)
+                if isinstance(expr, ShExJ.ShapeAnd):
+                    return all(value_test(e, value) for e in expr.shapeExprs)
+                return compile_constraint(expr)(value)
+
+            for label in labels:
+                matchers[EX + label] = ShapeMatcher(s.shapes[EX + label], value_test=value_test)
+            changed = True
+            while changed:
+                changed = False
+                for n, label in typing:
+                    if typing[(n, label)] and not matchers[label].match_arcs(g.outgoing(n), g.incoming(n)):
+                        typing[(n, label)] = False
+                        changed = True
+            pairs = list(typing)
+            rand.shuffle(pairs)
+            engine = ShapeMapEngine(s, g)
+            for pair, result in zip(pairs, engine.validate(pairs)):
+                self.assertEqual(typing[pair], result.conforms, pair)
+            self.assertEqual({}, engine._tentative)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+import os
+import unittest
+from io import StringIO
+
+import shexj_shapemap_parallel
+from benchmark_shapemap import product_schema, product_graph, EX
+from shexj_shapemap import ShapeMapEngine
+from shexj_shapemap_parallel import validate_parallel, print_stats
+from shexj_terms import literal
+
+
+class ParallelShapeMapTestCase(unittest.TestCase):
+    def setUp(self):
+        self.schema = product_schema()
+        self.graph, self.shape_map = product_graph(2000)
+        # Invalid products, directly and through their makers and related products
+        for i in (5, 777, 1500):
+            self.graph.add((EX + "product{}".format(i), EX + "name", literal("Duplicate name")))
+        self.graph.add((EX + "maker33", EX + "founded", literal("1950")))
+        self.shape_map += [(EX + "maker{}".format(i), EX + "Maker") for i in range(0, 100, 3)]
+        self.expected = list(ShapeMapEngine(self.schema, self.graph).validate(self.shape_map))
+        self.assertIn(False, [r.conforms for r in self.expected])
+
+    def test_parallel(self):
+        stats = {}
+        results = validate_parallel(ShapeMapEngine(self.schema, self.graph), self.shape_map, workers=3, stats=stats)
+        self.assertEqual(self.expected, list(results))
+        self.assertLessEqual(len(stats), 3)
+        self.assertNotIn(os.getpid(), stats)
+        self.assertEqual(len(self.shape_map), sum(s.nodes for s in stats.values()))
+        self.assertEqual(12, sum(s.chunks for s in stats.values()))
+        out = StringIO()
+        print_stats(stats, out)
+        self.assertIn("nodes/sec", out.getvalue())
+        self.assertIn("Total: {} nodes".format(len(self.shape_map)), out.getvalue())
+
+    def test_streaming(self):
+        engine = ShapeMapEngine(self.schema, self.graph)
+        results = validate_parallel(engine, self.shape_map, workers=2)
+        self.assertEqual(self.expected[:10], [next(results) for _ in range(10)])
+        results.close()
+        self.assertEqual(0, engine.cache_info().currsize)
+
+    def test_concurrent(self):
+        other_map = list(reversed(self.shape_map[:500]))
+        other_expected = list(ShapeMapEngine(self.schema, self.graph).validate(other_map))
+        first = validate_parallel(ShapeMapEngine(self.schema, self.graph), self.shape_map, workers=2)
+        second = validate_parallel(ShapeMapEngine(self.schema, self.graph), other_map, workers=2)
+        results, other_results = [next(first)], []
+        # The state for the workers is only set in the workers
+        self.assertIsNone(shexj_shapemap_parallel._engine)
+        self.assertIsNone(shexj_shapemap_parallel._shape_map)
+        for result in second:
+            other_results.append(result)
+            results.append(next(first))
+        results += list(first)
+        self.assertEqual(self.expected, results)
+        self.assertEqual(other_expected, other_results)
+
+    def test_serial(self):
+        stats = {}
+        results = validate_parallel(ShapeMapEngine(self.schema, self.graph), self.shape_map, workers=1, stats=stats)
+        self.assertEqual(self.expected, list(results))
+        self.assertEqual([os.getpid()], list(stats))
+        self.assertEqual(len(self.shape_map), stats[os.getpid()].nodes)
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            list(validate_parallel(ShapeMapEngine(self.schema, self.graph), [(EX + "product1", EX + "Clown")] * 4,
+                                   workers=2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+import os
+import tempfile
+import unittest
+
+import ShExJ
+from ShExJ import IRI
+from jsg import loads
+from jsg_snapshot import SnapshotError
+from shexj_store import build, ShapeStore
+from schemagen import schema_text, shape_label
+
+
+class ShapeStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.s = loads(schema_text(40), ShExJ)
+        fd, self.path = tempfile.mkstemp(suffix='.store')
+        os.close(fd)
+        build(self.s, self.path)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_store(self):
+        with ShapeStore(self.path) as store:
+            self.assertEqual(40, len(store))
+            self.assertEqual([str(label) for label in self.s.shapes], list(store))
+            for label, shape in self.s.shapes.items():
+                self.assertEqual(shape._as_json, store[label]._as_json)
+            self.assertIn(IRI(shape_label(3)), store)
+            self.assertIs(store[shape_label(3)], store[IRI(shape_label(3))])
+            self.assertNotIn("http://a.example/Clown", store)
+            with self.assertRaises(KeyError):
+                _ = store["http://a.example/Clown"]
+            self.assertIsNone(store.get("http://a.example/Clown"))
+            self.assertIsNone(store.schema.shapes)
+            self.assertEqual(self.s.prefixes, store.schema.prefixes)
+            self.assertTrue(store.schema._is_valid())
+
+    def test_cache(self):
+        with ShapeStore(self.path, cache_size=2) as store:
+            a = store[shape_label(0)]
+            store[shape_label(1)]
+            self.assertIs(a, store[shape_label(0)])
+            store[shape_label(2)]               # Evicts shape 1
+            self.assertIs(a, store[shape_label(0)])
+            self.assertEqual((2, 3, 2, 2), tuple(store.cache_info()))
+            store[shape_label(1)]
+            self.assertEqual(4, store.cache_info().misses)
+            store.cache_clear()
+            self.assertEqual((0, 0, 2, 0), tuple(store.cache_info()))
+            self.assertIsNot(a, store[shape_label(0)])
+        with ShapeStore(self.path, cache_size=0) as store:
+            self.assertIsNot(store[shape_label(0)], store[shape_label(0)])
+
+    def test_invalid(self):
+        self.s.shapes[shape_label(0)].expression.expressions[0].__dict__['min'] = "x"
+        with self.assertRaises(ValueError):
+            build(self.s, self.path)
+        build(self.s, self.path, validate=False)
+        with ShapeStore(self.path) as store:
+            self.assertFalse(store[shape_label(0)]._is_valid())
+
+    def test_errors(self):
+        with open(self.path, 'rb') as f:
+            data = f.read()
+
+        def check(data: bytes, msg: str) -> None:
+            with open(self.path, 'wb') as f:
+                f.write(data)
+            with self.assertRaises(SnapshotError) as e:
+                ShapeStore(self.path)
+            self.assertEqual(msg, str(e.exception))
+
+        check(b'JSON' + data[4:], "Not a shape store")
+        check(data[:-1], "Store is truncated")
+        check(data[:10], "Store is truncated")
+        check(data[:-1] + bytes([data[-1] ^ 1]), "Store checksum mismatch")
+        check(data[:32] + bytes([data[32] ^ 1]) + data[33:], "Store was built with a different version of ShExJ")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+import unittest
+
+from shexj_terms import Literal, literal, from_shexj, to_shexj, is_iri, is_bnode, is_literal, XSD_STRING, \
+    XSD_INTEGER, RDF_LANGSTRING
+
+
+class TermsTestCase(unittest.TestCase):
+    def test_literal(self):
+        self.assertEqual(Literal("a", XSD_STRING, None), literal("a"))
+        self.assertEqual(Literal("chat", RDF_LANGSTRING, "en-us"), literal("chat", language="en-US"))
+        self.assertEqual(Literal("5", XSD_INTEGER, None), literal(5, XSD_INTEGER))
+        self.assertNotEqual(literal("a"), "a")
+        self.assertEqual(1, len({literal("a"), literal("a", XSD_STRING)}))
+
+    def test_kinds(self):
+        self.assertTrue(is_iri("http://a.example/a"))
+        self.assertFalse(is_iri("_:b1"))
+        self.assertTrue(is_bnode("_:b1"))
+        self.assertFalse(is_bnode(literal("_:b1")))
+        self.assertTrue(is_literal(literal("_:b1")))
+        self.assertFalse(is_literal("http://a.example/a"))
+
+    def test_shexj(self):
+        for text, term in [('http://a.example/a', 'http://a.example/a'),
+                           ('_:b1', '_:b1'),
+                           ('"abc"', literal("abc")),
+                           ('"say \\"hi\\""', literal('say "hi"')),
+                           ('"5"^^' + XSD_INTEGER, literal("5", XSD_INTEGER)),
+                           ('"chat"@fr', literal("chat", language="fr"))]:
+            self.assertEqual(term, from_shexj(text))
+            self.assertEqual(text, to_shexj(term))
+        with self.assertRaises(ValueError):
+            from_shexj('"abc')
+        with self.assertRaises(ValueError):
+            from_shexj('"abc"xyz')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,291 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+import json
+import random
+import unittest
+from itertools import product
+
+import ShExJ
+from jsg import loads
+from shexj_terms import literal, XSD_INTEGER
+from shexj_tripleexpr import ShapeMatcher, schema_resolver, cardinality, UNBOUNDED
+
+EX = "http://a.example/"
+N = EX + "n"
+
+
+def tc(p: str, value_expr: dict = None, min: int = None, max: int = None, inverse: bool = None,
+       negated: bool = None) -> dict:
+    rval = {"type": "TripleConstraint", "predicate": EX + p}
+    for k, v in (("valueExpr", value_expr), ("min", min), ("max", max), ("inverse", inverse), ("negated", negated)):
+        if v is not None:
+            rval[k] = v
+    return rval
+
+
+def group(kind: str, *expressions, min: int = None, max: int = None) -> dict:
+    rval = {"type": kind, "expressions": list(expressions)}
+    if min is not None:
+        rval["min"] = min
+    if max is not None:
+        rval["max"] = max
+    return rval
+
+
+def shape(expression: dict = None, **kwargs) -> ShExJ.Shape:
+    rval = dict(type="Shape", **kwargs)
+    if expression is not None:
+        rval["expression"] = expression
+    return loads(json.dumps(rval), ShExJ)
+
+
+INTEGER = {"type": "NodeConstraint", "datatype": XSD_INTEGER}
+IRI = {"type": "NodeConstraint", "nodeKind": "iri"}
+
+
+def arcs(*pairs) -> list:
+    return [(EX + p, v) for p, v in pairs]
+
+
+def naive_accepts(expr, counts: tuple, constraints: list) -> bool:
+    """
+    Reference implementation -- search every way of splitting the counts (one per constraint, in order) among the
+    repetitions of each subexpression
+    """
+    memo = {}
+
+    def symbols(e) -> frozenset:
+        if isinstance(e, ShExJ.TripleConstraint):
+            return frozenset(i for i, c in enumerate(constraints) if c is e)
+        return frozenset().union(*(symbols(s) for s in e.expressions))
+
+    def once(e, bag: tuple) -> bool:
+        """ bag matches one repetition of e, ignoring its cardinality """
+        if isinstance(e, ShExJ.TripleConstraint):
+            return bag == tuple(1 if i in symbols(e) else 0 for i in range(len(bag)))
+        if isinstance(e, ShExJ.EachOf):
+            return all(repeated(s, tuple(c if i in symbols(s) else 0 for i, c in enumerate(bag)))
+                       for s in e.expressions)
+        return any(all(c == 0 or i in symbols(s) for i, c in enumerate(bag)) and repeated(s, bag)
+                   for s in e.expressions)
+
+    def times(e, bag: tuple, k: int) -> bool:
+        """ bag can be split into k bags that each match one repetition of e """
+        key = (id(e), bag, k)
+        if key not in memo:
+            memo[key] = not any(bag) if k == 0 else \
+                any(once(e, part) and times(e, tuple(b - p for b, p in zip(bag, part)), k - 1)
+                    for part in product(*(range(c + 1) for c in bag)))
+        return memo[key]
+
+    def repeated(e, bag: tuple) -> bool:
+        n, m = cardinality(e)
+        return any(times(e, bag, k) for k in range(n, int(min(m, max(n, sum(bag)))) + 1))
+
+    return repeated(expr, counts)
+
+
+class ShapeMatcherTestCase(unittest.TestCase):
+    def test_cardinality(self):
+        self.assertEqual((1, 1), cardinality(shape(tc("p")).expression))
+        self.assertEqual((0, UNBOUNDED), cardinality(shape(tc("p", min=0, max="*")).expression))
+        self.assertEqual((2, UNBOUNDED), cardinality(shape(tc("p", min=2, max=-1)).expression))
+
+    def test_each_of(self):
+        m = ShapeMatcher(shape(group("EachOf", tc("p1", INTEGER), tc("p2", IRI, min=0, max="*"))))
+        one = literal("1", XSD_INTEGER)
+        self.assertTrue(m.match_arcs(arcs(("p1", one))))
+        self.assertTrue(m.match_arcs(arcs(("p1", one), ("p2", EX + "a"), ("p2", EX + "b"))))
+        self.assertFalse(m.match_arcs(arcs(("p2", EX + "a"))))
+        self.assertFalse(m.match_arcs(arcs(("p1", one), ("p1", one))))
+        self.assertFalse(m.match_arcs(arcs(("p1", literal("x")))))
+        self.assertTrue(m.match_arcs(arcs(("p1", one), ("p3", "x"))))
+
+    def test_one_of(self):
+        m = ShapeMatcher(shape(group("OneOf", tc("p1"), group("EachOf", tc("p2"), tc("p3")))))
+        self.assertTrue(m.match_arcs(arcs(("p1", "x"))))
+        self.assertTrue(m.match_arcs(arcs(("p2", "x"), ("p3", "y"))))
+        self.assertFalse(m.match_arcs(arcs(("p1", "x"), ("p2", "x"), ("p3", "y"))))
+        self.assertFalse(m.match_arcs(arcs(("p2", "x"))))
+        self.assertFalse(m.match_arcs([]))
+
+    def test_nested_cardinality(self):
+        m = ShapeMatcher(shape(group("EachOf", tc("p1"), tc("p2", min=0), min=2, max=3)))
+        self.assertTrue(m.match_arcs(arcs(("p1", "a"), ("p1", "b"))))
+        self.assertTrue(m.match_arcs(arcs(("p1", "a"), ("p1", "b"), ("p1", "c"), ("p2", "a"), ("p2", "b"))))
+        self.assertFalse(m.match_arcs(arcs(("p1", "a"), ("p2", "a"), ("p2", "b"), ("p2", "c"))))
+        self.assertFalse(m.match_arcs(arcs(("p1", "a"))))
+        self.assertFalse(m.match_arcs(arcs(("p1", "a"), ("p1", "b"), ("p1", "c"), ("p1", "d"))))
+
+    def test_shared_predicate(self):
+        # Arcs on p can go to either constraint
+        m = ShapeMatcher(shape(group("EachOf", tc("p", min=2, max=2), tc("p"))))
+        self.assertTrue(m.match_arcs(arcs(("p", "a"), ("p", "b"), ("p", "c"))))
+        self.assertFalse(m.match_arcs(arcs(("p", "a"), ("p", "b"))))
+        self.assertFalse(m.match_arcs(arcs(("p", "a"), ("p", "b"), ("p", "c"), ("p", "d"))))
+        m = ShapeMatcher(shape(group("OneOf", group("EachOf", tc("p"), tc("q")), tc("p", min=2, max=2))))
+        self.assertTrue(m.match_arcs(arcs(("p", "a"), ("p", "b"))))
+        self.assertTrue(m.match_arcs(arcs(("p", "a"), ("q", "b"))))
+        self.assertFalse(m.match_arcs(arcs(("p", "a"), ("p", "b"), ("q", "c"))))
+        # The value decides where an arc goes
+        m = ShapeMatcher(shape(group("EachOf", tc("p", INTEGER), tc("p", IRI, min=0, max="*"))))
+        self.assertTrue(m.match_arcs(arcs(("p", literal("1", XSD_INTEGER)), ("p", EX + "a"), ("p", EX + "b"))))
+        self.assertFalse(m.match_arcs(arcs(("p", EX + "a"))))
+
+    def test_closed_extra(self):
+        expr = tc("p", INTEGER)
+        one = literal("1", XSD_INTEGER)
+        self.assertFalse(ShapeMatcher(shape(expr)).match_arcs(arcs(("p", one), ("p", "x"))))
+        m = ShapeMatcher(shape(expr, extra=[EX + "p"]))
+        self.assertTrue(m.match_arcs(arcs(("p", one), ("p", "x"), ("q", "y"))))
+        self.assertFalse(m.match_arcs(arcs(("p", one), ("p", one))))
+        m = ShapeMatcher(shape(expr, closed=True, extra=[EX + "p"]))
+        self.assertTrue(m.match_arcs(arcs(("p", one), ("p", "x"))))
+        self.assertFalse(m.match_arcs(arcs(("p", one), ("q", "y"))))
+        self.assertTrue(m.match_arcs(arcs(("p", one)), arcs(("q", "y"))))
+        m = ShapeMatcher(shape(closed=True))
+        self.assertTrue(m.match_arcs([], arcs(("q", "y"))))
+        self.assertFalse(m.match_arcs(arcs(("q", "y"))))
+        self.assertTrue(ShapeMatcher(shape()).match_arcs(arcs(("q", "y"))))
+
+    def test_inverse(self):
+        m = ShapeMatcher(shape(group("EachOf", tc("p", IRI, inverse=True), tc("p", min=0))))
+        self.assertTrue(m.match_arcs([], arcs(("p", EX + "a"))))
+        self.assertTrue(m.match_arcs([], arcs(("p", EX + "a"), ("p", EX + "b"), ("p", literal("x")))))
+        self.assertFalse(m.match_arcs(arcs(("p", EX + "a"))))
+        self.assertFalse(m.match_arcs([], arcs(("p", "_:b"))))
+        triples = [(EX + "a", EX + "p", N), (N, EX + "p", "x"), (EX + "b", EX + "q", EX + "c")]
+        self.assertTrue(m.matches(N, triples))
+        self.assertFalse(m.matches(EX + "b", triples))
+
+    def test_inclusion(self):
+        schema = loads(json.dumps({"type": "Schema", "shapes": {
+            EX + "S1": {"type": "Shape", "expression": group("EachOf", tc("p1"), {"type": "Inclusion",
+                                                                                  "include": EX + "S2"})},
+            EX + "S2": {"type": "Shape", "expression": tc("p2", min=0, max=2)},
+            EX + "S3": {"type": "Shape", "expression": {"type": "Inclusion", "include": EX + "S3"}}}}), ShExJ)
+        m = ShapeMatcher(schema.shapes[EX + "S1"], schema_resolver(schema))
+        self.assertTrue(m.match_arcs(arcs(("p1", "a"), ("p2", "b"), ("p2", "c"))))
+        self.assertFalse(m.match_arcs(arcs(("p1", "a"), ("p2", "b"), ("p2", "c"), ("p2", "d"))))
+        with self.assertRaises(ValueError):
+            ShapeMatcher(schema.shapes[EX + "S3"], schema_resolver(schema))
+        with self.assertRaises(ValueError):
+            ShapeMatcher(schema.shapes[EX + "S1"])
+
+    def test_negated(self):
+        one = literal("1", XSD_INTEGER)
+        m = ShapeMatcher(shape(group("EachOf", tc("p", IRI), tc("q", INTEGER, negated=True)), closed=True))
+        self.assertTrue(m.match_arcs(arcs(("p", EX + "a"))))
+        self.assertTrue(m.match_arcs(arcs(("p", EX + "a"), ("q", "x"))))
+        self.assertFalse(m.match_arcs(arcs(("p", EX + "a"), ("q", "x"), ("q", one))))
+        self.assertFalse(m.match_arcs(arcs(("q", "x"))))
+        self.assertEqual(1, len(m.constraints))
+        # On its own, in a OneOf, and inverse
+        m = ShapeMatcher(shape(tc("p", negated=True)))
+        self.assertTrue(m.match_arcs(arcs(("q", "x")), arcs(("p", EX + "a"))))
+        self.assertFalse(m.match_arcs(arcs(("p", "x"))))
+        m = ShapeMatcher(shape(group("OneOf", tc("p", IRI), tc("q", negated=True))))
+        self.assertTrue(m.match_arcs([]))
+        self.assertTrue(m.match_arcs(arcs(("p", EX + "a"))))
+        self.assertFalse(m.match_arcs(arcs(("p", EX + "a"), ("q", "x"))))
+        m = ShapeMatcher(shape(tc("p", IRI, inverse=True, negated=True)))
+        self.assertTrue(m.match_arcs(arcs(("p", EX + "a")), arcs(("p", literal("x")))))
+        self.assertFalse(m.match_arcs([], arcs(("p", EX + "a"))))
+
+    def test_inherit(self):
+        schema = loads(json.dumps({"type": "Schema", "shapes": {
+            EX + "Base": {"type": "Shape", "expression": tc("p1", INTEGER)},
+            EX + "Mid": {"type": "Shape", "inherit": [EX + "Base"], "expression": tc("p2", min=0)},
+            EX + "Top": {"type": "Shape", "inherit": [EX + "Mid", EX + "Empty"], "closed": True},
+            EX + "Empty": {"type": "Shape", "closed": True},
+            EX + "Loop": {"type": "Shape", "inherit": [EX + "Loop"]},
+            EX + "NC": {"type": "Shape", "inherit": [EX + "Int"]},
+            EX + "Int": INTEGER}}), ShExJ)
+        resolve = schema_resolver(schema)
+        one = literal("1", XSD_INTEGER)
+        m = ShapeMatcher(schema.shapes[EX + "Mid"], resolve)
+        self.assertTrue(m.match_arcs(arcs(("p1", one), ("p2", "x"))))
+        self.assertTrue(m.match_arcs(arcs(("p1", one), ("q", "y"))))
+        self.assertFalse(m.match_arcs(arcs(("p2", "x"))))
+        m = ShapeMatcher(schema.shapes[EX + "Top"], resolve)
+        self.assertTrue(m.match_arcs(arcs(("p1", one), ("p2", "x"))))
+        self.assertFalse(m.match_arcs(arcs(("p1", one), ("q", "y"))))
+        self.assertFalse(m.match_arcs(arcs(("p1", one), ("p1", one))))
+        for label in ("Loop", "NC"):
+            with self.assertRaises(ValueError):
+                ShapeMatcher(schema.shapes[EX + label], resolve)
+        with self.assertRaises(ValueError):
+            ShapeMatcher(schema.shapes[EX + "Mid"])
+
+    def test_value_test(self):
+        ref = {"type": "ShapeRef", "reference": EX + "S2"}
+        with self.assertRaises(ValueError):
+            ShapeMatcher(shape(tc("p", ref)))
+        seen = []
+
+        def value_test(expr, value) -> bool:
+            seen.append((str(expr.reference), value))
+            return value == EX + "good"
+        m = ShapeMatcher(shape(tc("p", ref)), value_test=value_test)
+        self.assertTrue(m.match_arcs(arcs(("p", EX + "good"))))
+        self.assertFalse(m.match_arcs(arcs(("p", EX + "bad"))))
+        self.assertEqual([(EX + "S2", EX + "good"), (EX + "S2", EX + "bad")], seen)
+
+    def test_random(self):
+        rand = random.Random(5)
+        predicates = ["p", "q"]
+
+        def expression(depth: int) -> dict:
+            n = rand.choice([0, 1, 1, 2])
+            m = rand.choice([n, n + 1, "*"]) if n else rand.choice([1, 2, "*"])
+            if depth == 0 or rand.randrange(3) == 0:
+                return tc(rand.choice(predicates), min=n, max=m)
+            expressions = [expression(depth - 1) for _ in range(rand.randrange(1, 3))]
+            return group(rand.choice(["EachOf", "OneOf"]), *expressions, min=n, max=m)
+
+        for _ in range(150):
+            matcher = ShapeMatcher(shape(expression(2)))
+            for counts in product(range(4), repeat=2):
+                arc_list = [(EX + p, str(i)) for p, c in zip(predicates, counts) for i in range(c)]
+                # Try every assignment of the arcs to the constraints that name their predicates.  Arcs on a predicate
+                # that isn't in the expression are ignored
+                mentioned = [p for p, _ in arc_list if (p, False) in matcher.predicates]
+                expected = False
+                for distribution in product(*(matcher.predicates[(p, False)] for p in mentioned)):
+                    bag = [0] * len(matcher.constraints)
+                    for j in distribution:
+                        bag[j] += 1
+                    if naive_accepts(matcher.shape.expression, tuple(bag), matcher.constraints):
+                        expected = True
+                        break
+                self.assertEqual(expected, matcher.match_arcs(arc_list), "{}: {}".format(
+                    matcher.shape.expression._as_json, counts))
+
+
+if __name__ == '__main__':
+    unittest.main()
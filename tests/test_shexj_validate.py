@@ -0,0 +1,120 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from schemagen import write_schema
+from shexj_validate import main, validate_file, percentile
+
+
+class ValidateCLITestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.dir, "sub"))
+        for i in range(4):
+            with open(os.path.join(self.dir, "sub" if i % 2 else "", "s{}.json".format(i)), 'w') as f:
+                write_schema(f, 5 + i)
+        with open(os.path.join(self.dir, "notes.txt"), 'w') as f:
+            f.write("not a schema")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def run_main(self, *argv) -> (int, str):
+        out = StringIO()
+        with redirect_stdout(out):
+            rval = main(list(argv))
+        return rval, out.getvalue()
+
+    def add_file(self, name: str, text: str) -> str:
+        fn = os.path.join(self.dir, name)
+        with open(fn, 'w') as f:
+            f.write(text)
+        return fn
+
+    def test_valid(self):
+        rval, out = self.run_main(self.dir, "-w", "2", "-c")
+        self.assertEqual(0, rval)
+        self.assertIn("Files: 4, Errors: 0", out)
+        self.assertIn("files/sec", out)
+        self.assertIn("p99", out)
+        rval, out = self.run_main(self.dir, "-w", "1", "-x", "sub")
+        self.assertEqual(0, rval)
+        self.assertIn("Files: 2, Errors: 0", out)
+
+    def test_invalid(self):
+        bad = self.add_file("bad.json", '{"type": "Schema", "shapes": {"http://a.example/S1": {"type": "Shape", '
+                                        '"closed": "maybe"}}}')
+        broken = self.add_file("broken.json", '{"type": "Schema", ')
+        rval, out = self.run_main(self.dir, "-w", "2")
+        self.assertEqual(1, rval)
+        self.assertIn("Files: 6, Errors: 2", out)
+        self.assertIn("File: {} - ".format(bad), out)
+        self.assertIn("File: {} - ".format(broken), out)
+        self.assertFalse(validate_file(broken).success)
+        self.assertIn("JSONDecodeError", validate_file(broken).messages)
+
+    def test_compare(self):
+        fn = self.add_file("extra.json", '{"type": "Schema", "start": null}')
+        self.assertTrue(validate_file(fn).success)
+        result = validate_file(fn, compare=True)
+        self.assertFalse(result.success)
+        self.assertEqual("Round trip mismatch: /start\n", result.messages)
+
+    def test_cache(self):
+        cache_dir = os.path.join(self.dir, "cache")
+        bad = self.add_file("bad.json", '{"type": "Schema", "shapes": {"http://a.example/S1": {"type": "Shape", '
+                                        '"closed": "maybe"}}}')
+        rval, out = self.run_main(self.dir, "-w", "1", "--cache", cache_dir, "-x", "cache")
+        self.assertEqual(1, rval)
+        self.assertIn("Cache: 0 hits, 5 misses (0.0% hit rate)", out)
+        rval, out2 = self.run_main(self.dir, "-w", "1", "--cache", cache_dir, "-x", "cache")
+        self.assertEqual(1, rval)
+        self.assertIn("Cache: 5 hits, 0 misses (100.0% hit rate)", out2)
+        self.assertEqual(out.split("Files:")[0], out2.split("Files:")[0])
+        self.add_file("bad.json", '{"type": "Schema"}')
+        rval, out = self.run_main(self.dir, "-w", "1", "--cache", cache_dir, "-x", "cache")
+        self.assertEqual(0, rval)
+        self.assertIn("Cache: 4 hits, 1 misses (80.0% hit rate)", out)
+        self.assertTrue(validate_file(bad, cache_dir=cache_dir).cached)
+        self.assertFalse(validate_file(bad, compare=True, cache_dir=cache_dir).cached)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(50, percentile(values, 50))
+        self.assertEqual(99, percentile(values, 99))
+        self.assertEqual(100, percentile(values, 100))
+        self.assertEqual(7, percentile([7], 90))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+# Copyright (c) 2017, Mayo Clinic
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# Redistributions of source code must retain the above copyright notice, this
+#     list of conditions and the following disclaimer.
+#
+#     Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions and the following disclaimer in the documentation
+#     and/or other materials provided with the distribution.
+#
+#     Neither the name of the <ORGANIZATION> nor the names of its contributors
+#     may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE
+# OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+import json
+import random
+import unittest
+
+import ShExJ
+from jsg import loads
+from shexj_terms import literal, from_shexj, XSD_INTEGER
+from shexj_valueset import ValueSetIndex
+
+EX = "http://a.example/"
+
+
+def value_set(values: list) -> list:
+    return loads(json.dumps({"type": "NodeConstraint", "values": values}), ShExJ).values
+
+
+def stem(s: str) -> dict:
+    return {"type": "Stem", "stem": s}
+
+
+def stem_range(s, *exclusions) -> dict:
+    return {"type": "StemRange", "stem": s if s is not None else {"type": "Wildcard"}, "exclusions": list(exclusions)}
+
+
+def naive_match(values: list, term) -> bool:
+    """ Reference implementation -- test each entry in turn """
+    iri = isinstance(term, str) and not term.startswith('_:')
+    for value in values:
+        if isinstance(value, ShExJ.StemRange):
+            if isinstance(value.stem, ShExJ.Wildcard) or (iri and term.startswith(str(value.stem))):
+                if not any((iri and term.startswith(str(e.stem))) if isinstance(e, ShExJ.Stem) else
+                           from_shexj(e) == term for e in value.exclusions or ()):
+                    return True
+        elif isinstance(value, ShExJ.Stem):
+            if iri and term.startswith(str(value.stem)):
+                return True
+        elif from_shexj(value) == term:
+            return True
+    return False
+
+
+class ValueSetIndexTestCase(unittest.TestCase):
+    def test_exact(self):
+        index = ValueSetIndex(value_set([EX + "v1", '"abc"', '"5"^^' + XSD_INTEGER]))
+        self.assertIn(EX + "v1", index)
+        self.assertIn(literal("abc"), index)
+        self.assertIn(literal("5", XSD_INTEGER), index)
+        self.assertNotIn(EX + "v", index)
+        self.assertNotIn(literal("5"), index)
+        self.assertNotIn("_:v1", index)
+
+    def test_stems(self):
+        index = ValueSetIndex(value_set([stem(EX + "abc/"), stem(EX + "abd/"), stem(EX + "ab"), stem(EX + "x/y/")]))
+        for iri in [EX + "abc/", EX + "abd/z", EX + "ab", EX + "abe", EX + "x/y/z"]:
+            self.assertIn(iri, index)
+        for term in [EX + "a", EX + "x/", EX + "x/z", EX, literal(EX + "abc/")]:
+            self.assertNotIn(term, index)
+
+    def test_exclusions(self):
+        index = ValueSetIndex(value_set([
+            stem_range(EX + "a/", EX + "a/x", stem(EX + "a/no/")),
+            stem_range(EX + "a/no/yes/", stem(EX + "a/")),           # Excluded by a shorter stem -- never matches
+            stem_range(EX + "b/", stem(EX + "b/c/")),
+            stem_range(EX + "b/c/d/", EX + "b/c/d/x"),
+            stem(EX + "b/c/e/")]))
+        for iri in [EX + "a/", EX + "a/xx", EX + "a/no", EX + "b/c", EX + "b/c/d/", EX + "b/c/d/y", EX + "b/c/e/x"]:
+            self.assertIn(iri, index)
+        for iri in [EX + "a/x", EX + "a/no/", EX + "a/no/yes/z", EX + "b/c/", EX + "b/c/f", EX + "b/c/d/x", EX]:
+            self.assertNotIn(iri, index)
+
+    def test_overlapping_exclusions(self):
+        # EX + "x" is excluded from one range but still covered by the other
+        index = ValueSetIndex(value_set([stem_range(EX, EX + "x", EX + "y"), stem_range(EX + "x", EX + "y")]))
+        self.assertIn(EX + "x", index)
+        self.assertNotIn(EX + "y", index)
+
+    def test_wildcard(self):
+        index = ValueSetIndex(value_set([stem_range(None, EX + "x", '"x"', stem(EX + "no/"))]))
+        for term in [EX + "a", EX + "no", literal("a"), literal("x", XSD_INTEGER), "_:x", EX + "no"]:
+            self.assertIn(term, index)
+        for term in [EX + "x", literal("x"), EX + "no/", EX + "no/a"]:
+            self.assertNotIn(term, index)
+
+    def test_random(self):
+        rand = random.Random(17)
+
+        def iri(n: int) -> str:
+            return EX + ''.join(rand.choice("ab/") for _ in range(rand.randrange(n)))
+
+        for _ in range(50):
+            values = []
+            for _ in range(rand.randrange(1, 12)):
+                kind = rand.randrange(4)
+                if kind == 0:
+                    values.append(iri(6))
+                elif kind == 1:
+                    values.append(stem(iri(5)))
+                else:
+                    exclusions = [iri(7) if rand.randrange(2) else stem(iri(7)) for _ in range(rand.randrange(4))]
+                    values.append(stem_range(iri(4) if kind == 2 else None, *exclusions))
+            values = value_set(values)
+            index = ValueSetIndex(values)
+            for term in [iri(8) for _ in range(100)] + [literal("x"), "_:b"]:
+                self.assertEqual(naive_match(values, term), term in index, "{}: {}".format(term, values))
+
+    def test_large(self):
+        index = ValueSetIndex(value_set([EX + "v{}".format(i) for i in range(20000)] +
+                                        [stem(EX + "s{}/".format(i)) for i in range(20000)]))
+        self.assertIn(EX + "v19999", index)
+        self.assertIn(EX + "s19999/a", index)
+        self.assertNotIn(EX + "s19999", index)
+        self.assertNotIn(EX + "v20000", index)
+
+
+if __name__ == '__main__':
+    unittest.main()
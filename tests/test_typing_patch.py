@@ -27,8 +27,8 @@
 # OF THE POSSIBILITY OF SUCH DAMAGE.
 
 import unittest
-from typing import Optional, Union, List, Dict, Set
-from typing_patch import conforms, as_type
+from typing import Optional, Union, List, Dict, Set, _ForwardRef
+from typing_patch import conforms, as_type, conformance_checker, is_resolved
 
 
 class ConformsTestCase(unittest.TestCase):
@@ -58,6 +58,33 @@ class ConformsTestCase(unittest.TestCase):
         self.assertTrue(conforms([], Set[str]))
 
 
+class CheckerTestCase(unittest.TestCase):
+    def test_memoized(self):
+        self.assertIs(conformance_checker(Optional[List[str]]), conformance_checker(Optional[List[str]]))
+
+    def test_nested_union(self):
+        c = conformance_checker(Optional[List[Union[int, Union[str, List[int]]]]])
+        self.assertTrue(c(None))
+        self.assertTrue(c([1, "a", [2]]))
+        self.assertFalse(c([1, "a", ["b"]]))
+        self.assertFalse(c(1))
+
+    def test_subclass_dropped(self):
+        c = conformance_checker(Union[int, bool, str])
+        self.assertTrue(c(True))
+        self.assertTrue(c("x"))
+        self.assertFalse(c(1.0))
+
+    def test_forward(self):
+        fwd = _ForwardRef('List[int]')
+        typ = Optional[List[fwd]]
+        self.assertFalse(is_resolved(typ))
+        fwd._eval_type(dict(List=List), {})
+        self.assertTrue(is_resolved(typ))
+        self.assertTrue(conforms([[1, 2], []], typ))
+        self.assertFalse(conforms([["a"]], typ))
+
+
 class AsTypeTestCase(unittest.TestCase):
     def test_basics(self):
         self.assertEqual("abc", as_type("abc", str))